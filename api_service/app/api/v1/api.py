@@ -0,0 +1,7 @@
+from fastapi import APIRouter
+
+from app.api.v1 import articles, jobs
+
+api_router = APIRouter()
+api_router.include_router(articles.router, tags=["articles"])
+api_router.include_router(jobs.router, tags=["jobs"])
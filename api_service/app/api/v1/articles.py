@@ -0,0 +1,160 @@
+import asyncio
+import time
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.core.config import get_settings
+from app.db.repository import ArticleRepository, InvalidCursor, get_article_repository
+from app.models.article import ArticlePage, SearchResponse, SearchResult, StoredArticleDetail
+from app.services.cache_service import (
+    ALL_ARTICLES, SEARCH, ResponseCache, get_response_cache, source_tag, url_tag,
+)
+from app.services.export_service import (
+    EXPORT_FIELDS, FORMATS, ExportUnavailable, arrow_schema, columnar_chunks, export_projection, gzip_chunks,
+    ndjson_chunks, prefetched,
+)
+from app.services.processing_service import ProcessingService, get_processing_service
+
+router = APIRouter()
+
+
+def etag_matches(if_none_match, etag):
+    """
+    If-None-Match check: "*" or any ETag of the comma-separated list,
+    compared weakly (a W/ prefix is ignored).
+    """
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+def cached_response(request, cached):
+    """
+    Answers 304 when the client already has this body (If-None-Match),
+    otherwise the body with its ETag.
+    """
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache", "X-Cache": "hit" if cached.hit else "miss"}
+    if etag_matches(request.headers.get("if-none-match", ""), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(cached.body, headers=headers)
+
+
+def listing_tags(sources):
+    return [source_tag(source) for source in sources] if sources else [ALL_ARTICLES]
+
+
+@router.get("/search", response_model=SearchResponse)
+async def search_articles(
+    request: Request,
+    q: str = Query(..., min_length=1, description="Free-text query"),
+    k: int = Query(10, ge=1, le=100, description="Number of articles to return"),
+    source: list[str] | None = Query(None, description="Only return articles from these source sites"),
+    mode: str = Query("semantic", pattern="^(semantic|keyword|hybrid)$", description="semantic, keyword (BM25; quote exact phrases) or hybrid"),
+    since: datetime | None = Query(None, description="Published at or after this time"),
+    until: datetime | None = Query(None, description="Published before this time"),
+    processing: ProcessingService = Depends(get_processing_service),
+    cache: ResponseCache = Depends(get_response_cache),
+):
+    async def compute():
+        start = time.perf_counter()
+        hits = await asyncio.to_thread(
+            processing.search, q, k=k, sources=source, mode=mode, since=since, until=until
+        )
+        return jsonable_encoder(SearchResponse(
+            query=q,
+            took_ms=round((time.perf_counter() - start) * 1000, 3),
+            results=[SearchResult(url=hit.url, source_site=hit.source_site, score=hit.score) for hit in hits],
+        ))
+
+    params = {"q": q, "k": k, "source": sorted(source or []), "mode": mode, "since": since, "until": until}
+    return cached_response(request, await cache.fetch("search", params, compute, tags=[SEARCH]))
+
+
+@router.get("/articles", response_model=ArticlePage)
+async def list_articles(
+    request: Request,
+    source: list[str] | None = Query(None, description="Only list articles from these source sites"),
+    since: datetime | None = Query(None, description="Published at or after this time"),
+    until: datetime | None = Query(None, description="Published before this time"),
+    limit: int | None = Query(None, ge=1, description="Articles per page"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
+    repository: ArticleRepository = Depends(get_article_repository),
+    cache: ResponseCache = Depends(get_response_cache),
+):
+    """
+    Newest articles first, without body_text; fetch one article for the full text.
+    """
+    settings = get_settings()
+    limit = min(limit or settings.articles_page_size, settings.articles_max_page_size)
+
+    async def compute():
+        try:
+            items, next_cursor = await repository.list(source, since, until, limit=limit, cursor=cursor)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return jsonable_encoder(ArticlePage(items=items, next_cursor=next_cursor))
+
+    params = {"source": sorted(source or []), "since": since, "until": until, "limit": limit, "cursor": cursor}
+    return cached_response(request, await cache.fetch("articles", params, compute, tags=listing_tags(source)))
+
+
+# Declared before /articles/{article_id}, which would otherwise match "export"
+@router.get("/articles/export", response_class=StreamingResponse)
+async def export_articles(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|parquet|arrow)$", description="ndjson, parquet or arrow (IPC stream)"),
+    source: list[str] | None = Query(None, description="Only export articles from these source sites"),
+    since: datetime | None = Query(None, description="Published at or after this time"),
+    until: datetime | None = Query(None, description="Published before this time"),
+    include_body: bool = Query(True, description="Include body_text"),
+    repository: ArticleRepository = Depends(get_article_repository),
+):
+    """
+    Streams every matching article, newest first, straight from one Mongo
+    cursor, so memory use does not grow with the size of the export.
+    NDJSON and Arrow responses are gzip-compressed when the client sends
+    Accept-Encoding: gzip; Parquet files are compressed internally (zstd).
+    """
+    settings = get_settings()
+    fields = [name for name in EXPORT_FIELDS if include_body or name != "body_text"]
+    if format != "ndjson":
+        try:
+            arrow_schema(fields)
+        except ExportUnavailable as e:
+            raise HTTPException(status_code=501, detail=str(e))
+
+    documents = await prefetched(repository.stream(
+        source, since, until, projection=export_projection(include_body), batch_size=settings.export_batch_size
+    ))
+    if format == "ndjson":
+        body = ndjson_chunks(documents)
+    else:
+        body = columnar_chunks(documents, fields, format=format, batch_size=settings.export_batch_size)
+    headers = {
+        "Content-Disposition": f'attachment; filename="articles.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if format != "parquet" and "gzip" in request.headers.get("accept-encoding", "").lower():
+        body = gzip_chunks(body, settings.export_gzip_level)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=FORMATS[format], headers=headers)
+
+
+@router.get("/articles/{article_id}", response_model=StoredArticleDetail)
+async def get_article(
+    request: Request,
+    article_id: str,
+    repository: ArticleRepository = Depends(get_article_repository),
+    cache: ResponseCache = Depends(get_response_cache),
+):
+    async def compute():
+        article = await repository.get(article_id)
+        if article is None:
+            raise HTTPException(status_code=404, detail="Article not found")
+        return jsonable_encoder(StoredArticleDetail(**article))
+
+    # Ingestion only knows urls, so the entry is tagged with the url it turns out to have
+    cached = await cache.fetch("article", {"id": article_id}, compute, tags=lambda body: [url_tag(body["url"])])
+    return cached_response(request, cached)
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+
+from app.services.cache_service import ResponseCache, get_response_cache
+from app.services.job_queue import JobQueue
+from app.services.processing_service import ProcessingService, get_processing_service
+
+router = APIRouter()
+
+
+def get_job_queue(request: Request) -> JobQueue:
+    return request.app.state.job_queue
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str, job_queue: JobQueue = Depends(get_job_queue)):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job id")
+    return job.as_dict()
+
+
+@router.get("/metrics")
+def get_metrics(
+    job_queue: JobQueue = Depends(get_job_queue),
+    processing: ProcessingService = Depends(get_processing_service),
+    cache: ResponseCache = Depends(get_response_cache),
+):
+    return {
+        "jobs": job_queue.metrics(),
+        "embedding": processing.totals.as_dict(),
+        "vector_index": {"chunks": len(processing.index), "articles": len(processing.index.article_ids)},
+        "text_index": {"articles": len(processing.text_index), "unmerged": processing.text_index.tail_docs},
+        "llm": processing.llm.stats() if processing.llm is not None else None,
+        "cache": cache.stats(),
+    }
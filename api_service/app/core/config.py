@@ -0,0 +1,131 @@
+from functools import lru_cache
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """
+    API service configuration, read from environment variables (or a .env
+    file next to main.py), e.g. EMBEDDING_BATCH_SIZE=512.
+    """
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # --- MongoDB (the news_articles collection filled by the scraper) ---
+    mongo_uri: str = "mongodb://localhost:27017"
+    mongo_db: str = "news_data"
+    mongo_collection: str = "news_articles"
+    # Connections per server kept by the client's pool, shared by all requests
+    mongo_max_pool_size: int = 50
+    mongo_min_pool_size: int = 0
+    mongo_server_selection_timeout_ms: int = 5000
+    # Server-side time limit for each query
+    mongo_max_time_ms: int = 10000
+
+    # --- Article listings ---
+    articles_page_size: int = 20
+    articles_max_page_size: int = 100
+
+    # --- Response cache ---
+    # Caches /articles, /articles/{id} and /search responses. Ingested
+    # articles invalidate the entries they affect, so the TTL only bounds
+    # staleness from writes the API does not see
+    cache_enabled: bool = True
+    # "memory" (per process, TTL + LRU) or "sqlite" (shared by all worker
+    # processes on the host, at cache_path)
+    cache_backend: str = "memory"
+    cache_ttl_seconds: float = 30.0
+    cache_max_entries: int = 10000
+    cache_path: str = "data/response_cache.sqlite"
+
+    # --- Exports ---
+    # Articles fetched per Mongo batch and written per Parquet row group /
+    # Arrow record batch; bounds the memory an export holds at once
+    export_batch_size: int = 1000
+    export_gzip_level: int = 6
+
+    # --- Embedding ---
+    # "hashing" (deterministic, no model download; for tests and local runs)
+    # or "sentence-transformers" (local CPU model, see requirements.txt)
+    embedding_backend: str = "hashing"
+    embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    # Only used by the hashing embedder; model backends report their own
+    embedding_dim: int = 384
+    # Chunks sent to the embedder per call
+    embedding_batch_size: int = 256
+    # Worker processes running the embedder; 0 embeds in threads of the API process
+    embedding_processes: int = 2
+
+    # --- Chunking ---
+    # Whitespace-delimited tokens per chunk, and tokens shared by neighbours
+    chunk_max_tokens: int = 200
+    chunk_overlap_tokens: int = 40
+
+    # --- Vector index ---
+    # Directory the index is saved to on shutdown and mmap-loaded from on startup
+    vector_index_path: str = "data/vector_index"
+    # IVF lists (k-means centroids) and lists scanned per query; more probes
+    # trade latency for recall
+    vector_index_lists: int = 1024
+    vector_index_probes: int = 16
+
+    # --- Keyword index (BM25) ---
+    # Directory the inverted index is saved to and mmap-loaded from
+    text_index_path: str = "data/text_index"
+    # BM25 term-frequency saturation and length normalization
+    text_index_k1: float = 1.2
+    text_index_b: float = 0.75
+    # Articles indexed in memory before they are merged into the on-disk segment
+    text_index_merge_docs: int = 20000
+    # Hybrid search fuses vector and keyword rankings with reciprocal rank
+    # fusion: score = sum of 1 / (search_rrf_k + rank)
+    search_rrf_k: int = 60
+
+    # --- Near-duplicate detection ---
+    dedup_enabled: bool = True
+    # MinHash permutations, split into bands of num_perm / bands rows. With
+    # 16 bands of 8 rows, pairs above ~0.7 Jaccard similarity become
+    # candidates; dedup_threshold is the similarity needed to join a cluster
+    dedup_num_perm: int = 128
+    dedup_bands: int = 16
+    dedup_threshold: float = 0.8
+    # Words per shingle
+    dedup_shingle_size: int = 5
+    # Most recent articles kept in the LSH buckets
+    dedup_max_articles: int = 200_000
+    # Directory the signatures are saved to on shutdown and loaded from on startup
+    dedup_path: str = "data/dedup"
+
+    # --- Job queue ---
+    # Jobs processed concurrently, jobs allowed to wait before POSTs get 503,
+    # and finished jobs kept for status lookups
+    job_workers: int = 4
+    job_queue_size: int = 1000
+    job_retention: int = 10000
+
+    # --- Bulk ingestion ---
+    # Articles per job created by /process-articles:bulk, and the longest
+    # accepted NDJSON row
+    bulk_job_size: int = 100
+    bulk_max_line_bytes: int = 1 << 20
+
+    # --- LLM summarization ---
+    llm_enabled: bool = True
+    # "stub" (deterministic, offline) or "openai" (any OpenAI-compatible
+    # chat-completions server, e.g. a local llama.cpp or vLLM server)
+    llm_backend: str = "stub"
+    llm_base_url: str = "http://127.0.0.1:8080/v1"
+    llm_model: str = "llama-3.1-8b-instruct"
+    llm_api_key: str | None = None
+    # Summaries keyed by content hash + prompt version + model
+    llm_cache_path: str = "data/llm_cache.sqlite"
+    # Concurrent summarize calls are coalesced into batches of up to this
+    # many prompts, waiting at most llm_max_wait_ms for a batch to fill
+    llm_max_batch_size: int = 16
+    llm_max_wait_ms: float = 20
+    # Article words sent to the model
+    llm_max_input_tokens: int = 2000
+
+
+@lru_cache
+def get_settings():
+    return Settings()
@@ -0,0 +1,34 @@
+from functools import lru_cache
+
+from pymongo import AsyncMongoClient
+
+from app.core.config import get_settings
+
+
+@lru_cache
+def get_mongo_client():
+    """
+    The process-wide client. Its connection pool is shared by every request,
+    so it must not be created per request.
+    """
+    settings = get_settings()
+    return AsyncMongoClient(
+        settings.mongo_uri,
+        maxPoolSize=settings.mongo_max_pool_size,
+        minPoolSize=settings.mongo_min_pool_size,
+        serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+        # publication_date is stored in UTC; return aware datetimes
+        tz_aware=True,
+        appname="news-processing-api",
+    )
+
+
+def get_article_collection():
+    settings = get_settings()
+    return get_mongo_client()[settings.mongo_db][settings.mongo_collection]
+
+
+async def close_mongo_client():
+    if get_mongo_client.cache_info().currsize:
+        await get_mongo_client().close()
+        get_mongo_client.cache_clear()
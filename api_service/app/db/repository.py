@@ -0,0 +1,180 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import DESCENDING
+
+from app.core.config import get_settings
+from app.db.mongodb import get_article_collection
+
+# Listings never load body_text, by far the largest field of a stored article
+LIST_PROJECTION = {
+    "url": 1,
+    "source_site": 1,
+    "headline": 1,
+    "authors": 1,
+    "publication_date": 1,
+    "section": 1,
+    "keywords": 1,
+    "canonical_url": 1,
+}
+
+# Newest first. Articles without a publication_date sort after all dated
+# ones; _id breaks ties so the order is total, which keyset paging needs.
+# Served by the publication_date_id and source_site_publication_date_id
+# indexes the scraper creates.
+#
+# Rows stored before the scraper normalized dates may still hold the raw
+# string ('N/A' or unparsed text; see news_scraper.migrations). MongoDB
+# sorts by BSON type first, so in this order they come after every date
+# and before nulls, and a `$lt: <date>` never matches them: the keyset
+# filters below page through them as a bucket of their own.
+SORT = [("publication_date", DESCENDING), ("_id", DESCENDING)]
+
+DATE, STRING, NULL = "d", "s", "n"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(document):
+    """
+    Opaque page token holding the sort key of the last article of a page.
+    """
+    published = document.get("publication_date")
+    if isinstance(published, datetime):
+        key = {"t": DATE, "d": published.isoformat()}
+    elif isinstance(published, str):
+        key = {"t": STRING, "d": published}
+    else:
+        key = {"t": NULL, "d": None}
+    key["i"] = str(document["_id"])
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Returns (kind, publication_date, _id); kind is DATE, STRING or NULL.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        # Cursors issued before string dates were handled have no "t"
+        kind = key.get("t") or (DATE if key["d"] else NULL)
+        if kind == DATE:
+            published = datetime.fromisoformat(key["d"])
+        elif kind == STRING:
+            published = str(key["d"])
+        elif kind == NULL:
+            published = None
+        else:
+            raise ValueError(kind)
+        return kind, published, ObjectId(key["i"])
+    except (binascii.Error, ValueError, KeyError, TypeError, AttributeError, InvalidId) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+
+
+def after_filter(kind, published, object_id):
+    """
+    Matches the articles that come after (published, object_id) in SORT order.
+    """
+    if kind == NULL:
+        return {"publication_date": None, "_id": {"$lt": object_id}}
+    later = [
+        {"publication_date": {"$type": "string", "$lt": published}},
+        {"publication_date": published, "_id": {"$lt": object_id}},
+        {"publication_date": None},
+    ]
+    if kind == DATE:
+        later[0] = {"publication_date": {"$lt": published}}
+        later.append({"publication_date": {"$type": "string"}})
+    return {"$or": later}
+
+
+def article_filter(sources=None, since=None, until=None):
+    query = {}
+    if sources:
+        query["source_site"] = {"$in": list(sources)}
+    if since or until:
+        query["publication_date"] = {}
+        if since:
+            query["publication_date"]["$gte"] = since
+        if until:
+            query["publication_date"]["$lt"] = until
+    return query
+
+
+def to_api(document):
+    document["id"] = str(document.pop("_id"))
+    # Unnormalized rows: a raw date string is as good as unknown to clients
+    if "publication_date" in document and not isinstance(document["publication_date"], datetime):
+        document["publication_date"] = None
+    return document
+
+
+class ArticleRepository:
+    """
+    Read access to the scraper's news_articles collection.
+
+    Listings page by keyset: each page ends with a cursor encoding the last
+    article's (publication_date, _id), and the next page starts right after
+    it. Unlike skip/limit, every page costs the same however deep it is, and
+    articles inserted meanwhile do not shift later pages.
+    """
+
+    def __init__(self, collection, max_time_ms=10000):
+        self.collection = collection
+        self.max_time_ms = max_time_ms
+
+    async def list(self, sources=None, since=None, until=None, limit=20, cursor=None):
+        """
+        Returns (articles, next cursor); the cursor is None on the last page.
+        Raises InvalidCursor for a malformed cursor.
+        """
+        query = article_filter(sources, since, until)
+        if cursor:
+            query = {"$and": [query, after_filter(*decode_cursor(cursor))]}
+        # One extra article tells whether there is a next page
+        documents = await (
+            self.collection.find(query, LIST_PROJECTION)
+            .sort(SORT)
+            .limit(limit + 1)
+            .max_time_ms(self.max_time_ms)
+            .to_list()
+        )
+        next_cursor = encode_cursor(documents[limit - 1]) if len(documents) > limit else None
+        return [to_api(document) for document in documents[:limit]], next_cursor
+
+    async def get(self, article_id):
+        """
+        Returns the full article, body_text included, or None.
+        """
+        try:
+            object_id = ObjectId(article_id)
+        except (InvalidId, TypeError):
+            return None
+        document = await self.collection.find_one({"_id": object_id}, max_time_ms=self.max_time_ms)
+        return to_api(document) if document else None
+
+    async def stream(self, sources=None, since=None, until=None, projection=None, batch_size=500):
+        """
+        Yields every matching article in SORT order from one server-side
+        cursor, holding at most one batch in memory. No max_time_ms: an
+        export may legitimately run for minutes.
+        """
+        cursor = (
+            self.collection.find(article_filter(sources, since, until), projection or LIST_PROJECTION)
+            .sort(SORT)
+            .batch_size(batch_size)
+        )
+        async with cursor:
+            async for document in cursor:
+                yield to_api(document)
+
+
+def get_article_repository():
+    # Cheap: the client, and with it the connection pool, is shared
+    return ArticleRepository(get_article_collection(), max_time_ms=get_settings().mongo_max_time_ms)
@@ -0,0 +1,507 @@
+import json
+import math
+import re
+import shutil
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.db.vector_db import GrowableArray, SearchHit
+
+_WORD = re.compile(r"\w+")
+_PHRASE = re.compile(r'"([^"]*)"')
+
+# doc_dates value for articles without a publication date
+NO_DATE = np.iinfo(np.int64).min
+
+
+def epoch_seconds(moment):
+    # Naive datetimes are taken to be UTC, as the scraper stores them
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def tokenize(text):
+    return _WORD.findall((text or "").lower())
+
+
+def parse_query(query):
+    """
+    Splits a query into quoted phrases and loose terms:
+    '"Lok Sabha" bill' -> ([["lok", "sabha"]], ["bill"]).
+    """
+    phrases = [tokenize(phrase) for phrase in _PHRASE.findall(query)]
+    terms = tokenize(_PHRASE.sub(" ", query))
+    return [phrase for phrase in phrases if phrase], list(dict.fromkeys(terms))
+
+
+# --- Varint coding ---
+# Unsigned LEB128: 7 bits per byte, high bit set on every byte but the last.
+
+def encode_varints(values):
+    values = np.asarray(values, dtype=np.uint64)
+    if not len(values):
+        return np.empty(0, dtype=np.uint8)
+    lengths = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        lengths += rest > 0
+        rest >>= np.uint64(7)
+    owner = np.repeat(np.arange(len(values)), lengths)
+    byte = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    out = ((values[owner] >> (7 * byte).astype(np.uint64)) & np.uint64(127)).astype(np.uint8)
+    out[byte < lengths[owner] - 1] |= 128
+    return out
+
+
+def decode_varints(data):
+    data = np.asarray(data, dtype=np.uint8)
+    if not len(data):
+        return np.empty(0, dtype=np.int64)
+    ends = np.flatnonzero(data < 128)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    shifts = (np.arange(len(data)) - np.repeat(starts, ends - starts + 1)) * 7
+    return np.add.reduceat((data & 127).astype(np.int64) << shifts, starts)
+
+
+def append_varint(out, value):
+    while value >= 128:
+        out.append(value & 127 | 128)
+        value >>= 7
+    out.append(value)
+
+
+def within_doc_cumsum(deltas, tfs):
+    """
+    Turns per-document position deltas (each document's run starting from
+    0) back into positions; `tfs` gives the length of each run.
+    """
+    totals = np.cumsum(deltas)
+    starts = np.cumsum(tfs) - tfs
+    return totals - np.repeat(totals[starts] - deltas[starts], tfs)
+
+
+class _TailPostings:
+    """
+    Postings of one term for the documents added since the last save, as
+    growing varint byte strings: doc id deltas (from the tail's first doc
+    id, see TextIndex.tail_base), term frequencies and position deltas
+    (restarting from 0 for every document).
+    """
+    __slots__ = ("docs", "tfs", "positions", "last_doc", "count")
+
+    def __init__(self):
+        self.docs = bytearray()
+        self.tfs = bytearray()
+        self.positions = bytearray()
+        self.last_doc = 0
+        self.count = 0
+
+    def add(self, doc_id, positions):
+        append_varint(self.docs, doc_id - self.last_doc)
+        append_varint(self.tfs, len(positions))
+        previous = 0
+        for position in positions:
+            append_varint(self.positions, position - previous)
+            previous = position
+        self.last_doc = doc_id
+        self.count += 1
+
+
+class TextIndex:
+    """
+    Positional inverted index over article text, ranked with BM25.
+
+    Like VectorIndex, it has a base segment memory-mapped from the last
+    save and an in-memory tail for articles added since. Every term's
+    postings are stored as varints: doc id deltas and term frequencies in
+    postings.npy, position deltas in positions.npy, so a keyword query
+    never reads positions and a phrase query reads them only for its own
+    terms. Re-adding an article marks its previous document dead; save()
+    merges both segments and drops dead documents.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.RLock()
+        # Held for a whole save(); the lock above only for its two short steps
+        self.save_lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        # Base segment: term -> row of term_offsets / position_offsets / term_df
+        self.term_ids = {}
+        self.terms = []
+        self.postings = np.empty(0, dtype=np.uint8)
+        self.positions = np.empty(0, dtype=np.uint8)
+        self.term_offsets = np.zeros(1, dtype=np.int64)
+        self.position_offsets = np.zeros(1, dtype=np.int64)
+        self.term_df = np.empty(0, dtype=np.int64)
+        self.base_docs = 0
+        # Tail doc ids are stored relative to tail_base, so renumbering the
+        # documents before the tail only has to move tail_base
+        self.tail = defaultdict(_TailPostings)
+        self.tail_base = 0
+        # (tail, tail_base) pairs being merged by save(), still searched meanwhile
+        self.frozen = []
+        # Per document id
+        self.doc_urls = []
+        self.doc_sources = []
+        self.doc_lengths = GrowableArray(np.int32)
+        self.doc_source_codes = GrowableArray(np.int32)
+        self.doc_dates = GrowableArray(np.int64)
+        self.alive = GrowableArray(np.bool_)
+        self.doc_ids = {}
+        self.source_codes = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def __contains__(self, url):
+        return url in self.doc_ids
+
+    @property
+    def tail_docs(self):
+        """
+        Documents added since the last completed save().
+        """
+        return len(self.doc_urls) - self.base_docs
+
+    # --- Inserts and deletes ---
+
+    def add(self, url, text, source=None, published=None):
+        """
+        Indexes (or re-indexes) one article. `published` is an aware or UTC
+        datetime, used by date-filtered searches.
+        """
+        tokens = tokenize(text)
+        term_positions = defaultdict(list)
+        for position, token in enumerate(tokens):
+            term_positions[token].append(position)
+
+        with self.lock:
+            self.delete(url)
+            doc_id = len(self.doc_urls)
+            self.doc_urls.append(url)
+            self.doc_sources.append(source)
+            self.doc_lengths.extend([len(tokens)])
+            code = -1 if source is None else self.source_codes.setdefault(source, len(self.source_codes))
+            self.doc_source_codes.extend([code])
+            self.doc_dates.extend([NO_DATE if published is None else epoch_seconds(published)])
+            self.alive.extend([True])
+            self.doc_ids[url] = doc_id
+            self.total_length += len(tokens)
+            for term, positions in term_positions.items():
+                self.tail[term].add(doc_id - self.tail_base, positions)
+        return doc_id
+
+    def delete(self, url):
+        with self.lock:
+            doc_id = self.doc_ids.pop(url, None)
+            if doc_id is None:
+                return False
+            self.alive.data[doc_id] = False
+            self.total_length -= int(self.doc_lengths.data[doc_id])
+            return True
+
+    def published(self, url):
+        """
+        The article's publication date, or None when unknown or not indexed.
+        """
+        doc_id = self.doc_ids.get(url)
+        if doc_id is None or self.doc_dates.data[doc_id] == NO_DATE:
+            return None
+        return datetime.fromtimestamp(int(self.doc_dates.data[doc_id]), tz=timezone.utc)
+
+    # --- Postings ---
+
+    def _segments(self, term, segments=None):
+        """
+        Yields (doc ids, term frequencies, position deltas as varint bytes)
+        from the base segment, then the frozen tails and the tail.
+        `segments` is a save() snapshot to read instead of the live index.
+        """
+        segments = segments or self
+        term_id = segments.term_ids.get(term)
+        if term_id is not None:
+            n = int(segments.term_df[term_id])
+            start, end = segments.term_offsets[term_id], segments.term_offsets[term_id + 1]
+            values = decode_varints(segments.postings[start:end])
+            yield (
+                np.cumsum(values[:n]), values[n:],
+                segments.positions[segments.position_offsets[term_id]:segments.position_offsets[term_id + 1]],
+            )
+        tails = segments.frozen if segments.tail is None else segments.frozen + [(segments.tail, segments.tail_base)]
+        for tails_by_term, base in tails:
+            tail = tails_by_term.get(term)
+            if tail is not None:
+                yield (
+                    base + np.cumsum(decode_varints(np.frombuffer(bytes(tail.docs), dtype=np.uint8))),
+                    decode_varints(np.frombuffer(bytes(tail.tfs), dtype=np.uint8)),
+                    np.frombuffer(bytes(tail.positions), dtype=np.uint8),
+                )
+
+    def postings_for(self, term, with_positions=False):
+        """
+        Returns (doc ids, term frequencies) of the live documents containing
+        `term`, plus their positions (grouped by document) if asked for.
+        """
+        docs, tfs, positions = [], [], []
+        for segment_docs, segment_tfs, segment_positions in self._segments(term):
+            docs.append(segment_docs)
+            tfs.append(segment_tfs)
+            if with_positions:
+                positions.append(within_doc_cumsum(decode_varints(segment_positions), segment_tfs))
+        if not docs:
+            empty = np.empty(0, dtype=np.int64)
+            return (empty, empty, empty) if with_positions else (empty, empty)
+        docs, tfs = np.concatenate(docs), np.concatenate(tfs)
+        keep = self.alive.data[docs]
+        if with_positions:
+            positions = np.concatenate(positions)[np.repeat(keep, tfs)]
+            return docs[keep], tfs[keep], positions
+        return docs[keep], tfs[keep]
+
+    def phrase_postings(self, phrase):
+        """
+        Returns (doc ids, phrase frequencies) for documents containing the
+        words of `phrase` consecutively.
+        """
+        if len(phrase) == 1:
+            return self.postings_for(phrase[0])
+        matches = None
+        for offset, term in enumerate(phrase):
+            docs, tfs, positions = self.postings_for(term, with_positions=True)
+            # One key per occurrence, aligned on where the phrase would start
+            keys = (np.repeat(docs, tfs) << 32) + (positions - offset)
+            matches = keys if matches is None else np.intersect1d(matches, keys, assume_unique=True)
+            if not len(matches):
+                break
+        docs, counts = np.unique(matches >> 32, return_counts=True)
+        return docs, counts
+
+    # --- Search ---
+
+    def _bm25(self, tfs, df, lengths, n_docs, avg_length):
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        norm = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+        return idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+    def search(self, query, k=10, sources=None, since=None, until=None):
+        """
+        Returns up to `k` articles ranked by BM25. Quoted phrases must all
+        appear in an article and are scored as one unit; loose terms add to
+        the score, and when the query has no phrase at least one of them
+        must match. `since`/`until` exclude articles without a known date.
+        """
+        phrases, terms = parse_query(query)
+        with self.lock:
+            n_docs = len(self.doc_ids)
+            if not n_docs or not (phrases or terms):
+                return []
+            avg_length = max(self.total_length / n_docs, 1.0)
+            lengths = self.doc_lengths.data
+            scores = np.zeros(len(self.doc_urls), dtype=np.float64)
+            required = None
+            for phrase in phrases:
+                docs, tfs = self.phrase_postings(phrase)
+                scores[docs] += self._bm25(tfs, len(docs), lengths[docs], n_docs, avg_length)
+                found = np.zeros(len(scores), dtype=np.bool_)
+                found[docs] = True
+                required = found if required is None else required & found
+            for term in terms:
+                docs, tfs = self.postings_for(term)
+                scores[docs] += self._bm25(tfs, len(docs), lengths[docs], n_docs, avg_length)
+
+            candidates = scores > 0
+            if required is not None:
+                candidates &= required
+            if sources:
+                codes = [self.source_codes[source] for source in sources if source in self.source_codes]
+                candidates &= np.isin(self.doc_source_codes.data, codes)
+            if since is not None or until is not None:
+                dates = self.doc_dates.data
+                candidates &= dates != NO_DATE
+                if since is not None:
+                    candidates &= dates >= epoch_seconds(since)
+                if until is not None:
+                    candidates &= dates < epoch_seconds(until)
+
+            docs = np.flatnonzero(candidates)
+            if len(docs) > k:
+                docs = docs[np.argpartition(-scores[docs], k - 1)[:k]]
+            docs = docs[np.argsort(-scores[docs], kind="stable")]
+            return [
+                SearchHit(url=self.doc_urls[doc], source_site=self.doc_sources[doc], score=float(scores[doc]))
+                for doc in docs
+            ]
+
+    # --- Persistence ---
+
+    def save(self, path):
+        """
+        Merges the base segment and the tail into a new base segment,
+        dropping dead documents and renumbering the rest, writes it to the
+        directory `path` (under a temporary name, swapped in when complete)
+        and re-opens it with mmap.
+
+        Only freezing the tail and swapping in the result take the lock;
+        the merge itself runs while adds, deletes and searches go on.
+        Articles added meanwhile stay in a new tail that is carried over.
+        """
+        path = Path(path)
+        with self.save_lock:
+            with self.lock:
+                snapshot = self._freeze()
+            self._write(path, snapshot)
+            merged = TextIndex.load(path)
+            with self.lock:
+                self._swap_in(merged, snapshot)
+
+    def _freeze(self):
+        """
+        Moves the tail to `frozen` and returns what save() merges: the base
+        segment, the frozen tails and a copy of the per-document arrays.
+        """
+        self.frozen.append((self.tail, self.tail_base))
+        self.tail = defaultdict(_TailPostings)
+        self.tail_base = n_docs = len(self.doc_urls)
+        return SimpleNamespace(
+            n_docs=n_docs,
+            term_ids=self.term_ids,
+            term_df=self.term_df,
+            postings=self.postings,
+            positions=self.positions,
+            term_offsets=self.term_offsets,
+            position_offsets=self.position_offsets,
+            frozen=list(self.frozen),
+            tail=None,
+            alive=self.alive.data.copy(),
+            doc_urls=self.doc_urls[:n_docs],
+            doc_sources=self.doc_sources[:n_docs],
+            doc_lengths=self.doc_lengths.data.copy(),
+            doc_source_codes=self.doc_source_codes.data.copy(),
+            doc_dates=self.doc_dates.data.copy(),
+            sources=list(self.source_codes),
+        )
+
+    def _write(self, path, snapshot):
+        alive = snapshot.alive
+        new_ids = np.cumsum(alive) - 1
+        postings, positions, df = [], [], []
+        term_offsets, position_offsets = [0], [0]
+        terms = sorted(set(snapshot.term_ids).union(*(tail for tail, _ in snapshot.frozen)))
+        kept_terms = []
+        for term in terms:
+            docs, tfs, term_positions = [], [], []
+            for segment_docs, segment_tfs, segment_positions in self._segments(term, snapshot):
+                keep = alive[segment_docs]
+                docs.append(new_ids[segment_docs[keep]])
+                tfs.append(segment_tfs[keep])
+                # Position deltas restart at every document, so they survive dropping documents as they are
+                term_positions.append(decode_varints(segment_positions)[np.repeat(keep, segment_tfs)])
+            docs = np.concatenate(docs)
+            if not len(docs):
+                continue
+            kept_terms.append(term)
+            block = encode_varints(np.concatenate((np.diff(docs, prepend=0), np.concatenate(tfs))))
+            position_block = encode_varints(np.concatenate(term_positions))
+            postings.append(block)
+            positions.append(position_block)
+            df.append(len(docs))
+            term_offsets.append(term_offsets[-1] + len(block))
+            position_offsets.append(position_offsets[-1] + len(position_block))
+
+        live = np.flatnonzero(alive)
+        tmp = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        np.save(tmp / "postings.npy", np.concatenate(postings) if postings else np.empty(0, dtype=np.uint8))
+        np.save(tmp / "positions.npy", np.concatenate(positions) if positions else np.empty(0, dtype=np.uint8))
+        np.save(tmp / "term_offsets.npy", np.asarray(term_offsets, dtype=np.int64))
+        np.save(tmp / "position_offsets.npy", np.asarray(position_offsets, dtype=np.int64))
+        np.save(tmp / "term_df.npy", np.asarray(df, dtype=np.int64))
+        np.save(tmp / "doc_lengths.npy", snapshot.doc_lengths[live])
+        np.save(tmp / "doc_source_codes.npy", snapshot.doc_source_codes[live])
+        np.save(tmp / "doc_dates.npy", snapshot.doc_dates[live])
+        (tmp / "meta.json").write_text(json.dumps({
+            "k1": self.k1,
+            "b": self.b,
+            "terms": kept_terms,
+            "doc_urls": [snapshot.doc_urls[doc] for doc in live],
+            "doc_sources": [snapshot.doc_sources[doc] for doc in live],
+            "sources": snapshot.sources,
+        }))
+
+        old = path.with_name(path.name + ".old")
+        shutil.rmtree(old, ignore_errors=True)
+        if path.exists():
+            path.rename(old)
+        tmp.rename(path)
+        # Searches still reading the old mmaps keep them open after the unlink
+        shutil.rmtree(old, ignore_errors=True)
+
+    def _swap_in(self, merged, snapshot):
+        """
+        Replaces this index's state with the freshly loaded merge, applying
+        the deletes and adds made while it was built.
+        """
+        n_docs = snapshot.n_docs
+        # Documents added during the merge keep their order, shifted down past the dropped ones
+        shift = n_docs - len(merged.doc_urls)
+        live = np.flatnonzero(snapshot.alive)
+        for doc_id in np.flatnonzero(~self.alive.data[live]):
+            merged.alive.data[doc_id] = False
+            merged.doc_ids.pop(merged.doc_urls[doc_id], None)
+        for doc_id in range(n_docs, len(self.doc_urls)):
+            if self.alive.data[doc_id]:
+                merged.doc_ids[self.doc_urls[doc_id]] = doc_id - shift
+        merged.doc_urls.extend(self.doc_urls[n_docs:])
+        merged.doc_sources.extend(self.doc_sources[n_docs:])
+        merged.doc_lengths.extend(self.doc_lengths.data[n_docs:])
+        merged.doc_source_codes.extend(self.doc_source_codes.data[n_docs:])
+        merged.doc_dates.extend(self.doc_dates.data[n_docs:])
+        merged.alive.extend(self.alive.data[n_docs:])
+        merged.tail, merged.tail_base = self.tail, self.tail_base - shift
+        merged.source_codes = self.source_codes
+        merged.total_length = self.total_length
+        merged.lock, merged.save_lock = self.lock, self.save_lock
+        self.__dict__.update(vars(merged))
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text())
+        index = cls(meta["k1"], meta["b"])
+        index._load(path, meta)
+        return index
+
+    def _load(self, path, meta=None):
+        meta = meta or json.loads((path / "meta.json").read_text())
+        self._reset()
+        # Postings stay on disk; only the slices a query touches are paged in
+        self.postings = np.load(path / "postings.npy", mmap_mode="r")
+        self.positions = np.load(path / "positions.npy", mmap_mode="r")
+        self.term_offsets = np.load(path / "term_offsets.npy")
+        self.position_offsets = np.load(path / "position_offsets.npy")
+        self.term_df = np.load(path / "term_df.npy")
+        self.terms = meta["terms"]
+        self.term_ids = {term: term_id for term_id, term in enumerate(self.terms)}
+
+        self.doc_urls = meta["doc_urls"]
+        self.doc_sources = meta["doc_sources"]
+        self.doc_lengths = GrowableArray.from_array(np.load(path / "doc_lengths.npy"))
+        self.doc_source_codes = GrowableArray.from_array(np.load(path / "doc_source_codes.npy"))
+        self.doc_dates = GrowableArray.from_array(np.load(path / "doc_dates.npy"))
+        self.alive = GrowableArray.from_array(np.ones(len(self.doc_urls), dtype=np.bool_))
+        self.doc_ids = {url: doc_id for doc_id, url in enumerate(self.doc_urls)}
+        self.source_codes = {source: code for code, source in enumerate(meta["sources"])}
+        self.total_length = int(self.doc_lengths.data.sum())
+        self.base_docs = self.tail_base = len(self.doc_urls)
@@ -0,0 +1,434 @@
+import json
+import shutil
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+# Rows handled per matrix product when assigning or copying large ranges
+BLOCK_ROWS = 65536
+
+
+class GrowableArray:
+    """
+    Append-only NumPy buffer (1-D, or 2-D with a fixed row width) that
+    doubles its capacity when full, so appends are amortized O(1) and
+    `data` is always a contiguous view.
+    """
+
+    def __init__(self, dtype, width=None, capacity=1024):
+        capacity = max(capacity, 1)
+        self._data = np.empty((capacity,) if width is None else (capacity, width), dtype=dtype)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def data(self):
+        return self._data[:self.size]
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self._data.dtype)
+        needed = self.size + len(values)
+        if needed > len(self._data):
+            capacity = len(self._data)
+            while capacity < needed:
+                capacity *= 2
+            data = np.empty((capacity,) + self._data.shape[1:], dtype=self._data.dtype)
+            data[:self.size] = self._data[:self.size]
+            self._data = data
+        self._data[self.size:needed] = values
+        self.size = needed
+
+    @classmethod
+    def from_array(cls, array):
+        buffer = cls(array.dtype, array.shape[1] if array.ndim == 2 else None, capacity=len(array))
+        buffer.extend(array)
+        return buffer
+
+
+@dataclass
+class SearchHit:
+    url: str
+    source_site: str | None
+    score: float
+
+
+class VectorIndex:
+    """
+    In-process IVF-flat index over L2-normalized float32 chunk vectors
+    (score = inner product = cosine similarity).
+
+    Rows are split into two segments: `base_vectors`, memory-mapped from the
+    last save, and `tail_vectors`, an in-memory buffer for rows inserted
+    since. Until the index is trained, searches are exact over every row.
+    Once `train_threshold` live rows exist, maybe_train() runs spherical
+    k-means to pick `n_lists` centroids, every row is assigned to its
+    nearest centroid's list, and a search only scores the rows of the
+    `n_probe` lists closest to the query.
+
+    Deleting an article marks its rows dead; dead rows are skipped by
+    searches and dropped by the next save(), which also writes rows grouped
+    by list so a probe reads contiguous ranges of the mmap, and renumbers
+    the articles that still have rows.
+    """
+
+    def __init__(self, dim, n_lists=1024, n_probe=16):
+        self.dim = dim
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.lock = threading.RLock()
+        # Held by train() and save(), which renumber or reassign rows; the
+        # lock above only for the steps that touch shared state
+        self.train_lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.base_vectors = np.empty((0, self.dim), dtype=np.float32)
+        self.tail_vectors = GrowableArray(np.float32, self.dim)
+        # Per row: owning article id, live flag, IVF list (-1 before training)
+        self.chunk_articles = GrowableArray(np.int32)
+        self.alive = GrowableArray(np.bool_)
+        self.assignments = GrowableArray(np.int32)
+        self.live = 0
+        self.centroids = None
+        self.lists = []
+        # Per article id: url, source and source code (-1 for no source)
+        self.article_urls = []
+        self.article_sources = []
+        self.article_source_codes = GrowableArray(np.int32)
+        # url -> id of every article known since the load, so a re-added
+        # article gets its id back; article_ids only holds articles with rows
+        self.url_ids = {}
+        self.article_ids = {}
+        self.source_codes = {}
+        # Rows of each article id: base rows grouped by article (CSR offsets
+        # per article id), and (start, end) row ranges added since the load
+        self.base_article_rows = np.empty(0, dtype=np.int64)
+        self.base_article_offsets = np.zeros(1, dtype=np.int64)
+        self.tail_article_rows = {}
+
+    def __len__(self):
+        return self.live
+
+    @property
+    def size(self):
+        return len(self.base_vectors) + len(self.tail_vectors)
+
+    @property
+    def trained(self):
+        return self.centroids is not None
+
+    @property
+    def train_threshold(self):
+        # k-means needs a few dozen points per centroid to produce useful lists
+        return self.n_lists * 39
+
+    # --- Articles ---
+
+    def _article_id(self, url, source):
+        article_id = self.url_ids.get(url)
+        code = -1 if source is None else self.source_codes.setdefault(source, len(self.source_codes))
+        if article_id is None:
+            article_id = len(self.article_urls)
+            self.article_urls.append(url)
+            self.article_sources.append(source)
+            self.article_source_codes.extend([code])
+            self.url_ids[url] = article_id
+        elif source is not None:
+            self.article_sources[article_id] = source
+            self.article_source_codes.data[article_id] = code
+        self.article_ids[url] = article_id
+        return article_id
+
+    def __contains__(self, url):
+        return url in self.article_ids
+
+    # --- Inserts and deletes ---
+
+    def add(self, urls, vectors, sources=None):
+        """
+        Appends one vector per chunk; `urls[i]` (and `sources[i]`) describe
+        the article of `vectors[i]`. Returns the row ids of the new chunks.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of shape (n, {self.dim}), got {vectors.shape}")
+        if len(urls) != len(vectors):
+            raise ValueError(f"Got {len(urls)} urls for {len(vectors)} vectors")
+        sources = sources or [None] * len(urls)
+
+        with self.lock:
+            ids = np.fromiter(
+                (self._article_id(url, source) for url, source in zip(urls, sources)),
+                dtype=np.int32, count=len(urls),
+            )
+            start = self.size
+            self.tail_vectors.extend(vectors)
+            self.chunk_articles.extend(ids)
+            self.alive.extend(np.ones(len(vectors), dtype=np.bool_))
+            self.live += len(vectors)
+            # One row range per run of chunks from the same article
+            bounds = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+            runs = zip(np.append(0, bounds), np.append(bounds, len(ids))) if len(ids) else ()
+            for run_start, run_end in runs:
+                self.tail_article_rows.setdefault(int(ids[run_start]), []).append(
+                    (start + int(run_start), start + int(run_end))
+                )
+            if self.trained:
+                lists = self._nearest_lists(vectors)
+                self.assignments.extend(lists)
+                self._append_to_lists(np.arange(start, self.size, dtype=np.int64), lists)
+            else:
+                self.assignments.extend(np.full(len(vectors), -1, dtype=np.int32))
+        return range(start, start + len(vectors))
+
+    def delete(self, url):
+        """
+        Removes every chunk of an article. Returns the number of chunks removed.
+        """
+        with self.lock:
+            article_id = self.article_ids.pop(url, None)
+            if article_id is None:
+                return 0
+            rows = [np.arange(start, end) for start, end in self.tail_article_rows.pop(article_id, ())]
+            if article_id + 1 < len(self.base_article_offsets):
+                start, end = self.base_article_offsets[article_id], self.base_article_offsets[article_id + 1]
+                rows.append(self.base_article_rows[start:end])
+            if not rows:
+                return 0
+            rows = np.concatenate(rows)
+            rows = rows[self.alive.data[rows]]
+            self.alive.data[rows] = False
+            self.live -= len(rows)
+            return len(rows)
+
+    # --- IVF lists ---
+
+    def _vector_blocks(self, limit=None):
+        """
+        Yields (first row id, vectors) over both segments in BLOCK_ROWS
+        slices, stopping at row `limit` if given.
+        """
+        base = len(self.base_vectors)
+        tail = self.tail_vectors.data
+        if limit is not None:
+            tail = tail[:max(0, limit - base)]
+        for offset, segment in ((0, self.base_vectors[:limit]), (base, tail)):
+            for start in range(0, len(segment), BLOCK_ROWS):
+                yield offset + start, segment[start:start + BLOCK_ROWS]
+
+    def _gather(self, rows):
+        base = len(self.base_vectors)
+        if not base:
+            return self.tail_vectors.data[rows]
+        in_base = rows < base
+        vectors = np.empty((len(rows), self.dim), dtype=np.float32)
+        vectors[in_base] = self.base_vectors[rows[in_base]]
+        vectors[~in_base] = self.tail_vectors.data[rows[~in_base] - base]
+        return vectors
+
+    def _nearest_lists(self, vectors, centroids=None):
+        centroids = self.centroids if centroids is None else centroids
+        lists = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), BLOCK_ROWS):
+            block = vectors[start:start + BLOCK_ROWS]
+            lists[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return lists
+
+    def _append_to_lists(self, rows, lists):
+        order = np.argsort(lists, kind="stable")
+        rows, lists = rows[order], lists[order]
+        list_ids, starts = np.unique(lists, return_index=True)
+        ends = np.append(starts[1:], len(lists))
+        for list_id, start, end in zip(list_ids, starts, ends):
+            self.lists[list_id].extend(rows[start:end])
+
+    def maybe_train(self):
+        """
+        Trains the IVF lists once `train_threshold` live rows exist. Returns
+        False without waiting when already trained or training elsewhere.
+        """
+        if self.trained or self.live < self.train_threshold:
+            return False
+        if not self.train_lock.acquire(blocking=False):
+            return False
+        try:
+            if self.trained:
+                return False
+            self.train()
+            return True
+        finally:
+            self.train_lock.release()
+
+    def train(self, iterations=10, seed=0):
+        """
+        Runs spherical k-means over a sample of live rows, then assigns every
+        row to its nearest centroid. The index lock is only held to take the
+        sample and to install the lists, so adds, deletes and searches carry
+        on meanwhile; rows added during training are assigned at the end.
+        """
+        with self.train_lock:
+            with self.lock:
+                rng = np.random.default_rng(seed)
+                live_rows = np.flatnonzero(self.alive.data)
+                sample_rows = np.sort(rng.choice(live_rows, size=min(len(live_rows), self.n_lists * 256), replace=False))
+                sample = self._gather(sample_rows)
+                trained_rows = self.size
+            n_lists = min(self.n_lists, len(sample))
+
+            centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)]
+            for _ in range(iterations):
+                assigned = self._nearest_lists(sample, centroids)
+                order = np.argsort(assigned, kind="stable")
+                list_ids, starts = np.unique(assigned[order], return_index=True)
+                sums = sample[rng.choice(len(sample), size=n_lists)]  # re-seeds lists left empty
+                sums[list_ids] = np.add.reduceat(sample[order], starts, axis=0)
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                centroids = np.ascontiguousarray(sums / np.maximum(norms, 1e-12), dtype=np.float32)
+
+            # Rows below trained_rows never change, and save() cannot renumber them while train_lock is held
+            assignments = np.empty(trained_rows, dtype=np.int32)
+            for start, block in self._vector_blocks(trained_rows):
+                assignments[start:start + len(block)] = self._nearest_lists(block, centroids)
+
+            with self.lock:
+                added = self._gather(np.arange(trained_rows, self.size, dtype=np.int64))
+                assignments = np.concatenate((assignments, self._nearest_lists(added, centroids)))
+                self.centroids = centroids
+                self.lists = [GrowableArray(np.int64, capacity=64) for _ in range(n_lists)]
+                self.assignments = GrowableArray.from_array(assignments)
+                live_rows = np.flatnonzero(self.alive.data)
+                self._append_to_lists(live_rows.astype(np.int64), assignments[live_rows])
+
+    # --- Search ---
+
+    def search(self, query, k=10, sources=None, n_probe=None):
+        """
+        Returns up to `k` articles ranked by their best-matching chunk,
+        optionally restricted to articles from `sources`.
+        """
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        with self.lock:
+            if self.trained:
+                n_probe = min(n_probe or self.n_probe, len(self.centroids))
+                probed = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+                rows = np.concatenate([self.lists[list_id].data for list_id in probed])
+                rows = rows[self.alive.data[rows]]
+                scores = None
+            else:
+                # Exact search: one matrix-vector product per segment, no gather
+                scores = np.concatenate([self.base_vectors @ query, self.tail_vectors.data @ query])
+                rows = np.flatnonzero(self.alive.data)
+                scores = scores[rows]
+
+            articles = self.chunk_articles.data[rows]
+            if sources:
+                codes = [self.source_codes[source] for source in sources if source in self.source_codes]
+                keep = np.isin(self.article_source_codes.data[articles], codes)
+                rows, articles = rows[keep], articles[keep]
+                if scores is not None:
+                    scores = scores[keep]
+            if not len(rows):
+                return []
+            if scores is None:
+                scores = self._gather(rows) @ query
+
+            # Rank chunks, then keep each article's first (best) chunk
+            order = np.argsort(-scores, kind="stable")
+            _, first = np.unique(articles[order], return_index=True)
+            best = order[np.sort(first)[:k]]
+            return [
+                SearchHit(
+                    url=self.article_urls[articles[position]],
+                    source_site=self.article_sources[articles[position]],
+                    score=float(scores[position]),
+                )
+                for position in best
+            ]
+
+    # --- Persistence ---
+
+    def save(self, path):
+        """
+        Writes the live rows to the directory `path`, grouped by IVF list,
+        then re-opens the vectors from the new files with mmap. The directory
+        is written under a temporary name and swapped in when complete.
+        """
+        path = Path(path)
+        with self.train_lock, self.lock:
+            rows = np.flatnonzero(self.alive.data)
+            if self.trained:
+                rows = rows[np.argsort(self.assignments.data[rows], kind="stable")]
+
+            tmp = path.with_name(path.name + ".tmp")
+            shutil.rmtree(tmp, ignore_errors=True)
+            tmp.mkdir(parents=True)
+            vectors = np.lib.format.open_memmap(tmp / "vectors.npy", mode="w+", dtype=np.float32,
+                                                shape=(len(rows), self.dim))
+            for start in range(0, len(rows), BLOCK_ROWS):
+                vectors[start:start + BLOCK_ROWS] = self._gather(rows[start:start + BLOCK_ROWS])
+            vectors.flush()
+            del vectors
+            # Only articles with live rows are kept, renumbered in id order
+            kept, chunk_articles = np.unique(self.chunk_articles.data[rows], return_inverse=True)
+            np.save(tmp / "chunk_articles.npy", chunk_articles.astype(np.int32))
+            np.save(tmp / "assignments.npy", self.assignments.data[rows])
+            np.save(tmp / "article_source_codes.npy", self.article_source_codes.data[kept])
+            if self.trained:
+                np.save(tmp / "centroids.npy", self.centroids)
+            (tmp / "meta.json").write_text(json.dumps({
+                "dim": self.dim,
+                "n_lists": self.n_lists,
+                "n_probe": self.n_probe,
+                "article_urls": [self.article_urls[article_id] for article_id in kept],
+                "article_sources": [self.article_sources[article_id] for article_id in kept],
+                "sources": list(self.source_codes),
+            }))
+
+            old = path.with_name(path.name + ".old")
+            shutil.rmtree(old, ignore_errors=True)
+            if path.exists():
+                path.rename(old)
+            tmp.rename(path)
+            # Pages of the previous mmap stay valid until they are unmapped
+            shutil.rmtree(old, ignore_errors=True)
+            self._load(path)
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text())
+        index = cls(meta["dim"], meta["n_lists"], meta["n_probe"])
+        index._load(path, meta)
+        return index
+
+    def _load(self, path, meta=None):
+        meta = meta or json.loads((path / "meta.json").read_text())
+        self._reset()
+        self.base_vectors = np.load(path / "vectors.npy", mmap_mode="r")
+        self.chunk_articles = GrowableArray.from_array(np.load(path / "chunk_articles.npy"))
+        self.alive = GrowableArray.from_array(np.ones(len(self.base_vectors), dtype=np.bool_))
+        self.live = len(self.base_vectors)
+        self.assignments = GrowableArray.from_array(np.load(path / "assignments.npy"))
+
+        self.article_urls = meta["article_urls"]
+        self.article_sources = meta["article_sources"]
+        self.article_source_codes = GrowableArray.from_array(np.load(path / "article_source_codes.npy"))
+        self.source_codes = {source: code for code, source in enumerate(meta["sources"])}
+        # Indexes saved before articles were renumbered also list articles
+        # without rows, possibly under several ids per url
+        self.article_ids = {self.article_urls[article_id]: int(article_id)
+                            for article_id in np.unique(self.chunk_articles.data)}
+        self.url_ids = {url: article_id for article_id, url in enumerate(self.article_urls)}
+        self.url_ids.update(self.article_ids)
+        counts = np.bincount(self.chunk_articles.data, minlength=len(self.article_urls))
+        self.base_article_rows = np.argsort(self.chunk_articles.data, kind="stable").astype(np.int64)
+        self.base_article_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+        if (path / "centroids.npy").exists():
+            self.centroids = np.load(path / "centroids.npy")
+            self.lists = [GrowableArray(np.int64, capacity=64) for _ in range(len(self.centroids))]
+            self._append_to_lists(np.arange(self.size, dtype=np.int64), self.assignments.data)
@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class Article(BaseModel):
+    url: str
+    title: str
+    content: str
+    source_site: str | None = None
+    # Used by date-filtered searches
+    publication_date: datetime | None = None
+    # Set by the processing service: near-duplicate cluster, and the LLM
+    # summary and tags (representatives of a cluster only)
+    cluster_id: str | None = None
+    summary: str | None = None
+    tags: list[str] = []
+
+
+class SearchResult(BaseModel):
+    url: str
+    source_site: str | None
+    score: float
+
+
+class SearchResponse(BaseModel):
+    query: str
+    took_ms: float
+    results: list[SearchResult]
+
+
+class StoredArticle(BaseModel):
+    """
+    An article from the scraper's news_articles collection, as listed.
+    """
+    id: str
+    url: str
+    source_site: str | None = None
+    headline: str | None = None
+    authors: list[str] = []
+    publication_date: datetime | None = None
+    section: str | None = None
+    keywords: list[str] = []
+    canonical_url: str | None = None
+
+
+class StoredArticleDetail(StoredArticle):
+    author: str | None = None
+    body_text: str | None = None
+    source_id: str | None = None
+    content_hash: str | None = None
+
+
+class ArticlePage(BaseModel):
+    items: list[StoredArticle]
+    # Pass as ?cursor= to get the next page; None on the last page
+    next_cursor: str | None
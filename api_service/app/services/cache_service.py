@@ -0,0 +1,320 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from app.core.config import get_settings
+
+# Tags a cached response can carry; ingesting an article invalidates the
+# ones it affects (see ResponseCache.invalidate_articles)
+ALL_ARTICLES = "articles"
+SEARCH = "search"
+
+
+def source_tag(source_site):
+    return f"source:{source_site}"
+
+
+def url_tag(url):
+    return f"url:{url}"
+
+
+class MemoryBackend:
+    """
+    In-process TTL + LRU store. Tag versions are kept apart from the
+    entries so LRU eviction can never drop a version while entries that
+    depend on it are still cached.
+    """
+    name = "memory"
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.evictions = 0
+
+    async def get(self, key):
+        item = self.entries.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key, value, ttl):
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_versions(self, tags):
+        now = time.monotonic()
+        versions = {}
+        for tag in tags:
+            item = self.versions.get(tag)
+            versions[tag] = item[1] if item and item[0] > now else None
+        return versions
+
+    async def set_versions(self, tags, version, ttl):
+        now = time.monotonic()
+        if len(self.versions) > 2 * self.max_entries:
+            self.versions = {tag: item for tag, item in self.versions.items() if item[0] > now}
+        for tag in tags:
+            self.versions[tag] = (now + ttl, version)
+
+    def stats(self):
+        return {"entries": len(self.entries), "tag_versions": len(self.versions), "evictions": self.evictions}
+
+    async def close(self):
+        pass
+
+
+class SQLiteBackend:
+    """
+    Cache shared by every worker process on the host, in one SQLite file
+    (WAL, so readers do not block the writer). It stands in for a network
+    cache such as Redis and implements the same five calls as
+    MemoryBackend, so either can be swapped in. Values are stored as JSON.
+    """
+    name = "sqlite"
+
+    def __init__(self, path, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS tag_versions (tag TEXT PRIMARY KEY, version TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+        self.lock = threading.Lock()
+        self.writes = 0
+
+    def _get(self, key):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set(self, key, value, ttl):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now + ttl),
+            )
+            self.writes += 1
+            if self.writes % 1000 == 0:
+                self._prune(now)
+            self.conn.commit()
+
+    def _prune(self, now):
+        self.conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        self.conn.execute("DELETE FROM tag_versions WHERE expires_at <= ?", (now,))
+        # Over the cap, drop the entries closest to expiry
+        self.conn.execute(
+            "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY expires_at "
+            "LIMIT max(0, (SELECT COUNT(*) FROM entries) - ?))",
+            (self.max_entries,),
+        )
+
+    def _get_versions(self, tags):
+        now = time.time()
+        with self.lock:
+            found = dict(self.conn.execute(
+                f"SELECT tag, version FROM tag_versions WHERE expires_at > ? AND tag IN ({','.join('?' * len(tags))})",
+                (now, *tags),
+            ).fetchall())
+        return {tag: found.get(tag) for tag in tags}
+
+    def _set_versions(self, tags, version, ttl):
+        expires_at = time.time() + ttl
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO tag_versions (tag, version, expires_at) VALUES (?, ?, ?)",
+                ((tag, version, expires_at) for tag in tags),
+            )
+            self.conn.commit()
+
+    async def get(self, key):
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key, value, ttl):
+        await asyncio.to_thread(self._set, key, value, ttl)
+
+    async def get_versions(self, tags):
+        return await asyncio.to_thread(self._get_versions, list(tags)) if tags else {}
+
+    async def set_versions(self, tags, version, ttl):
+        await asyncio.to_thread(self._set_versions, list(tags), version, ttl)
+
+    def stats(self):
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {"entries": entries, "path": self.path}
+
+    async def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+@dataclass
+class CachedResponse:
+    body: object
+    etag: str
+    hit: bool = False
+
+
+def issued_at(version):
+    """
+    Wall-clock time at which invalidate() issued a tag version, or 0 for a
+    tag that was never invalidated (or whose version has expired).
+    """
+    issued, separator, _ = (version or "").partition(":")
+    return float(issued) if separator else 0.0
+
+
+def etag_for(body):
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha1(canonical.encode("utf-8")).hexdigest() + '"'
+
+
+class ResponseCache:
+    """
+    Caches JSON-ready response bodies for `ttl` seconds.
+
+    Each entry records the version of every tag it depends on (e.g. the
+    sources it lists). Invalidating a tag gives it a new version, so
+    entries stored under the old one miss on their next read; nothing has
+    to be found and deleted, which also works unchanged with a shared
+    backend. Concurrent misses for the same key wait for one computation
+    instead of all hitting the database.
+    """
+
+    def __init__(self, backend, ttl=30.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.inflight = {}
+        self.counts = Counter()
+
+    @staticmethod
+    def key(namespace, params):
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return f"{namespace}:{digest}"
+
+    async def fetch(self, namespace, params, compute, tags=()):
+        """
+        Returns a CachedResponse for `params`, calling `compute()` (async,
+        returning a JSON-ready body) on a miss. `tags` is a list, or a
+        function of the computed body for tags only known from the result.
+        Exceptions from `compute` are raised and not cached.
+        """
+        if self.ttl <= 0:
+            body = await compute()
+            return CachedResponse(body, etag_for(body))
+        key = self.key(namespace, params)
+        entry = await self.backend.get(key)
+        if entry is not None:
+            current = await self.backend.get_versions(list(entry["versions"]))
+            if current == entry["versions"]:
+                self.counts["hits"] += 1
+                return CachedResponse(entry["body"], entry["etag"], hit=True)
+            self.counts["stale"] += 1
+        self.counts["misses"] += 1
+
+        if key in self.inflight:
+            return await asyncio.shield(self.inflight[key])
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            # Versions are read before computing, so an invalidation that
+            # lands during the computation makes this entry stale at once.
+            # Tags only known from the body are read after it, so the entry
+            # is not stored if one of them was invalidated since the start
+            started = time.time()
+            versions = await self.backend.get_versions(list(tags)) if not callable(tags) else {}
+            body = await compute()
+            response = CachedResponse(body, etag_for(body))
+            if callable(tags):
+                versions = await self.backend.get_versions(list(tags(body)))
+            if not callable(tags) or all(issued_at(version) < started for version in versions.values()):
+                await self.backend.set(key, {"body": body, "etag": response.etag, "versions": versions}, self.ttl)
+            future.set_result(response)
+            return response
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved when no other request was waiting for it
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            del self.inflight[key]
+
+    async def invalidate(self, tags):
+        if not tags:
+            return
+        self.counts["invalidations"] += 1
+        # Outlive every entry that may still carry the previous version
+        await self.backend.set_versions(set(tags), f"{time.time()!r}:{uuid.uuid4().hex}", self.ttl + 60)
+
+    async def invalidate_articles(self, articles):
+        """
+        Called when articles are ingested: drops every cached listing that
+        could include them, their cached detail pages and cached searches.
+        """
+        tags = {ALL_ARTICLES, SEARCH}
+        for article in articles:
+            tags.add(url_tag(article.url))
+            if article.source_site:
+                tags.add(source_tag(article.source_site))
+        await self.invalidate(tags)
+
+    def stats(self):
+        lookups = self.counts["hits"] + self.counts["misses"]
+        return {
+            "backend": self.backend.name,
+            "ttl_seconds": self.ttl,
+            "hits": self.counts["hits"],
+            "misses": self.counts["misses"],
+            "stale": self.counts["stale"],
+            "hit_rate": self.counts["hits"] / lookups if lookups else None,
+            "invalidations": self.counts["invalidations"],
+            **self.backend.stats(),
+        }
+
+    async def close(self):
+        await self.backend.close()
+
+
+def create_cache_backend(settings):
+    if settings.cache_backend == "memory":
+        return MemoryBackend(settings.cache_max_entries)
+    if settings.cache_backend == "sqlite":
+        return SQLiteBackend(settings.cache_path, settings.cache_max_entries)
+    raise ValueError(f"Unknown cache backend: {settings.cache_backend!r}")
+
+
+@lru_cache
+def get_response_cache():
+    settings = get_settings()
+    # A zero TTL turns caching off; every lookup then misses
+    ttl = settings.cache_ttl_seconds if settings.cache_enabled else 0
+    return ResponseCache(create_cache_backend(settings), ttl=ttl)
@@ -0,0 +1,261 @@
+import hashlib
+import json
+import re
+import shutil
+import threading
+import zlib
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+
+# Mersenne prime 2**31 - 1: (a * x + b) stays below 2**63 for 32-bit shingle
+# hashes and a, b < 2**31, so the universal hash never overflows uint64
+MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+
+
+def shingle_hashes(text, size=5):
+    """
+    Returns the distinct CRC32 hashes of the `size`-word shingles of a text,
+    after lower-casing and dropping punctuation.
+    """
+    words = _WORD.findall((text or "").lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    if len(words) < size:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+                       dtype=np.uint64, count=len(shingles))
+
+
+class MinHasher:
+    """
+    MinHash signatures with `num_perm` seeded universal hash functions.
+    Two signatures agree at a position with probability equal to the
+    Jaccard similarity of the underlying shingle sets.
+    """
+
+    def __init__(self, num_perm=128, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, hashes):
+        if not len(hashes):
+            return None
+        permuted = (self.a[:, None] * hashes[None, :] + self.b[:, None]) % MERSENNE_PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+
+def similarity(left, right):
+    """
+    Estimated Jaccard similarity of two MinHash signatures.
+    """
+    return float(np.count_nonzero(left == right)) / len(left)
+
+
+@dataclass
+class DedupResult:
+    url: str
+    cluster_id: str
+    # First article seen in the cluster; only it needs embedding and LLM work
+    representative_url: str
+    # Estimated Jaccard similarity to the representative
+    similarity: float = 1.0
+
+    @property
+    def is_duplicate(self):
+        return self.url != self.representative_url
+
+
+class DedupService:
+    """
+    Clusters near-duplicate articles (the same wire story published by
+    several sources) with MinHash + LSH banding.
+
+    Signatures are cut into `bands` bands of `num_perm // bands` rows; two
+    articles become candidates when any band matches exactly, so a lookup
+    touches a handful of buckets instead of every stored article. Candidates
+    are confirmed against `threshold` using the full signature.
+
+    Only the `max_articles` most recently assigned articles are kept in the
+    buckets, since wire copies arrive within days of each other. A cluster
+    keeps its representative as long as any of its articles is kept.
+    save() and load() persist the kept signatures and clusters across
+    restarts; the buckets are rebuilt from the signatures.
+    """
+
+    def __init__(self, num_perm=128, bands=16, threshold=0.8, shingle_size=5, max_articles=200_000):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.max_articles = max_articles
+        # url -> (signature, cluster_id), least recently assigned first
+        self.entries = OrderedDict()
+        self.buckets = [defaultdict(set) for _ in range(bands)]
+        self.representatives = {}
+        self.cluster_sizes = Counter()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _index(self, url, signature):
+        for band, key in enumerate(self._band_keys(signature)):
+            self.buckets[band][key].add(url)
+
+    def _unindex(self, url, signature):
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self.buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(url)
+                if not bucket:
+                    del self.buckets[band][key]
+
+    def _add(self, url, signature, cluster_id):
+        self.entries[url] = (signature, cluster_id)
+        self.cluster_sizes[cluster_id] += 1
+        self._index(url, signature)
+
+    def _remove(self, url):
+        signature, cluster_id = self.entries.pop(url)
+        self._unindex(url, signature)
+        self.cluster_sizes[cluster_id] -= 1
+        if self.cluster_sizes[cluster_id] <= 0:
+            del self.cluster_sizes[cluster_id]
+            self.representatives.pop(cluster_id, None)
+
+    def _best_match(self, signature):
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self.buckets[band].get(key, ()))
+        best_url, best_score = None, 0.0
+        for candidate in candidates:
+            score = similarity(signature, self.entries[candidate][0])
+            if score > best_score:
+                best_url, best_score = candidate, score
+        return best_url, best_score
+
+    def _similarity_to(self, url, signature, default):
+        entry = self.entries.get(url)
+        return similarity(signature, entry[0]) if entry is not None else default
+
+    def assign(self, url, text):
+        """
+        Returns the cluster of an article, joining the cluster of the most
+        similar stored article if it is at least `threshold` similar, or
+        starting a new cluster. An article that is already known keeps its
+        cluster (an edited story is still the same story) and has its
+        signature refreshed.
+        """
+        signature = self.hasher.signature(shingle_hashes(text, self.shingle_size))
+        with self.lock:
+            previous = self.entries.get(url)
+            if previous is not None:
+                cluster_id = previous[1]
+                representative = self.representatives[cluster_id]
+                if signature is None:
+                    signature = previous[0]
+                else:
+                    self._unindex(url, previous[0])
+                    self._index(url, signature)
+                    self.entries[url] = (signature, cluster_id)
+                self.entries.move_to_end(url)
+                score = 1.0 if representative == url else self._similarity_to(representative, signature, self.threshold)
+                return DedupResult(url, cluster_id, representative, score)
+
+            if signature is None:
+                # Nothing to compare (no text): a cluster of one that is never indexed
+                return DedupResult(url, cluster_id_for(url), url)
+
+            match_url, score = self._best_match(signature)
+            if match_url is not None and score >= self.threshold:
+                cluster_id = self.entries[match_url][1]
+                representative = self.representatives[cluster_id]
+                result = DedupResult(url, cluster_id, representative, self._similarity_to(representative, signature, score))
+            else:
+                cluster_id = cluster_id_for(url)
+                self.representatives[cluster_id] = url
+                result = DedupResult(url, cluster_id, url)
+
+            self._add(url, signature, cluster_id)
+            while len(self.entries) > self.max_articles:
+                self._remove(next(iter(self.entries)))
+            return result
+
+    # --- Persistence ---
+
+    def save(self, path):
+        """
+        Writes the kept signatures and clusters, least recently assigned
+        first, to the directory `path`. The directory is written under a
+        temporary name and swapped in when complete.
+        """
+        path = Path(path)
+        with self.lock:
+            urls = list(self.entries)
+            signatures = np.array([signature for signature, _ in self.entries.values()], dtype=np.uint32)
+            clusters = [cluster_id for _, cluster_id in self.entries.values()]
+            representatives = dict(self.representatives)
+
+        tmp = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        np.save(tmp / "signatures.npy", signatures.reshape(len(urls), self.hasher.num_perm))
+        (tmp / "meta.json").write_text(json.dumps({
+            "num_perm": self.hasher.num_perm,
+            "shingle_size": self.shingle_size,
+            "urls": urls,
+            "clusters": clusters,
+            "representatives": representatives,
+        }))
+
+        old = path.with_name(path.name + ".old")
+        shutil.rmtree(old, ignore_errors=True)
+        if path.exists():
+            path.rename(old)
+        tmp.rename(path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path, num_perm=128, bands=16, threshold=0.8, shingle_size=5, max_articles=200_000):
+        """
+        Restores a saved service. Signatures are only comparable under the
+        same permutations and shingles, so `num_perm` and `shingle_size`
+        must match the saved ones; the other settings may change.
+        """
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text())
+        if meta["num_perm"] != num_perm or meta["shingle_size"] != shingle_size:
+            raise ValueError(
+                f"Dedup state at {path} uses {meta['num_perm']} permutations and {meta['shingle_size']}-word "
+                f"shingles, but {num_perm} and {shingle_size} are configured"
+            )
+        service = cls(num_perm, bands, threshold, shingle_size, max_articles)
+        signatures = np.load(path / "signatures.npy")
+        # Keep the most recently assigned articles if max_articles shrank
+        keep = max(0, len(signatures) - max_articles)
+        for url, signature, cluster_id in zip(meta["urls"][keep:], signatures[keep:], meta["clusters"][keep:]):
+            service._add(url, signature, cluster_id)
+        service.representatives = {
+            cluster_id: url for cluster_id, url in meta["representatives"].items()
+            if cluster_id in service.cluster_sizes
+        }
+        return service
+
+
+def cluster_id_for(url):
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
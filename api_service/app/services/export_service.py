@@ -0,0 +1,168 @@
+import json
+import zlib
+from datetime import datetime
+
+# Everything the scraper stores for an article, in export column order
+EXPORT_FIELDS = [
+    "id", "url", "canonical_url", "source_site", "source_id", "headline", "author", "authors",
+    "publication_date", "section", "keywords", "content_hash", "body_text",
+]
+LIST_FIELDS = frozenset({"authors", "keywords"})
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+class ExportUnavailable(Exception):
+    pass
+
+
+def export_projection(include_body=True):
+    return {name: 1 for name in EXPORT_FIELDS if name != "id" and (include_body or name != "body_text")}
+
+
+async def prefetched(documents):
+    """
+    Pulls the first document right away, so an unreachable database fails
+    the request before a streaming response has started, and returns an
+    iterator over all of them.
+    """
+    first = await anext(documents, None)
+
+    async def iterate():
+        if first is not None:
+            yield first
+        async for document in documents:
+            yield document
+
+    return iterate()
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+async def ndjson_chunks(documents, chunk_bytes=1 << 16):
+    """
+    Serializes documents one per line, yielding ~chunk_bytes pieces.
+    """
+    buffer = []
+    size = 0
+    async for document in documents:
+        line = json.dumps(document, ensure_ascii=False, default=_json_default).encode("utf-8") + b"\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+async def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ExportUnavailable("Parquet and Arrow exports need pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def arrow_schema(fields):
+    pa = _import_pyarrow()
+    types = {"publication_date": pa.timestamp("ms", tz="UTC")}
+    return pa.schema([
+        (name, pa.list_(pa.string()) if name in LIST_FIELDS else types.get(name, pa.string()))
+        for name in fields
+    ])
+
+
+async def record_batches(documents, schema, batch_size):
+    """
+    Groups documents into Arrow record batches of `batch_size` rows.
+    """
+    pa = _import_pyarrow()
+    columns = {name: [] for name in schema.names}
+    rows = 0
+    async for document in documents:
+        for name, values in columns.items():
+            value = document.get(name)
+            # Fields the spiders leave as strings ('N/A' and the like) are exported as null
+            if name == "publication_date" and not isinstance(value, datetime):
+                value = None
+            values.append(value)
+        rows += 1
+        if rows >= batch_size:
+            yield pa.RecordBatch.from_pydict(columns, schema=schema)
+            columns = {name: [] for name in schema.names}
+            rows = 0
+    if rows:
+        yield pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+class _Drain:
+    """
+    Write-only file object for pyarrow writers; `take()` hands over what
+    has been written since the last call.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+        self.position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+async def columnar_chunks(documents, fields, format="parquet", batch_size=1000, compression="zstd"):
+    """
+    Streams documents as a Parquet file (one row group per batch) or an
+    Arrow IPC stream (one record batch per batch). Only the current batch
+    is held in memory, apart from the Parquet footer's row group metadata.
+    """
+    pa = _import_pyarrow()
+    schema = arrow_schema(fields)
+    sink = _Drain()
+    if format == "parquet":
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression=compression)
+    else:
+        writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+    async for batch in record_batches(documents, schema, batch_size):
+        writer.write_batch(batch)
+        data = sink.take()
+        if data:
+            yield data
+    writer.close()
+    yield sink.take()
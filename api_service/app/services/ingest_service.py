@@ -0,0 +1,151 @@
+import zlib
+from dataclasses import dataclass, field
+
+from pydantic import ValidationError
+
+from app.models.article import Article
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class LineTooLong(Exception):
+    pass
+
+
+async def decompressed(chunks, gzip=None, chunk_limit=1 << 20):
+    """
+    Yields the body chunks, gunzipping them when `gzip` is true or, if
+    `gzip` is None, when the body starts with the gzip magic bytes. Output
+    is produced in pieces of at most `chunk_limit` bytes, so a small
+    compressed chunk cannot inflate into one huge allocation.
+    """
+    decoder = None
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        if gzip is None:
+            gzip = chunk.startswith(GZIP_MAGIC)
+        if not gzip:
+            yield chunk
+            continue
+        if decoder is None:
+            decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        data = decoder.decompress(chunk, chunk_limit)
+        while data:
+            yield data
+            data = decoder.decompress(decoder.unconsumed_tail, chunk_limit)
+    if decoder is not None:
+        tail = decoder.flush()
+        if tail:
+            yield tail
+
+
+async def ndjson_lines(chunks, max_line_bytes=1 << 20):
+    """
+    Splits a byte stream into lines without buffering more than one line.
+    Yields (line number, bytes), or (line number, LineTooLong) for lines over
+    `max_line_bytes`, whose remainder is skipped. Blank lines are skipped.
+    """
+    buffer = b""
+    line_number = 0
+    skipping = False
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if skipping:
+                skipping = False
+                continue
+            if len(line) > max_line_bytes:
+                yield line_number, LineTooLong(f"line is longer than {max_line_bytes} bytes")
+            elif line.strip():
+                yield line_number, line
+        if len(buffer) > max_line_bytes and not skipping:
+            yield line_number + 1, LineTooLong(f"line is longer than {max_line_bytes} bytes")
+            skipping = True
+        if skipping:
+            buffer = b""
+    if buffer.strip() and not skipping:
+        yield line_number + 1, buffer
+
+
+@dataclass
+class BulkResult:
+    accepted: int = 0
+    rejected: int = 0
+    job_ids: list = field(default_factory=list)
+    # [first line, last line] of the rows in each job, parallel to job_ids
+    job_lines: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+    max_errors: int = 50
+    # Set when the body itself could not be read; rows after that point are lost
+    aborted: str | None = None
+
+    def reject(self, line_number, error):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line_number, "error": error})
+
+    def as_dict(self):
+        return {
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "jobs": self.job_ids,
+            "job_lines": self.job_lines,
+            "errors": self.errors,
+            "errors_truncated": self.rejected > len(self.errors),
+            "aborted": self.aborted,
+        }
+
+
+def validation_message(error):
+    first = error.errors()[0]
+    location = ".".join(str(part) for part in first["loc"])
+    return f"{location}: {first['msg']}" if location else first["msg"]
+
+
+async def ingest_ndjson(chunks, job_queue, batch_size=100, gzip=None, max_line_bytes=1 << 20, on_batch=None):
+    """
+    Validates an NDJSON stream of articles row by row and enqueues the
+    valid ones in jobs of `batch_size` articles as soon as each batch is
+    full. Waiting for queue space slows down reading the request body,
+    which pushes back on the client instead of buffering the upload.
+    `on_batch(articles)` is awaited before each batch is enqueued.
+
+    If the body turns out not to be valid gzip, reading stops there but the
+    rows validated so far are still enqueued; `result.aborted` is set and
+    `result.job_lines` says which rows were queued.
+    """
+    result = BulkResult()
+    batch = []
+    first_line = None
+
+    async def enqueue(batch, last_line):
+        if on_batch is not None:
+            await on_batch(batch)
+        result.job_ids.append((await job_queue.put(batch)).id)
+        result.job_lines.append([first_line, last_line])
+
+    try:
+        async for line_number, line in ndjson_lines(decompressed(chunks, gzip), max_line_bytes):
+            if isinstance(line, LineTooLong):
+                result.reject(line_number, str(line))
+                continue
+            try:
+                batch.append(Article.model_validate_json(line))
+            except ValidationError as e:
+                result.reject(line_number, validation_message(e))
+                continue
+            result.accepted += 1
+            last_line = line_number
+            if first_line is None:
+                first_line = line_number
+            if len(batch) >= batch_size:
+                await enqueue(batch, last_line)
+                batch, first_line = [], None
+    except zlib.error as e:
+        result.aborted = f"Invalid gzip data: {e}"
+    if batch:
+        await enqueue(batch, last_line)
+    return result
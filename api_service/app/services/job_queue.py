@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    payload: object
+    status: str = QUEUED
+    # Free-form progress reported by the handler, e.g. {"stage": "embedding", "done": 3, "total": 8};
+    # "done" once the job has finished, and left at the failing stage if it failed
+    progress: dict = field(default_factory=dict)
+    result: object = None
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    def update_progress(self, stage, done=None, total=None):
+        self.progress = {"stage": stage, "done": done, "total": total}
+
+    def as_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class JobQueue:
+    """
+    In-process job queue: `submit` stores the payload and returns a Job
+    immediately, and `workers` asyncio tasks run `handler(job)` for queued
+    jobs in order. The handler is expected to push CPU-bound work off the
+    event loop (threads or a process pool).
+
+    At most `max_queued` jobs wait at once; beyond that `submit` raises
+    QueueFullError so callers can shed load. Finished jobs stay queryable
+    until `retention` newer jobs have been submitted.
+    """
+
+    def __init__(self, handler, workers=4, max_queued=1000, retention=10000, latency_window=1000):
+        self.handler = handler
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize=max_queued)
+        self.jobs = OrderedDict()
+        self.retention = retention
+        self.tasks = []
+        self.running = 0
+        self.counts = {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0}
+        self.wait_times = deque(maxlen=latency_window)
+        self.run_times = deque(maxlen=latency_window)
+
+    def start(self):
+        self.tasks = [asyncio.create_task(self._worker(), name=f"job-worker-{n}") for n in range(self.workers)]
+
+    async def stop(self, timeout=30.0):
+        """
+        Waits up to `timeout` seconds for queued jobs to finish, then cancels the workers.
+        """
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping job queue with {self.queue.qsize()} jobs still queued")
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def submit(self, payload):
+        job = Job(id=uuid.uuid4().hex, payload=payload)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.counts["rejected"] += 1
+            raise QueueFullError(f"Job queue is full ({self.queue.maxsize} jobs waiting)")
+        return self._track(job)
+
+    async def put(self, payload):
+        """
+        Like submit(), but waits for queue space instead of raising QueueFullError.
+        """
+        job = Job(id=uuid.uuid4().hex, payload=payload)
+        await self.queue.put(job)
+        return self._track(job)
+
+    def _track(self, job):
+        self.counts["submitted"] += 1
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.retention:
+            self.jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            job.status = RUNNING
+            job.started_at = time.time()
+            self.wait_times.append(job.started_at - job.created_at)
+            self.running += 1
+            try:
+                job.result = await self.handler(job)
+                total = job.progress.get("total")
+                job.update_progress(DONE, total, total)
+                job.status = DONE
+                self.counts["completed"] += 1
+            except asyncio.CancelledError:
+                job.status = FAILED
+                job.error = "cancelled"
+                raise
+            except Exception as e:
+                job.status = FAILED
+                job.error = f"{type(e).__name__}: {e}"
+                self.counts["failed"] += 1
+                logger.exception(f"Job {job.id} failed")
+            finally:
+                job.finished_at = time.time()
+                self.run_times.append(job.finished_at - job.started_at)
+                # The payload is not needed once the job has run
+                job.payload = None
+                self.running -= 1
+                self.queue.task_done()
+
+    def metrics(self):
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "running": self.running,
+            "workers": self.workers,
+            **{f"jobs_{name}": count for name, count in self.counts.items()},
+            "wait_seconds": {
+                "p50": percentile(self.wait_times, 0.5),
+                "p95": percentile(self.wait_times, 0.95),
+            },
+            "processing_seconds": {
+                "p50": percentile(self.run_times, 0.5),
+                "p95": percentile(self.run_times, 0.95),
+                "max": max(self.run_times, default=None),
+            },
+        }
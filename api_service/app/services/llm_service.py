@@ -0,0 +1,367 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from app.core.config import get_settings
+from app.services.job_queue import percentile
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the prompt or the output format changes; cached results of
+# other versions are then ignored
+PROMPT_VERSION = "summarize-v1"
+
+PROMPT = """Summarize the news article below in at most three sentences and give up to five topic tags.
+Answer with JSON only: {{"summary": "...", "tags": ["...", "..."]}}
+
+Title: {title}
+
+{content}"""
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"[A-Za-z][A-Za-z'-]{3,}")
+STOPWORDS = frozenset(
+    "about after also been before being between could from have into just more most only other over said "
+    "says such than that their them then there these they this those through under were what when where "
+    "which while will with would year years".split()
+)
+
+
+def count_tokens(text):
+    # Whitespace tokens: close enough for accounting, and identical for every backend
+    return len(text.split())
+
+
+@dataclass
+class Completion:
+    text: str
+    tokens_in: int
+    tokens_out: int
+
+
+@dataclass
+class Summary:
+    summary: str
+    tags: list
+    cached: bool = False
+
+    def as_dict(self):
+        return {"summary": self.summary, "tags": self.tags, "cached": self.cached}
+
+
+class StubBackend:
+    """
+    Deterministic local backend for tests and development: the "summary" is
+    the article's first sentences and the tags its most frequent words.
+    """
+    name = "stub"
+    model = "stub"
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    async def complete(self, prompts):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        completions = []
+        for prompt in prompts:
+            content = prompt.split("\n\n", 2)[-1]
+            sentences = [sentence for sentence in _SENTENCE.split(content.strip()) if sentence][:3]
+            words = Counter(word.lower() for word in _WORD.findall(content) if word.lower() not in STOPWORDS)
+            text = json.dumps({"summary": " ".join(sentences), "tags": [word for word, _ in words.most_common(5)]})
+            completions.append(Completion(text, count_tokens(prompt), count_tokens(text)))
+        return completions
+
+    async def close(self):
+        pass
+
+
+class OpenAICompatibleBackend:
+    """
+    Chat-completions backend for any OpenAI-compatible server (a local
+    llama.cpp or vLLM server, or a hosted API). The API has no batch call,
+    so a batch is sent as concurrent requests over one pooled client.
+    """
+    name = "openai"
+
+    def __init__(self, base_url, model, api_key=None, timeout=60.0, max_concurrency=8):
+        import httpx
+
+        self.model = model
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            timeout=timeout,
+            headers={"Authorization": f"Bearer {api_key}"} if api_key else {},
+            limits=httpx.Limits(max_connections=max_concurrency),
+        )
+
+    async def _complete_one(self, prompt):
+        response = await self.client.post("/chat/completions", json={
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0,
+        })
+        response.raise_for_status()
+        body = response.json()
+        usage = body.get("usage") or {}
+        text = body["choices"][0]["message"]["content"]
+        return Completion(
+            text, usage.get("prompt_tokens", count_tokens(prompt)), usage.get("completion_tokens", count_tokens(text))
+        )
+
+    async def complete(self, prompts):
+        return await asyncio.gather(*(self._complete_one(prompt) for prompt in prompts))
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_backend(settings):
+    if settings.llm_backend == "stub":
+        return StubBackend()
+    if settings.llm_backend == "openai":
+        return OpenAICompatibleBackend(
+            settings.llm_base_url, settings.llm_model, settings.llm_api_key, max_concurrency=settings.llm_max_batch_size
+        )
+    raise ValueError(f"Unknown LLM backend: {settings.llm_backend!r}")
+
+
+def parse_summary(text):
+    """
+    Reads the model's JSON answer, tolerating text around the JSON object.
+    """
+    start, end = text.find("{"), text.rfind("}")
+    try:
+        data = json.loads(text[start:end + 1]) if start != -1 else {}
+    except ValueError:
+        data = {}
+    summary = data.get("summary") if isinstance(data.get("summary"), str) else text.strip()
+    tags = [str(tag) for tag in data.get("tags", []) if tag][:5] if isinstance(data.get("tags"), list) else []
+    return Summary(summary, tags)
+
+
+class SummaryCache:
+    """
+    Persistent SQLite cache of summaries keyed by (content hash, prompt
+    version, model), so re-processed articles never pay for inference twice.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            "content_hash TEXT NOT NULL, prompt_version TEXT NOT NULL, model TEXT NOT NULL, "
+            "summary TEXT NOT NULL, tags TEXT NOT NULL, created_at REAL NOT NULL, "
+            "PRIMARY KEY (content_hash, prompt_version, model)"
+            ") WITHOUT ROWID"
+        )
+        self.conn.commit()
+        self.lock = threading.Lock()
+
+    def get_many(self, keys):
+        """
+        Returns {key: Summary} for the cached keys; keys are (content_hash, prompt_version, model).
+        """
+        found = {}
+        with self.lock:
+            for key in keys:
+                row = self.conn.execute(
+                    "SELECT summary, tags FROM summaries WHERE content_hash = ? AND prompt_version = ? AND model = ?",
+                    key,
+                ).fetchone()
+                if row:
+                    found[key] = Summary(row[0], json.loads(row[1]), cached=True)
+        return found
+
+    def set_many(self, entries):
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO summaries "
+                "(content_hash, prompt_version, model, summary, tags, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                ((*key, summary.summary, json.dumps(summary.tags), now) for key, summary in entries.items()),
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def content_hash(title, content):
+    return hashlib.sha256(f"{title}\x1f{content}".encode("utf-8")).hexdigest()
+
+
+class LLMService:
+    """
+    Summarizes articles through a backend with two layers in front of it:
+
+    - the SummaryCache, checked first; identical content is never sent twice,
+      and concurrent requests for the same content share one pending result;
+    - a coalescer that collects cache misses from concurrent callers and
+      sends them to the backend as one batch once `max_batch_size` prompts
+      are waiting or the oldest has waited `max_wait` seconds.
+    """
+
+    def __init__(self, backend, cache, max_batch_size=16, max_wait=0.02, max_input_tokens=2000,
+                 latency_window=1000):
+        self.backend = backend
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_input_tokens = max_input_tokens
+        self.queue = []
+        self.inflight = {}
+        self.flush_task = None
+        # Batch tasks are referenced here until done so they are not garbage-collected
+        self.batch_tasks = set()
+        self.counts = Counter()
+        self.call_latencies = deque(maxlen=latency_window)
+        self.batch_latencies = deque(maxlen=latency_window)
+
+    def cache_key(self, title, content):
+        return content_hash(title, content), PROMPT_VERSION, self.backend.model
+
+    def prompt(self, title, content):
+        words = content.split()
+        if len(words) > self.max_input_tokens:
+            content = " ".join(words[:self.max_input_tokens])
+        return PROMPT.format(title=title, content=content)
+
+    async def summarize_many(self, articles):
+        """
+        Returns {url: Summary} for `articles` (objects with url, title and content).
+        """
+        start = time.perf_counter()
+        keys = {article.url: self.cache_key(article.title, article.content) for article in articles}
+        cached = await asyncio.to_thread(self.cache.get_many, set(keys.values()))
+        self.counts["calls"] += len(articles)
+        self.counts["cache_hits"] += sum(1 for key in keys.values() if key in cached)
+
+        futures = {}
+        for article in articles:
+            key = keys[article.url]
+            if key in cached:
+                continue
+            if key not in self.inflight:
+                self.inflight[key] = asyncio.get_running_loop().create_future()
+                self.queue.append((key, self.prompt(article.title, article.content)))
+            futures[article.url] = self.inflight[key]
+        if futures:
+            self._schedule_flush()
+
+        results = {}
+        for article in articles:
+            key = keys[article.url]
+            # Shielded: the future is shared, and one cancelled caller must not cancel it for the others
+            results[article.url] = cached[key] if key in cached else await asyncio.shield(futures[article.url])
+        self.call_latencies.append(time.perf_counter() - start)
+        return results
+
+    def _schedule_flush(self):
+        if len(self.queue) >= self.max_batch_size:
+            while len(self.queue) >= self.max_batch_size:
+                batch, self.queue = self.queue[:self.max_batch_size], self.queue[self.max_batch_size:]
+                task = asyncio.create_task(self._run_batch(batch))
+                self.batch_tasks.add(task)
+                task.add_done_callback(self.batch_tasks.discard)
+        if self.queue and self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.max_wait)
+        self.flush_task = None
+        while self.queue:
+            batch, self.queue = self.queue[:self.max_batch_size], self.queue[self.max_batch_size:]
+            await self._run_batch(batch)
+
+    async def _run_batch(self, batch):
+        start = time.perf_counter()
+        summaries = {}
+        error = None
+        try:
+            try:
+                completions = await self.backend.complete([prompt for _, prompt in batch])
+            except Exception as e:
+                self.counts["backend_errors"] += 1
+                logger.exception(f"LLM batch of {len(batch)} prompts failed")
+                error = e
+                return
+            self.batch_latencies.append(time.perf_counter() - start)
+            self.counts["batches"] += 1
+            self.counts["prompts"] += len(batch)
+
+            for (key, _), completion in zip(batch, completions):
+                self.counts["tokens_in"] += completion.tokens_in
+                self.counts["tokens_out"] += completion.tokens_out
+                summaries[key] = parse_summary(completion.text)
+            try:
+                await asyncio.to_thread(self.cache.set_many, summaries)
+            except Exception:
+                # The summaries are still handed out, just not cached
+                logger.exception(f"Caching {len(summaries)} LLM summaries failed")
+        finally:
+            # Every waiter gets an answer, even when the batch is cancelled or a
+            # completion is missing, so no summarize() call hangs
+            for key, _ in batch:
+                future = self.inflight.pop(key, None)
+                if future is None or future.done():
+                    continue
+                if key in summaries:
+                    future.set_result(summaries[key])
+                else:
+                    future.set_exception(error or RuntimeError("LLM batch did not complete"))
+                    # Marked retrieved, since callers stop at the first failed article
+                    future.exception()
+
+    def stats(self):
+        calls = self.counts["calls"]
+        return {
+            "backend": self.backend.name,
+            "model": self.backend.model,
+            "prompt_version": PROMPT_VERSION,
+            "calls": calls,
+            "cache_hits": self.counts["cache_hits"],
+            "cache_hit_rate": self.counts["cache_hits"] / calls if calls else None,
+            "batches": self.counts["batches"],
+            "avg_batch_size": self.counts["prompts"] / self.counts["batches"] if self.counts["batches"] else None,
+            "backend_errors": self.counts["backend_errors"],
+            "tokens_in": self.counts["tokens_in"],
+            "tokens_out": self.counts["tokens_out"],
+            "call_seconds": {"p50": percentile(self.call_latencies, 0.5), "p95": percentile(self.call_latencies, 0.95)},
+            "batch_seconds": {"p50": percentile(self.batch_latencies, 0.5), "p95": percentile(self.batch_latencies, 0.95)},
+        }
+
+    async def close(self):
+        if self.flush_task is not None:
+            await self.flush_task
+        await asyncio.gather(*self.batch_tasks, return_exceptions=True)
+        await self.backend.close()
+        self.cache.close()
+
+
+@lru_cache
+def get_llm_service():
+    settings = get_settings()
+    if not settings.llm_enabled:
+        return None
+    return LLMService(
+        create_backend(settings),
+        SummaryCache(settings.llm_cache_path),
+        max_batch_size=settings.llm_max_batch_size,
+        max_wait=settings.llm_max_wait_ms / 1000,
+        max_input_tokens=settings.llm_max_input_tokens,
+    )
@@ -0,0 +1,518 @@
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from datetime import timezone
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.db.text_index import TextIndex
+from app.db.vector_db import SearchHit, VectorIndex
+from app.services.cache_service import SEARCH, get_response_cache
+from app.services.dedup_service import DedupService
+from app.services.llm_service import get_llm_service
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\S+")
+_WORD = re.compile(r"\w+")
+
+
+@dataclass
+class Chunk:
+    url: str
+    source_site: str | None
+    index: int
+    text: str
+
+
+def chunk_text(text, max_tokens=200, overlap=40):
+    """
+    Splits text into chunks of at most `max_tokens` whitespace-delimited
+    tokens, each sharing its first `overlap` tokens with the end of the
+    previous chunk. Chunks are slices of the original text, so punctuation
+    and spacing are kept.
+    """
+    if overlap >= max_tokens:
+        raise ValueError("Chunk overlap must be smaller than the chunk size")
+    spans = [match.span() for match in _TOKEN.finditer(text or "")]
+    chunks = []
+    step = max_tokens - overlap
+    for start in range(0, len(spans), step):
+        window = spans[start:start + max_tokens]
+        chunks.append(text[window[0][0]:window[-1][1]])
+        if start + max_tokens >= len(spans):
+            break
+    return chunks
+
+
+class HashingEmbedder:
+    """
+    Deterministic bag-of-words embedder: each lower-cased word is hashed to
+    a signed bucket of a `dim`-wide vector, which is then L2-normalized.
+    No model download, and identical output across processes and runs,
+    which makes it the default for tests and local development.
+    """
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self._buckets = {}
+
+    def _bucket(self, word):
+        bucket = self._buckets.get(word)
+        if bucket is None:
+            digest = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+            bucket = (digest >> 1) % self.dim, 1.0 if digest & 1 else -1.0
+            if len(self._buckets) < 500_000:
+                self._buckets[word] = bucket
+        return bucket
+
+    def embed(self, texts):
+        rows, cols, signs = [], [], []
+        for row, text in enumerate(texts):
+            for word in _WORD.findall(text.lower()):
+                col, sign = self._bucket(word)
+                rows.append(row)
+                cols.append(col)
+                signs.append(sign)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(vectors, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)),
+                  np.array(signs, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+class SentenceTransformerEmbedder:
+    """
+    Local CPU embedding model via sentence-transformers (optional dependency).
+    """
+
+    def __init__(self, model_name, device="cpu"):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBEDDING_BACKEND=sentence-transformers requires the sentence-transformers package"
+            ) from e
+        self.model = SentenceTransformer(model_name, device=device)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts):
+        vectors = self.model.encode(
+            texts, batch_size=len(texts), convert_to_numpy=True, normalize_embeddings=True
+        )
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+# Embedder of an embedding worker process, built by init_embedding_worker
+_worker_embedder = None
+
+
+def init_embedding_worker(settings):
+    global _worker_embedder
+    _worker_embedder = create_embedder(settings)
+
+
+def embed_in_worker(texts):
+    return _worker_embedder.embed(texts)
+
+
+def create_embedder(settings):
+    if settings.embedding_backend == "hashing":
+        return HashingEmbedder(settings.embedding_dim)
+    if settings.embedding_backend == "sentence-transformers":
+        return SentenceTransformerEmbedder(settings.embedding_model)
+    raise ValueError(f"Unknown embedding backend: {settings.embedding_backend!r}")
+
+
+@dataclass
+class EmbeddingReport:
+    articles: int = 0
+    # Near-duplicates of an already embedded article, skipped
+    duplicates: int = 0
+    chunks: int = 0
+    batches: int = 0
+    batch_size: int = 0
+    seconds: float = 0.0
+
+    @property
+    def chunks_per_sec(self):
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    def add(self, other):
+        self.articles += other.articles
+        self.duplicates += other.duplicates
+        self.chunks += other.chunks
+        self.batches += other.batches
+        self.seconds += other.seconds
+
+    def as_dict(self):
+        return {
+            "articles": self.articles,
+            "duplicates": self.duplicates,
+            "chunks": self.chunks,
+            "batches": self.batches,
+            "batch_size": self.batch_size,
+            "seconds": round(self.seconds, 4),
+            "chunks_per_sec": round(self.chunks_per_sec, 1),
+        }
+
+
+class ProcessingService:
+    """
+    Chunks article content and embeds the chunks into the vector index.
+    Chunks from several articles are pooled into batches of
+    `batch_size`, so a bulk call makes few, large embedder calls.
+    Re-processing an article replaces its previous chunks.
+
+    With a DedupService, every article is tagged with its near-duplicate
+    cluster_id and only the first article of each cluster is embedded and,
+    with an LLMService, summarized. Every article is keyword-indexed, so a
+    search for a syndicated copy's own url or source still finds it.
+    Near-duplicates get the summary and tags of their cluster's first
+    article.
+    """
+    # Clusters whose summary is kept for duplicates arriving in later jobs
+    cluster_summaries_size = 100_000
+
+    def __init__(self, embedder, index, batch_size=256, max_tokens=200, overlap=40, index_path=None,
+                 dedup=None, dedup_path=None, llm=None, cache=None, text_index=None, text_index_path=None, text_merge_docs=20000,
+                 rrf_k=60):
+        self.embedder = embedder
+        self.index = index
+        self.text_index = text_index if text_index is not None else TextIndex()
+        self.text_index_path = text_index_path
+        self.text_merge_docs = text_merge_docs
+        self.rrf_k = rrf_k
+        self.dedup = dedup
+        self.dedup_path = dedup_path
+        self.llm = llm
+        self.cache = cache
+        self.index_path = index_path
+        self.executor = None
+        self.processes = 0
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.totals = EmbeddingReport(batch_size=batch_size)
+        # cluster_id -> (summary, tags) of the cluster's summarized article
+        self.cluster_summaries = OrderedDict()
+
+    def chunk_article(self, article):
+        return [
+            Chunk(article.url, article.source_site, index, text)
+            for index, text in enumerate(chunk_text(article.content, self.max_tokens, self.overlap))
+        ]
+
+    def prepare(self, articles, report):
+        """
+        Tags articles with their near-duplicate cluster and returns the
+        articles that need embedding and their chunks.
+        """
+        unique = []
+        for article in articles:
+            if self.dedup is not None:
+                cluster = self.dedup.assign(article.url, article.content)
+                article.cluster_id = cluster.cluster_id
+                if cluster.is_duplicate:
+                    report.duplicates += 1
+                    continue
+            unique.append(article)
+        return unique, [chunk for article in unique for chunk in self.chunk_article(article)]
+
+    def store(self, unique, chunks, vectors, articles=None):
+        """
+        Replaces the stored chunks of `articles` (default: `unique`) with
+        `chunks`, the chunks of `unique`, in one step, so searches never see
+        an article half re-embedded and an article that has become a
+        near-duplicate loses its own chunks. Then (re-)indexes the text of
+        every article for keyword search.
+        """
+        articles = unique if articles is None else articles
+        with self.index.lock:
+            for article in articles:
+                self.index.delete(article.url)
+            if chunks:
+                self.index.add([chunk.url for chunk in chunks], vectors, [chunk.source_site for chunk in chunks])
+        for article in articles:
+            self.text_index.add(
+                article.url, f"{article.title}\n{article.content}", article.source_site, article.publication_date
+            )
+
+    def merge_text_index(self):
+        """
+        Merges the keyword index's in-memory segment to disk once it holds
+        `text_merge_docs` articles, which bounds its memory use. Searches
+        and other jobs' stores carry on during the merge.
+        """
+        index = self.text_index
+        if self.text_index_path is None or index.tail_docs < self.text_merge_docs:
+            return
+        # A merge already running picks up these articles, or leaves them for the next one
+        if not index.save_lock.acquire(blocking=False):
+            return
+        try:
+            index.save(self.text_index_path)
+        finally:
+            index.save_lock.release()
+        logger.info(f"Merged keyword index ({len(index)} articles) into {self.text_index_path}")
+
+    async def embed(self, texts):
+        executor = self.executor
+        if executor is not None:
+            try:
+                return await asyncio.get_running_loop().run_in_executor(executor, embed_in_worker, texts)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); replace the pool once and embed this batch here
+                if self.executor is executor:
+                    logger.error("Embedding worker pool broke, restarting it")
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self.executor = None
+                    self.start_workers(self.processes)
+        return await asyncio.to_thread(self.embedder.embed, texts)
+
+    async def process_articles(self, articles, progress=None):
+        """
+        Deduplicates, chunks and embeds `articles`, storing every chunk
+        vector. Embedding runs in the worker processes when they are started
+        (see start_workers), everything else in a thread, so the event loop
+        is never blocked. `progress(stage, done, total)` is called as batches
+        complete. Returns an EmbeddingReport for this call.
+        """
+        report = EmbeddingReport(articles=len(articles), batch_size=self.batch_size)
+        if progress:
+            progress("deduplicating")
+        unique, chunks = await asyncio.to_thread(self.prepare, articles, report)
+
+        start = time.perf_counter()
+        vectors = []
+        for offset in range(0, len(chunks), self.batch_size):
+            if progress:
+                progress("embedding", offset, len(chunks))
+            vectors.append(await self.embed([chunk.text for chunk in chunks[offset:offset + self.batch_size]]))
+            report.batches += 1
+        if progress:
+            progress("storing", len(chunks), len(chunks))
+        vectors = np.concatenate(vectors) if vectors else np.empty((0, self.embedder.dim), dtype=np.float32)
+        await asyncio.to_thread(self.store, unique, chunks, vectors, articles)
+        if await asyncio.to_thread(self.index.maybe_train):
+            logger.info(f"Trained vector index lists over {len(self.index)} chunks")
+        await asyncio.to_thread(self.merge_text_index)
+        if self.cache is not None:
+            # Searches cached before the store could miss these articles
+            await self.cache.invalidate([SEARCH])
+        report.chunks = len(chunks)
+        report.seconds = time.perf_counter() - start
+
+        self.totals.add(report)
+        logger.info(
+            f"Embedded {report.chunks} chunks from {report.articles - report.duplicates} articles "
+            f"({report.duplicates} near-duplicates skipped) in {report.batches} batches "
+            f"({report.chunks_per_sec:.1f} chunks/sec)"
+        )
+
+        if self.llm is not None and unique:
+            if progress:
+                progress("summarizing", 0, len(unique))
+            await self.summarize(unique)
+        if self.llm is not None:
+            self.share_summaries(articles)
+        return report
+
+    async def summarize(self, articles):
+        """
+        Sets summary and tags on `articles`. A failing LLM backend is logged
+        and leaves them unset; the embeddings are already stored.
+        """
+        try:
+            summaries = await self.llm.summarize_many(articles)
+        except Exception:
+            logger.exception(f"Summarizing {len(articles)} articles failed")
+            return
+        for article in articles:
+            article.summary = summaries[article.url].summary
+            article.tags = summaries[article.url].tags
+
+    def share_summaries(self, articles):
+        """
+        Records the summaries of summarized articles by cluster and copies
+        them onto near-duplicates, including duplicates of an article
+        summarized in an earlier job.
+        """
+        for article in articles:
+            if article.summary is not None and article.cluster_id is not None:
+                self.cluster_summaries[article.cluster_id] = (article.summary, article.tags)
+                self.cluster_summaries.move_to_end(article.cluster_id)
+        while len(self.cluster_summaries) > self.cluster_summaries_size:
+            self.cluster_summaries.popitem(last=False)
+        for article in articles:
+            shared = self.cluster_summaries.get(article.cluster_id)
+            if article.summary is None and shared is not None:
+                article.summary, article.tags = shared
+
+    async def run_job(self, job):
+        """
+        JobQueue handler: processes the job's list of articles.
+        """
+        articles = job.payload
+        report = await self.process_articles(articles, progress=job.update_progress)
+        return {
+            "clusters": {article.url: article.cluster_id for article in articles},
+            "summaries": {
+                article.url: {"summary": article.summary, "tags": article.tags}
+                for article in articles if article.summary is not None
+            },
+            "embedding": report.as_dict(),
+        }
+
+    def start_workers(self, processes):
+        """
+        Starts `processes` embedding worker processes (0 keeps embedding in
+        threads of this process). Workers are spawned, not forked, so they
+        do not inherit the server's threads, and each builds its own embedder.
+        """
+        self.processes = processes
+        if processes > 0:
+            self.executor = ProcessPoolExecutor(
+                processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_embedding_worker,
+                initargs=(get_settings(),),
+            )
+
+    def stop_workers(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    def search(self, query, k=10, sources=None, mode="semantic", since=None, until=None):
+        """
+        mode is "semantic" (vector index), "keyword" (BM25 over the text
+        index) or "hybrid" (both, fused by reciprocal rank). Publication
+        dates are only known to the text index, so date-filtered vector
+        results are filtered through it after over-fetching.
+        """
+        if mode == "keyword":
+            return self.text_index.search(query, k=k, sources=sources, since=since, until=until)
+        dated = since is not None or until is not None
+        fetch = k * 4 if dated or mode == "hybrid" else k
+        vector = self.embedder.embed([query])[0]
+        hits = self.index.search(vector, k=fetch, sources=sources)
+        if dated:
+            hits = [hit for hit in hits if self.published_between(hit.url, since, until)]
+        if mode == "semantic":
+            return hits[:k]
+        keyword_hits = self.text_index.search(query, k=fetch, sources=sources, since=since, until=until)
+        return reciprocal_rank_fusion([hits, keyword_hits], k, self.rrf_k)
+
+    def published_between(self, url, since, until):
+        published = self.text_index.published(url)
+        if published is None:
+            return False
+        since = since if since is None or since.tzinfo else since.replace(tzinfo=timezone.utc)
+        until = until if until is None or until.tzinfo else until.replace(tzinfo=timezone.utc)
+        return (since is None or published >= since) and (until is None or published < until)
+
+    def save_index(self):
+        if self.index_path is not None:
+            self.index.save(self.index_path)
+            logger.info(f"Saved vector index ({len(self.index)} chunks) to {self.index_path}")
+        if self.text_index_path is not None:
+            self.text_index.save(self.text_index_path)
+            logger.info(f"Saved keyword index ({len(self.text_index)} articles) to {self.text_index_path}")
+        if self.dedup is not None and self.dedup_path is not None:
+            self.dedup.save(self.dedup_path)
+            logger.info(f"Saved near-duplicate signatures ({len(self.dedup)} articles) to {self.dedup_path}")
+
+
+def reciprocal_rank_fusion(rankings, k, rrf_k=60):
+    """
+    Merges ranked hit lists: each article scores sum(1 / (rrf_k + rank))
+    over the lists it appears in. Ranks need no score calibration between
+    the BM25 and cosine scales.
+    """
+    scores = {}
+    sources = {}
+    for hits in rankings:
+        for rank, hit in enumerate(hits, start=1):
+            scores[hit.url] = scores.get(hit.url, 0.0) + 1.0 / (rrf_k + rank)
+            sources[hit.url] = hit.source_site
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [SearchHit(url=url, source_site=sources[url], score=scores[url]) for url in best]
+
+
+def open_index(settings, dim):
+    """
+    Memory-maps the saved index if there is one, otherwise starts an empty one.
+    """
+    path = Path(settings.vector_index_path)
+    if not (path / "meta.json").exists():
+        return VectorIndex(dim, settings.vector_index_lists, settings.vector_index_probes)
+    index = VectorIndex.load(path)
+    if index.dim != dim:
+        raise ValueError(f"Vector index at {path} has dimension {index.dim}, but the embedder produces {dim}")
+    logger.info(f"Loaded vector index with {len(index)} chunks from {path}")
+    return index
+
+
+def open_text_index(settings):
+    path = Path(settings.text_index_path)
+    if not (path / "meta.json").exists():
+        return TextIndex(settings.text_index_k1, settings.text_index_b)
+    index = TextIndex.load(path)
+    logger.info(f"Loaded keyword index with {len(index)} articles from {path}")
+    return index
+
+
+def create_dedup_service(settings):
+    """
+    Restores the saved signatures if there are any, so articles seen before
+    a restart are still recognized as duplicates.
+    """
+    if not settings.dedup_enabled:
+        return None
+    params = dict(
+        num_perm=settings.dedup_num_perm,
+        bands=settings.dedup_bands,
+        threshold=settings.dedup_threshold,
+        shingle_size=settings.dedup_shingle_size,
+        max_articles=settings.dedup_max_articles,
+    )
+    path = Path(settings.dedup_path)
+    if not (path / "meta.json").exists():
+        return DedupService(**params)
+    dedup = DedupService.load(path, **params)
+    logger.info(f"Loaded near-duplicate signatures of {len(dedup)} articles from {path}")
+    return dedup
+
+
+@lru_cache
+def get_processing_service():
+    settings = get_settings()
+    embedder = create_embedder(settings)
+    return ProcessingService(
+        embedder,
+        open_index(settings, embedder.dim),
+        batch_size=settings.embedding_batch_size,
+        max_tokens=settings.chunk_max_tokens,
+        overlap=settings.chunk_overlap_tokens,
+        index_path=settings.vector_index_path,
+        dedup=create_dedup_service(settings),
+        dedup_path=settings.dedup_path,
+        llm=get_llm_service(),
+        cache=get_response_cache(),
+        text_index=open_text_index(settings),
+        text_index_path=settings.text_index_path,
+        text_merge_docs=settings.text_index_merge_docs,
+        rrf_k=settings.search_rrf_k,
+    )
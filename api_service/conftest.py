@@ -0,0 +1 @@
+# Puts the service root on sys.path, so tests import `app` as main.py does
@@ -1,19 +1,100 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+from pymongo.errors import ConnectionFailure
 import uvicorn
 
-class Article(BaseModel):
-    url: str
-    title: str
-    content: str
+from app.api.v1.api import api_router
+from app.api.v1.jobs import get_job_queue
+from app.core.config import get_settings
+from app.db.mongodb import close_mongo_client
+from app.models.article import Article
+from app.services.cache_service import ResponseCache, get_response_cache
+from app.services.ingest_service import ingest_ndjson
+from app.services.job_queue import JobQueue, QueueFullError
+from app.services.processing_service import get_processing_service
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    # Map the saved vector index before the first request instead of during it
+    processing = get_processing_service()
+    processing.start_workers(settings.embedding_processes)
+    app.state.job_queue = JobQueue(
+        processing.run_job,
+        workers=settings.job_workers,
+        max_queued=settings.job_queue_size,
+        retention=settings.job_retention,
+    )
+    app.state.job_queue.start()
+    yield
+    await app.state.job_queue.stop()
+    processing.stop_workers()
+    processing.save_index()
+    if processing.llm is not None:
+        await processing.llm.close()
+    await close_mongo_client()
+    await get_response_cache().close()
+
+app = FastAPI(title="News Processing API", lifespan=lifespan)
+app.include_router(api_router, prefix="/api/v1")
+
+@app.exception_handler(ConnectionFailure)
+async def mongo_unavailable(request: Request, exc: ConnectionFailure):
+    # Includes server selection timeouts: the database is down, not the request wrong
+    return JSONResponse(status_code=503, content={"detail": "Article database unavailable"}, headers={"Retry-After": "5"})
 
-app = FastAPI(title="News Processing API")
+@app.post("/process-article", status_code=202)
+async def process_article(
+    article: Article,
+    job_queue: JobQueue = Depends(get_job_queue),
+    cache: ResponseCache = Depends(get_response_cache),
+):
+    logger.info(f"Received article to process: {article.title}")
+    try:
+        job = job_queue.submit([article])
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    # The scraper has already stored the article; cached listings of its source are stale
+    await cache.invalidate_articles([article])
+    return {
+        "status": "Article queued",
+        "title": article.title,
+        "job_id": job.id,
+        "status_url": f"/api/v1/jobs/{job.id}",
+    }
 
-@app.post("/process-article")
-def process_article(article: Article):
-    print(f"Received article to process: {article.title}")
-    # --- VECTOR DB and AI LOGIC GOES HERE ---
-    return {"status": "Article received", "title": article.title}
+@app.post("/process-articles:bulk", status_code=202)
+async def process_articles_bulk(
+    request: Request,
+    job_queue: JobQueue = Depends(get_job_queue),
+    cache: ResponseCache = Depends(get_response_cache),
+):
+    """
+    Accepts newline-delimited Article JSON (Content-Type: application/x-ndjson),
+    optionally gzip-compressed (Content-Encoding: gzip). Rows are validated
+    and queued while the body is still being received. A body that stops
+    being valid gzip still answers 202: `aborted` says why, and only the
+    rows in `job_lines` were queued; the others must be sent again.
+    """
+    settings = get_settings()
+    encoding = request.headers.get("content-encoding", "").lower()
+    result = await ingest_ndjson(
+        request.stream(),
+        job_queue,
+        batch_size=settings.bulk_job_size,
+        gzip=True if encoding in ("gzip", "x-gzip") else None,
+        max_line_bytes=settings.bulk_max_line_bytes,
+        on_batch=cache.invalidate_articles,
+    )
+    logger.info(f"Bulk ingestion: {result.accepted} articles accepted, {result.rejected} rejected")
+    if result.aborted:
+        logger.warning(f"Bulk ingestion aborted: {result.aborted}")
+    return result.as_dict()
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="127.0.0.1", port=8000)
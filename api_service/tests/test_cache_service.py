@@ -0,0 +1,117 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.api.v1.articles import etag_matches
+from app.services.cache_service import (
+    ALL_ARTICLES, SEARCH, MemoryBackend, ResponseCache, SQLiteBackend, source_tag, url_tag,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    backend = MemoryBackend() if request.param == "memory" else SQLiteBackend(str(tmp_path / "cache.sqlite"))
+    cache = ResponseCache(backend, ttl=30)
+    yield cache
+    asyncio.run(cache.close())
+
+
+class Counter:
+    """
+    A compute() that returns how many times it has been called.
+    """
+
+    def __init__(self, during=None):
+        self.calls = 0
+        self.during = during
+
+    async def __call__(self):
+        self.calls += 1
+        if self.during is not None:
+            await self.during()
+        return {"calls": self.calls}
+
+
+def test_hits_until_a_tag_is_invalidated(cache):
+    async def run():
+        compute = Counter()
+        first = await cache.fetch("articles", {"page": 1}, compute, tags=[source_tag("bbc")])
+        second = await cache.fetch("articles", {"page": 1}, compute, tags=[source_tag("bbc")])
+        assert not first.hit and second.hit
+        assert second.body == {"calls": 1} and second.etag == first.etag
+
+        await cache.invalidate([source_tag("cnn")])
+        assert (await cache.fetch("articles", {"page": 1}, compute, tags=[source_tag("bbc")])).hit
+
+        await cache.invalidate_articles([SimpleNamespace(url="https://bbc.co.uk/1", source_site="bbc")])
+        third = await cache.fetch("articles", {"page": 1}, compute, tags=[source_tag("bbc")])
+        assert not third.hit and third.body == {"calls": 2}
+        assert third.etag != first.etag
+        assert cache.stats()["stale"] == 1
+
+    asyncio.run(run())
+
+
+def test_invalidation_during_compute_makes_the_entry_stale(cache):
+    async def run():
+        compute = Counter(during=lambda: cache.invalidate([ALL_ARTICLES]))
+        await cache.fetch("articles", {}, compute, tags=[ALL_ARTICLES])
+        compute.during = None
+        assert not (await cache.fetch("articles", {}, compute, tags=[ALL_ARTICLES])).hit
+        assert (await cache.fetch("articles", {}, compute, tags=[ALL_ARTICLES])).hit
+
+    asyncio.run(run())
+
+
+def test_tags_computed_from_the_body(cache):
+    async def run():
+        def tags(body):
+            return [url_tag("https://a"), SEARCH]
+
+        compute = Counter(during=lambda: cache.invalidate([url_tag("https://a")]))
+        # Invalidated while computing: the body is returned but not stored
+        await cache.fetch("search", {"q": "x"}, compute, tags=tags)
+        compute.during = None
+        assert not (await cache.fetch("search", {"q": "x"}, compute, tags=tags)).hit
+        assert (await cache.fetch("search", {"q": "x"}, compute, tags=tags)).hit
+
+        await cache.invalidate([url_tag("https://a")])
+        assert not (await cache.fetch("search", {"q": "x"}, compute, tags=tags)).hit
+
+    asyncio.run(run())
+
+
+def test_concurrent_misses_compute_once(cache):
+    async def run():
+        release = asyncio.Event()
+        compute = Counter(during=release.wait)
+        waiting = [asyncio.create_task(cache.fetch("articles", {}, compute)) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        release.set()
+        responses = await asyncio.gather(*waiting)
+        assert compute.calls == 1
+        assert {response.etag for response in responses} == {responses[0].etag}
+
+    asyncio.run(run())
+
+
+def test_errors_are_raised_and_not_cached(cache):
+    async def run():
+        async def failing():
+            raise RuntimeError("database down")
+
+        with pytest.raises(RuntimeError):
+            await cache.fetch("articles", {}, failing)
+        assert not (await cache.fetch("articles", {}, Counter())).hit
+
+    asyncio.run(run())
+
+
+def test_etag_matches():
+    etag = '"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('"x", W/"abc"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"abcd"', etag)
+    assert not etag_matches("", etag)
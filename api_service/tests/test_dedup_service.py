@@ -0,0 +1,86 @@
+import random
+
+import pytest
+
+from app.services.dedup_service import DedupService, cluster_id_for
+
+VOCABULARY = [f"word{i}" for i in range(2000)]
+
+
+def story(seed, length=300):
+    return " ".join(random.Random(seed).choices(VOCABULARY, k=length))
+
+
+def edited(text, seed, changes=3):
+    words = text.split()
+    rng = random.Random(seed)
+    for _ in range(changes):
+        words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+    return " ".join(words)
+
+
+def test_near_duplicates_join_the_first_articles_cluster():
+    service = DedupService()
+    original = service.assign("a", story(1))
+    assert not original.is_duplicate
+    assert original.cluster_id == cluster_id_for("a")
+
+    copy = service.assign("b", edited(story(1), seed=2))
+    assert copy.is_duplicate
+    assert copy.cluster_id == original.cluster_id
+    assert copy.representative_url == "a"
+    assert copy.similarity >= service.threshold
+
+    other = service.assign("c", story(3))
+    assert not other.is_duplicate
+    assert other.cluster_id != original.cluster_id
+
+
+def test_known_articles_keep_their_cluster():
+    service = DedupService()
+    service.assign("a", story(1))
+    service.assign("b", edited(story(1), seed=2))
+    # Rewritten beyond recognition, but still the same story
+    again = service.assign("b", story(4))
+    assert again.cluster_id == cluster_id_for("a")
+    assert len(service) == 2
+
+
+def test_articles_without_text_are_not_indexed():
+    service = DedupService()
+    result = service.assign("empty", "")
+    assert result.representative_url == "empty"
+    assert len(service) == 0
+
+
+def test_evicts_least_recently_assigned():
+    service = DedupService(max_articles=2)
+    service.assign("a", story(1))
+    service.assign("b", story(2))
+    service.assign("a", story(1))
+    service.assign("c", story(3))
+    assert list(service.entries) == ["a", "c"]
+    assert cluster_id_for("b") not in service.representatives
+    # An evicted article's copies start a new cluster
+    assert not service.assign("d", edited(story(2), seed=5)).is_duplicate
+
+
+def test_save_and_load_keep_clusters(tmp_path):
+    service = DedupService()
+    service.assign("a", story(1))
+    service.assign("b", edited(story(1), seed=2))
+    service.assign("c", story(3))
+    service.save(tmp_path / "dedup")
+
+    loaded = DedupService.load(tmp_path / "dedup")
+    assert list(loaded.entries) == ["a", "b", "c"]
+    copy = loaded.assign("d", edited(story(3), seed=6))
+    assert copy.representative_url == "c"
+    assert copy.cluster_id == cluster_id_for("c")
+
+    smaller = DedupService.load(tmp_path / "dedup", max_articles=1)
+    assert list(smaller.entries) == ["c"]
+    assert smaller.representatives == {cluster_id_for("c"): "c"}
+
+    with pytest.raises(ValueError):
+        DedupService.load(tmp_path / "dedup", num_perm=64)
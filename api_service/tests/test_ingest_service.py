@@ -0,0 +1,82 @@
+import asyncio
+import gzip
+import json
+from types import SimpleNamespace
+
+from app.services.ingest_service import ingest_ndjson
+
+
+class FakeJobQueue:
+    def __init__(self):
+        self.batches = []
+
+    async def put(self, batch):
+        self.batches.append([article.url for article in batch])
+        return SimpleNamespace(id=f"job-{len(self.batches)}")
+
+
+async def chunked(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def article(i):
+    return json.dumps({"url": f"https://example.com/{i}", "title": f"Title {i}", "content": "text"}).encode()
+
+
+def ingest(body, chunk_size=7, **kwargs):
+    queue = FakeJobQueue()
+    result = asyncio.run(ingest_ndjson(chunked(body, chunk_size), queue, **kwargs))
+    return result, queue.batches
+
+
+def test_enqueues_valid_rows_in_batches():
+    body = b"\n".join(article(i) for i in range(5)) + b"\n\n"
+    result, batches = ingest(body, batch_size=2)
+    assert result.accepted == 5 and result.rejected == 0
+    assert batches == [[f"https://example.com/{i}" for i in rows] for rows in ([0, 1], [2, 3], [4])]
+    assert result.job_ids == ["job-1", "job-2", "job-3"]
+    assert result.job_lines == [[1, 2], [3, 4], [5, 5]]
+
+
+def test_rejects_invalid_rows_with_line_numbers():
+    body = b"\n".join([article(0), b"not json", b'{"url": "x", "title": "t"}', article(3)])
+    result, batches = ingest(body)
+    assert result.accepted == 2 and result.rejected == 2
+    assert [error["line"] for error in result.errors] == [2, 3]
+    assert result.errors[1]["error"].startswith("content:")
+    assert batches == [["https://example.com/0", "https://example.com/3"]]
+    assert result.job_lines == [[1, 4]]
+
+
+def test_skips_oversized_lines_without_buffering_them():
+    long_row = json.dumps({"url": "u", "title": "t", "content": "x" * 500}).encode()
+    body = b"\n".join([article(0), long_row, article(2), long_row])
+    result, batches = ingest(body, max_line_bytes=200)
+    assert result.accepted == 2 and result.rejected == 2
+    assert [error["line"] for error in result.errors] == [2, 4]
+    assert batches == [["https://example.com/0", "https://example.com/2"]]
+
+
+def test_reads_gzip_bodies():
+    body = gzip.compress(b"\n".join(article(i) for i in range(3)))
+    result, batches = ingest(body)
+    assert result.accepted == 3 and result.aborted is None
+    assert len(batches[0]) == 3
+    # Sniffing can be overridden: a gzip body read as plain NDJSON is garbage
+    result, _ = ingest(body, gzip=False)
+    assert result.accepted == 0
+
+
+def test_invalid_gzip_enqueues_rows_read_before_the_error():
+    body = gzip.compress(b"\n".join(article(i) for i in range(200)) + b"\n")
+    # Corrupt the body after the first rows have been decompressed
+    corrupted = body[:len(body) // 2] + bytes(255 - byte for byte in body[len(body) // 2:])
+    result, batches = ingest(corrupted, chunk_size=64, batch_size=50)
+    assert result.aborted.startswith("Invalid gzip data")
+    assert 0 < result.accepted < 200
+    assert sum(map(len, batches)) == result.accepted
+    assert result.job_lines[-1][1] <= 200
+
+    result, batches = ingest(b"\x1f\x8b" + b"garbage" * 10)
+    assert result.aborted and result.accepted == 0 and batches == []
@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app.db.repository import SORT, ArticleRepository, InvalidCursor, decode_cursor, encode_cursor
+
+mongomock = pytest.importorskip("mongomock")
+
+
+class AsyncCursor:
+    """
+    The slice of pymongo's AsyncCursor the repository uses, over mongomock.
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def sort(self, *args):
+        self.cursor = self.cursor.sort(*args)
+        return self
+
+    def limit(self, limit):
+        self.cursor = self.cursor.limit(limit)
+        return self
+
+    def max_time_ms(self, ms):
+        return self
+
+    async def to_list(self):
+        return list(self.cursor)
+
+
+class AsyncCollection:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, *args):
+        return AsyncCursor(self.collection.find(*args))
+
+
+@pytest.fixture
+def collection():
+    collection = mongomock.MongoClient().db.news_articles
+    start = datetime(2024, 1, 1)
+    documents = []
+    for i in range(7):
+        # Several articles share a date, so _id has to break the tie
+        documents.append({"_id": ObjectId(), "url": f"d{i}", "publication_date": start + timedelta(days=i // 2)})
+    for i, raw in enumerate(["N/A", "N/A", "yesterday", "2 hours ago"]):
+        documents.append({"_id": ObjectId(), "url": f"s{i}", "publication_date": raw})
+    for i in range(3):
+        documents.append({"_id": ObjectId(), "url": f"n{i}", "publication_date": None})
+    documents.append({"_id": ObjectId(), "url": "n-missing"})
+    collection.insert_many(documents)
+    return collection
+
+
+def all_pages(repository, limit):
+    urls, cursor = [], None
+    while True:
+        articles, cursor = asyncio.run(repository.list(limit=limit, cursor=cursor))
+        assert len(articles) <= limit
+        urls.extend(article["url"] for article in articles)
+        if cursor is None:
+            return urls
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 5, 100])
+def test_pages_follow_sort_order_across_dates_strings_and_nulls(collection, limit):
+    expected = [document["url"] for document in collection.find().sort(SORT)]
+    # A missing publication_date sorts as null, ordered by _id among them
+    assert [url[0] for url in expected] == list("ddddddd" "ssss" "nnnn")
+    assert all_pages(ArticleRepository(AsyncCollection(collection)), limit) == expected
+
+
+def test_raw_date_strings_are_listed_as_unknown(collection):
+    articles, _ = asyncio.run(ArticleRepository(AsyncCollection(collection)).list(limit=20))
+    by_url = {article["url"]: article for article in articles}
+    assert by_url["s0"]["publication_date"] is None
+    assert isinstance(by_url["d0"]["publication_date"], datetime)
+    assert "_id" not in by_url["d0"] and by_url["d0"]["id"]
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    object_id = ObjectId()
+    published = datetime(2024, 3, 1, 12, 30)
+    assert decode_cursor(encode_cursor({"_id": object_id, "publication_date": published})) == ("d", published, object_id)
+    assert decode_cursor(encode_cursor({"_id": object_id, "publication_date": "N/A"})) == ("s", "N/A", object_id)
+    assert decode_cursor(encode_cursor({"_id": object_id})) == ("n", None, object_id)
+    for cursor in ("", "not-a-cursor", encode_cursor({"_id": "zz"})):
+        with pytest.raises(InvalidCursor):
+            decode_cursor(cursor)
@@ -0,0 +1,109 @@
+import math
+import random
+from collections import Counter
+from datetime import datetime, timezone
+
+import pytest
+
+from app.db.text_index import TextIndex, decode_varints, encode_varints, tokenize
+
+WORDS = "lok sabha bill passed budget monsoon session river flood city rail fare".split()
+
+
+def corpus(n, seed=0):
+    rng = random.Random(seed)
+    return {f"https://example.com/{i}": " ".join(rng.choices(WORDS, k=rng.randint(3, 40))) for i in range(n)}
+
+
+def brute_force(docs, query, k1=1.2, b=0.75):
+    """
+    BM25 scores of `docs` (url -> text) computed directly from the text.
+    """
+    phrases = [tokenize(phrase) for phrase in query.split('"')[1::2]]
+    terms = list(dict.fromkeys(tokenize(" ".join(query.split('"')[::2]))))
+    tokens = {url: tokenize(text) for url, text in docs.items()}
+    avg_length = max(sum(map(len, tokens.values())) / len(tokens), 1.0)
+
+    def occurrences(words, phrase):
+        return sum(words[i:i + len(phrase)] == phrase for i in range(len(words) - len(phrase) + 1))
+
+    counts = {url: [occurrences(words, phrase) for phrase in phrases] + [Counter(words)[term] for term in terms]
+              for url, words in tokens.items()}
+    dfs = [sum(1 for url in docs if counts[url][i]) for i in range(len(phrases) + len(terms))]
+    scores = {}
+    for url, words in tokens.items():
+        if not all(counts[url][:len(phrases)]):
+            continue
+        score = 0.0
+        for tf, df in zip(counts[url], dfs):
+            if tf:
+                idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+                score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(words) / avg_length))
+        if score > 0:
+            scores[url] = score
+    return scores
+
+
+def assert_matches(index, docs, query):
+    expected = brute_force(docs, query)
+    hits = index.search(query, k=len(docs))
+    assert {hit.url for hit in hits} == set(expected)
+    for hit in hits:
+        assert hit.score == pytest.approx(expected[hit.url])
+    assert [hit.score for hit in hits] == sorted((hit.score for hit in hits), reverse=True)
+
+
+QUERIES = ["budget", "flood river", '"lok sabha"', '"lok sabha" bill', '"rail fare" city', '"monsoon session flood"']
+
+
+def test_varints_round_trip():
+    values = [0, 1, 127, 128, 300, 2 ** 32, 2 ** 62]
+    assert decode_varints(encode_varints(values)).tolist() == values
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_search_matches_brute_force(query):
+    docs = corpus(200)
+    index = TextIndex()
+    for url, text in docs.items():
+        index.add(url, text)
+    assert_matches(index, docs, query)
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_save_merges_segments_and_drops_dead_documents(tmp_path, query):
+    docs = corpus(300, seed=1)
+    urls = list(docs)
+    index = TextIndex()
+    for url in urls[:150]:
+        index.add(url, docs[url])
+    index.save(tmp_path / "index")
+    # Deletes and re-adds against the saved base segment, plus a new tail
+    for url in urls[:40]:
+        index.delete(url)
+        del docs[url]
+    for url in urls[40:60]:
+        docs[url] = docs[url] + " budget"
+        index.add(url, docs[url])
+    for url in urls[150:]:
+        index.add(url, docs[url])
+    assert index.tail_docs == 170
+    assert_matches(index, docs, query)
+
+    index.save(tmp_path / "index")
+    assert index.tail_docs == 0
+    assert len(index) == len(docs)
+    assert_matches(index, docs, query)
+    assert_matches(TextIndex.load(tmp_path / "index"), docs, query)
+
+
+def test_filters_by_source_and_date():
+    index = TextIndex()
+    index.add("a", "flood warning", source="one", published=datetime(2024, 5, 1))
+    index.add("b", "flood warning", source="two", published=datetime(2024, 6, 1, tzinfo=timezone.utc))
+    index.add("c", "flood warning", source="one")
+    assert {hit.url for hit in index.search("flood", sources=["one"])} == {"a", "c"}
+    assert [hit.url for hit in index.search("flood", since=datetime(2024, 5, 15))] == ["b"]
+    assert [hit.url for hit in index.search("flood", until=datetime(2024, 5, 15))] == ["a"]
+    assert index.published("a") == datetime(2024, 5, 1, tzinfo=timezone.utc)
+    assert index.published("c") is None
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from app.db.vector_db import VectorIndex
+
+DIM = 16
+
+
+def unit_vectors(n, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def brute_force(chunks, query, k):
+    """
+    Best chunk score per article from `chunks` (url -> vectors).
+    """
+    best = {url: float(np.max(vectors @ query)) for url, vectors in chunks.items()}
+    return sorted(best.items(), key=lambda item: -item[1])[:k]
+
+
+def assert_matches(index, chunks, query, k=10):
+    hits = index.search(query, k=k)
+    expected = brute_force(chunks, query, k)
+    assert [hit.url for hit in hits] == [url for url, _ in expected]
+    assert [hit.score for hit in hits] == pytest.approx([score for _, score in expected], abs=1e-5)
+
+
+def add_articles(index, chunks, urls, seed):
+    vectors = unit_vectors(3 * len(urls), seed)
+    for i, url in enumerate(urls):
+        chunks[url] = vectors[3 * i:3 * i + 3]
+        index.add([url] * 3, chunks[url], sources=["even" if i % 2 else "odd"] * 3)
+
+
+def test_add_delete_and_exact_search():
+    index, chunks = VectorIndex(DIM, n_lists=4), {}
+    add_articles(index, chunks, [f"u{i}" for i in range(50)], seed=1)
+    assert len(index) == 150
+    assert index.delete("u3") == 3
+    assert index.delete("u3") == 0
+    del chunks["u3"]
+    assert len(index) == 147 and "u3" not in index
+    assert_matches(index, chunks, unit_vectors(1, seed=2)[0])
+
+    hits = index.search(unit_vectors(1, seed=3)[0], k=100, sources=["odd"])
+    assert hits and all(hit.source_site == "odd" for hit in hits)
+
+
+def test_rejects_wrong_shapes():
+    index = VectorIndex(DIM)
+    with pytest.raises(ValueError):
+        index.add(["u"], np.zeros((1, DIM + 1)))
+    with pytest.raises(ValueError):
+        index.add(["u", "v"], np.zeros((1, DIM)))
+
+
+def test_trained_search_with_all_lists_probed_is_exact():
+    index, chunks = VectorIndex(DIM, n_lists=4, n_probe=4), {}
+    add_articles(index, chunks, [f"u{i}" for i in range(60)], seed=4)
+    assert index.maybe_train()
+    assert index.trained
+    assert not index.maybe_train()
+    # Rows added after training go straight to their nearest list
+    add_articles(index, chunks, [f"v{i}" for i in range(10)], seed=5)
+    for query in unit_vectors(5, seed=6):
+        assert_matches(index, chunks, query)
+
+
+def test_save_load_round_trip_and_readd(tmp_path):
+    index, chunks = VectorIndex(DIM, n_lists=4, n_probe=4), {}
+    add_articles(index, chunks, [f"u{i}" for i in range(60)], seed=7)
+    index.train()
+    for url in ("u1", "u2", "u10"):
+        index.delete(url)
+        del chunks[url]
+    # Re-adding an article reuses its id instead of adding a second one
+    index.delete("u5")
+    add_articles(index, chunks, ["u5"], seed=8)
+    assert index.article_urls.count("u5") == 1
+
+    index.save(tmp_path / "vectors")
+    assert len(index.article_urls) == len(chunks)
+    loaded = VectorIndex.load(tmp_path / "vectors")
+    assert loaded.trained and len(loaded) == 3 * len(chunks)
+    for query in unit_vectors(5, seed=9):
+        assert_matches(index, chunks, query)
+        assert_matches(loaded, chunks, query)
+
+    # Deletes and adds against the memory-mapped base segment
+    loaded.delete("u20")
+    del chunks["u20"]
+    add_articles(loaded, chunks, ["w0", "w1"], seed=10)
+    loaded.save(tmp_path / "vectors")
+    assert_matches(VectorIndex.load(tmp_path / "vectors"), chunks, unit_vectors(1, seed=11)[0])
@@ -0,0 +1,205 @@
+# Offline extraction benchmark for the news spiders.
+#
+# Replays recorded listing and article HTML (see fixtures/manifest.json)
+# through each spider's `parse` and `parse_article` callbacks using fake
+# HtmlResponse objects, without any network access or Playwright.
+#
+# Usage (from scraper_service/):
+#     python -m benchmarks.extraction_benchmark
+#     python -m benchmarks.extraction_benchmark ndtv --iterations 500
+#     python -m benchmarks.extraction_benchmark --json report.json --min-field-success 0.9
+#
+# To add a fixture, save the rendered page HTML (e.g. from `page.content()`
+# or `scrapy fetch --nolog <url>`) under fixtures/<spider>/ and list it in
+# the manifest together with the url it was fetched from.
+
+import argparse
+import asyncio
+import inspect
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from itemadapter import ItemAdapter
+from scrapy import Request
+from scrapy.http import HtmlResponse
+from scrapy.spiderloader import SpiderLoader
+from scrapy.utils.project import get_project_settings
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+ARTICLE_FIELDS = ('headline', 'author', 'publication_date', 'body_text')
+MISSING_VALUES = (None, '', 'N/A')
+
+
+def load_manifest(fixtures_dir=FIXTURES_DIR):
+    with open(fixtures_dir / 'manifest.json', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def fake_response(fixtures_dir, entry, callback=None):
+    """
+    Builds an HtmlResponse for a recorded page, attached to a Request so
+    callbacks can read response.meta and response.request.
+    """
+    body = (fixtures_dir / entry['file']).read_bytes()
+    request = Request(entry['url'], callback=callback)
+    return HtmlResponse(url=entry['url'], body=body, encoding='utf-8', request=request)
+
+
+async def collect(result):
+    """
+    Drains whatever a Scrapy callback returned: None, a list, a generator,
+    a coroutine or an async generator.
+    """
+    if inspect.iscoroutine(result):
+        result = await result
+    if result is None:
+        return []
+    if inspect.isasyncgen(result):
+        return [output async for output in result]
+    return list(result)
+
+
+class CallbackTimer:
+    def __init__(self, loop):
+        self.loop = loop
+        self.samples = {}
+
+    def run(self, name, callback, response):
+        start = time.perf_counter()
+        outputs = self.loop.run_until_complete(collect(callback(response)))
+        self.samples.setdefault(name, []).append(time.perf_counter() - start)
+        return outputs
+
+
+def field_success(items):
+    """
+    Fraction of items with a usable value for each article field.
+    """
+    if not items:
+        return {field: 0.0 for field in ARTICLE_FIELDS}
+    return {
+        field: sum(1 for item in items if ItemAdapter(item).get(field) not in MISSING_VALUES) / len(items)
+        for field in ARTICLE_FIELDS
+    }
+
+
+def latency_summary(samples):
+    ordered = sorted(samples)
+    return {
+        'calls': len(ordered),
+        'mean_ms': statistics.fmean(ordered) * 1000,
+        'p95_ms': ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000,
+    }
+
+
+def replay(spider, fixtures, fixtures_dir, timer):
+    """
+    Runs the listing page and every article fixture through the spider once.
+    Returns (article links found on the listing page, scraped items).
+    """
+    links = []
+    if 'listing' in fixtures:
+        response = fake_response(fixtures_dir, fixtures['listing'], spider.parse)
+        outputs = timer.run('parse', spider.parse, response)
+        links = [output.url for output in outputs if isinstance(output, Request)]
+
+    items = []
+    for entry in fixtures.get('articles', []):
+        response = fake_response(fixtures_dir, entry, spider.parse_article)
+        outputs = timer.run('parse_article', spider.parse_article, response)
+        items.extend(output for output in outputs if not isinstance(output, Request))
+    return links, items
+
+
+def benchmark_spider(spider_cls, fixtures, fixtures_dir, iterations):
+    spider = spider_cls()
+    loop = asyncio.new_event_loop()
+    try:
+        # Warm-up pass: imports, selector compilation, and the extraction results
+        links, items = replay(spider, fixtures, fixtures_dir, CallbackTimer(loop))
+
+        timer = CallbackTimer(loop)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            replay(spider, fixtures, fixtures_dir, timer)
+        elapsed = time.perf_counter() - start
+
+        # Memory is measured in a separate pass so tracing does not skew timings
+        tracemalloc.start()
+        replay(spider, fixtures, fixtures_dir, CallbackTimer(loop))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        loop.close()
+
+    articles = len(items) * iterations
+    return {
+        'spider': spider_cls.name,
+        'iterations': iterations,
+        'listing_links': len(links),
+        'articles': len(items),
+        'articles_per_sec': articles / elapsed if elapsed else 0.0,
+        'callbacks': {name: latency_summary(samples) for name, samples in timer.samples.items()},
+        'peak_memory_kib': peak / 1024,
+        'field_success': field_success(items),
+    }
+
+
+def print_report(reports):
+    for report in reports:
+        print(f"\n== {report['spider']} ({report['iterations']} iterations)")
+        print(f"  listing links found : {report['listing_links']}")
+        print(f"  articles extracted  : {report['articles']}")
+        print(f"  articles/sec        : {report['articles_per_sec']:.1f}")
+        print(f"  peak memory         : {report['peak_memory_kib']:.1f} KiB")
+        for name, latency in report['callbacks'].items():
+            print(f"  {name:<20}: mean {latency['mean_ms']:.3f} ms, p95 {latency['p95_ms']:.3f} ms")
+        for field, rate in report['field_success'].items():
+            print(f"  {field + ' present':<20}: {rate:.0%}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark spider extraction against recorded HTML.")
+    parser.add_argument('spiders', nargs='*', help="spiders to benchmark (default: all in the manifest)")
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--fixtures', type=Path, default=FIXTURES_DIR)
+    parser.add_argument('--json', type=Path, help="also write the report to this file")
+    parser.add_argument('--min-field-success', type=float,
+                        help="exit non-zero if any field's success rate is below this fraction")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    manifest = load_manifest(args.fixtures)
+    loader = SpiderLoader.from_settings(get_project_settings())
+
+    reports = [
+        benchmark_spider(loader.load(name), manifest[name], args.fixtures, args.iterations)
+        for name in (args.spiders or manifest)
+    ]
+    print_report(reports)
+
+    if args.json:
+        args.json.write_text(json.dumps(reports, indent=2))
+
+    if args.min_field_success is not None:
+        failures = [
+            f"{report['spider']}.{field} = {rate:.0%}"
+            for report in reports
+            for field, rate in report['field_success'].items()
+            if rate < args.min_field_success
+        ]
+        if failures:
+            print(f"\nField success below {args.min_field_success:.0%}: {', '.join(failures)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1 @@
+# Puts the service root on sys.path, so tests import `news_scraper` as scrapy does
@@ -0,0 +1,171 @@
+# Runs every news spider concurrently in a single process.
+#
+# Usage (from scraper_service/):
+#     python -m news_scraper.crawl_all
+#     python -m news_scraper.crawl_all the_hindu ndtv -s INCREMENTAL_CRAWL=True
+#
+# All crawlers share one Twisted reactor, one Chromium instance (reached over
+# CDP through PLAYWRIGHT_CDP_URL) and, through news_scraper.pipelines.client_pool,
+# one MongoDB connection pool.
+
+import argparse
+import json
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from scrapy.crawler import CrawlerProcess
+from scrapy.utils.project import get_project_settings
+
+SPIDERS = ['the_hindu', 'ndtv', 'indian_express', 'the_times_of_india']
+
+
+def chromium_executable():
+    """
+    Returns the path of Playwright's bundled Chromium. It is resolved in a
+    child process so Playwright's sync API never touches the event loop the
+    asyncio reactor runs on.
+    """
+    code = (
+        "from playwright.sync_api import sync_playwright\n"
+        "with sync_playwright() as playwright:\n"
+        "    print(playwright.chromium.executable_path)\n"
+    )
+    return subprocess.check_output([sys.executable, '-c', code], text=True).strip()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class SharedBrowser:
+    """
+    Headless Chromium started once for all crawlers. scrapy-playwright
+    connects to it over CDP instead of launching a browser per crawler.
+    """
+
+    def __init__(self, executable=None, startup_timeout=30):
+        self.executable = executable
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.profile_dir = None
+        self.cdp_url = None
+
+    def start(self):
+        executable = self.executable or chromium_executable()
+        port = free_port()
+        self.profile_dir = tempfile.mkdtemp(prefix='news_scraper_chromium_')
+        self.process = subprocess.Popen(
+            [
+                executable,
+                '--headless=new',
+                f'--remote-debugging-port={port}',
+                f'--user-data-dir={self.profile_dir}',
+                '--no-first-run',
+                '--no-default-browser-check',
+                'about:blank',
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self.cdp_url = f'http://127.0.0.1:{port}'
+        self.wait_until_ready()
+        return self.cdp_url
+
+    def wait_until_ready(self):
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Chromium exited with code {self.process.returncode}")
+            try:
+                with urlopen(f'{self.cdp_url}/json/version', timeout=1) as response:
+                    json.load(response)
+                return
+            except (URLError, ConnectionError, ValueError):
+                time.sleep(0.2)
+        raise RuntimeError(f"Chromium did not open its CDP endpoint within {self.startup_timeout}s")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+def summarize(crawlers):
+    """
+    Returns one row per spider with items scraped, elapsed seconds and
+    items/sec, followed by a combined total row.
+    """
+    rows = []
+    for crawler in crawlers:
+        stats = crawler.stats.get_stats()
+        items = stats.get('item_scraped_count', 0)
+        elapsed = stats.get('elapsed_time_seconds') or 0
+        rows.append((crawler.spidercls.name, items, elapsed, items / elapsed if elapsed else 0.0))
+
+    total_items = sum(row[1] for row in rows)
+    wall_clock = max((row[2] for row in rows), default=0)
+    rows.append(('TOTAL', total_items, wall_clock, total_items / wall_clock if wall_clock else 0.0))
+    return rows
+
+
+def print_summary(rows):
+    print(f"\n{'spider':<22}{'items':>8}{'seconds':>10}{'items/sec':>11}")
+    for name, items, elapsed, rate in rows:
+        print(f"{name:<22}{items:>8}{elapsed:>10.1f}{rate:>11.2f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run all news spiders in one process.")
+    parser.add_argument('spiders', nargs='*', default=SPIDERS, help="spiders to run (default: all)")
+    parser.add_argument('-s', '--set', action='append', default=[], metavar='NAME=VALUE',
+                        help="override a Scrapy setting, as with `scrapy crawl -s`")
+    parser.add_argument('--cdp-url', help="connect to an already running browser instead of starting one")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    settings = get_project_settings()
+    for override in args.set:
+        name, _, value = override.partition('=')
+        settings.set(name, value, priority='cmdline')
+
+    browser = None
+    if args.cdp_url:
+        settings.set('PLAYWRIGHT_CDP_URL', args.cdp_url, priority='cmdline')
+    elif not settings.get('PLAYWRIGHT_CDP_URL'):
+        launch_options = settings.getdict('PLAYWRIGHT_LAUNCH_OPTIONS')
+        browser = SharedBrowser(executable=launch_options.get('executable_path'))
+        settings.set('PLAYWRIGHT_CDP_URL', browser.start(), priority='cmdline')
+
+    process = CrawlerProcess(settings)
+    crawlers = []
+    for name in args.spiders:
+        crawler = process.create_crawler(name)
+        crawlers.append(crawler)
+        process.crawl(crawler)
+
+    try:
+        process.start()
+    finally:
+        if browser:
+            browser.stop()
+
+    print_summary(summarize(crawlers))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# Custom download handlers for the news_scraper project
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/settings.html#download-handlers
+
+from collections import defaultdict, deque
+
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy_playwright.handler import ScrapyPlaywrightDownloadHandler
+
+
+class PooledPlaywrightDownloadHandler(ScrapyPlaywrightDownloadHandler):
+    """
+    scrapy-playwright handler that reuses open pages instead of creating and
+    closing one per request.
+
+    Each allowed domain gets its own browser context (unless the request sets
+    `playwright_context`), holding up to PLAYWRIGHT_POOL_PAGES_PER_CONTEXT
+    idle pages. A page is borrowed for one navigation, reset to about:blank,
+    and returned to the pool; pages that errored, crashed or reached
+    PLAYWRIGHT_POOL_PAGE_MAX_USES navigations are closed instead. Pages are
+    always released here, so spider callbacks and errbacks never need to
+    close them. Requests that set `playwright_include_page` or pass their own
+    `playwright_page` keep the stock scrapy-playwright behaviour.
+    """
+
+    def __init__(self, crawler):
+        super().__init__(crawler)
+        self.crawler = crawler
+        self.pool_size = crawler.settings.getint('PLAYWRIGHT_POOL_PAGES_PER_CONTEXT', 4)
+        self.page_max_uses = crawler.settings.getint('PLAYWRIGHT_POOL_PAGE_MAX_USES', 50)
+        self.idle_pages = defaultdict(deque)
+        self.page_uses = {}
+
+    def context_name_for(self, request, spider):
+        host = urlparse_cached(request).hostname or ''
+        for domain in getattr(spider, 'allowed_domains', None) or []:
+            if host == domain or host.endswith(f'.{domain}'):
+                return domain
+        return host
+
+    async def _download_request(self, request, spider=None):
+        # Scrapy >= 2.14 no longer passes the spider; only forward it when we were given one
+        args = (request,) if spider is None else (request, spider)
+        if request.meta.get('playwright_include_page') or request.meta.get('playwright_page'):
+            return await super()._download_request(*args)
+
+        spider = spider or self.crawler.spider
+        context_name = request.meta.setdefault('playwright_context', self.context_name_for(request, spider))
+        page = await self._acquire_page(context_name, request, spider)
+        # Keeps scrapy-playwright from closing the page once the body is read
+        request.meta['playwright_page'] = page
+        request.meta['playwright_include_page'] = True
+        healthy = False
+        try:
+            response = await super()._download_request(*args)
+            healthy = True
+            return response
+        finally:
+            # After a TargetClosedError retry, scrapy-playwright has put the
+            # page it created for the retry in the meta; release that one too
+            used = request.meta.pop('playwright_page', None)
+            request.meta.pop('playwright_include_page', None)
+            if used is not None and used is not page:
+                await self._release_page(context_name, page, False)
+                page = used
+            await self._release_page(context_name, page, healthy)
+
+    async def _acquire_page(self, context_name, request, spider):
+        idle = self.idle_pages[context_name]
+        while idle:
+            page = idle.popleft()
+            if not page.is_closed():
+                self.stats.inc_value('playwright/pool/reused')
+                return page
+            self.page_uses.pop(page, None)
+        self.stats.inc_value('playwright/pool/created')
+        return await self._create_page(request=request, spider=spider)
+
+    async def _release_page(self, context_name, page, healthy):
+        uses = self.page_uses.pop(page, 0) + 1
+        if page.is_closed():
+            return
+
+        idle = self.idle_pages[context_name]
+        if healthy and uses < self.page_max_uses and len(idle) < self.pool_size:
+            try:
+                # Drop the previous article's DOM, scripts and timers before reuse
+                await page.goto('about:blank')
+            except Exception:
+                pass
+            else:
+                self.page_uses[page] = uses
+                idle.append(page)
+                self.stats.max_value(f'playwright/pool/idle/{context_name}', len(idle))
+                return
+
+        self.stats.inc_value('playwright/pool/retired')
+        await page.close()
+
+    async def _close(self):
+        self.idle_pages.clear()
+        self.page_uses.clear()
+        await super()._close()
@@ -0,0 +1,400 @@
+# Scraper -> API service handoff.
+#
+# ApiHandoffExtension writes every article a Mongo pipeline has confirmed
+# as stored (the article_stored signal) to an on-disk outbox (SQLite, one
+# file per spider), so crawl speed never depends on how fast the API
+# processes articles. A background task on the reactor's asyncio loop sends
+# the outbox in batches to the API's POST /process-articles:bulk endpoint
+# (gzip NDJSON) over one keep-alive HTTP client. The API only queues
+# accepted articles in memory, so rows stay in the outbox, tagged with
+# their job id, until GET /api/v1/jobs/<id> reports the job done; rows of
+# failed or lost jobs (e.g. after an API restart) are sent again. Rows
+# still in the outbox when the crawl ends are handled by the next crawl of
+# the same spider.
+
+import asyncio
+import gzip
+import json
+import random
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+from itemadapter import ItemAdapter
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.defer import deferred_from_coro
+from scrapy.utils.project import data_path
+
+from news_scraper.pipelines import article_stored
+
+# Responses worth retrying; any other 4xx means the batch itself is bad
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class HandoffSpool:
+    """
+    Write-ahead outbox of serialized API articles. Each append is committed
+    (WAL with synchronous=NORMAL, so commits do not fsync), unsent rows are
+    read oldest first, and rows the API accepted carry the id of the job
+    processing them until that job is done. Rows the API refuses
+    permanently are moved to a dead_letter table instead of being dropped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL, payload TEXT NOT NULL, "
+            "queued_at REAL NOT NULL, job_id TEXT, attempts INTEGER NOT NULL DEFAULT 0"
+            ")"
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(outbox)")}
+        if 'job_id' not in columns:
+            # Outboxes written before rows were tracked by job
+            self.conn.execute("ALTER TABLE outbox ADD COLUMN job_id TEXT")
+            self.conn.execute("ALTER TABLE outbox ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS dead_letter ("
+            "id INTEGER PRIMARY KEY, url TEXT NOT NULL, payload TEXT NOT NULL, "
+            "error TEXT, failed_at REAL NOT NULL"
+            ")"
+        )
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def append(self, url, payload):
+        self.conn.execute(
+            "INSERT INTO outbox (url, payload, queued_at) VALUES (?, ?, ?)", (url, payload, time.time())
+        )
+        self.conn.commit()
+
+    def peek(self, limit):
+        """
+        Returns up to `limit` of the oldest unsent rows as (id, url, payload).
+        """
+        return self.conn.execute(
+            "SELECT id, url, payload FROM outbox WHERE job_id IS NULL ORDER BY id LIMIT ?", (limit,)
+        ).fetchall()
+
+    def accept(self, assignments):
+        """
+        Tags rows with the job processing them, from (job_id, row id) pairs.
+        """
+        self.conn.executemany("UPDATE outbox SET job_id = ? WHERE id = ?", assignments)
+        self.conn.commit()
+
+    def jobs(self):
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT job_id FROM outbox WHERE job_id IS NOT NULL")]
+
+    def finish_job(self, job_id):
+        count = self.conn.execute("DELETE FROM outbox WHERE job_id = ?", (job_id,)).rowcount
+        self.conn.commit()
+        return count
+
+    def retry_job(self, job_id, max_attempts, error):
+        """
+        Makes the rows of a failed job unsent again, or dead-letters those
+        already sent `max_attempts` times. Returns (retried, dead-lettered).
+        """
+        self.conn.execute("UPDATE outbox SET attempts = attempts + 1 WHERE job_id = ?", (job_id,))
+        exhausted = self.conn.execute(
+            "SELECT id, url, payload FROM outbox WHERE job_id = ? AND attempts >= ?", (job_id, max_attempts)
+        ).fetchall()
+        retried = self.conn.execute(
+            "UPDATE outbox SET job_id = NULL WHERE job_id = ? AND attempts < ?", (job_id, max_attempts)
+        ).rowcount
+        self.dead_letter(exhausted, error)
+        return retried, len(exhausted)
+
+    def ack(self, rows):
+        self.conn.executemany("DELETE FROM outbox WHERE id = ?", ((row[0],) for row in rows))
+        self.conn.commit()
+
+    def dead_letter(self, rows, error):
+        failed_at = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO dead_letter (id, url, payload, error, failed_at) VALUES (?, ?, ?, ?, ?)",
+            ((row_id, url, payload, error, failed_at) for row_id, url, payload in rows),
+        )
+        self.ack(rows)
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def api_article(item):
+    """
+    Maps a stored NewsArticleItem onto the API's Article model, or returns
+    None if it lacks a headline or body.
+    """
+    adapter = ItemAdapter(item)
+    if not adapter.get('headline') or not adapter.get('body_text'):
+        return None
+    published = adapter.get('publication_date')
+    return {
+        'url': adapter['url'],
+        'title': adapter['headline'],
+        'content': adapter['body_text'],
+        'source_site': adapter.get('source_site'),
+        # A UTC datetime after NormalizationPipeline; anything else is unknown to the API
+        'publication_date': published.isoformat() if isinstance(published, datetime) else None,
+    }
+
+
+class ApiHandoffExtension:
+    """
+    Forwards stored articles to the API service. Only new or updated
+    articles are sent: the Mongo pipelines send article_stored after the
+    write, and never for unchanged articles.
+
+    The outbox is flushed whenever API_HANDOFF_BATCH_SIZE articles are
+    waiting and every API_HANDOFF_FLUSH_INTERVAL seconds, when the jobs of
+    earlier batches are checked as well. Failed sends are retried with
+    exponential backoff (with jitter) up to API_HANDOFF_MAX_BACKOFF seconds
+    apart; articles whose job failed are re-sent up to
+    API_HANDOFF_MAX_ATTEMPTS times. When the spider closes, sending and
+    waiting for jobs continue for up to API_HANDOFF_CLOSE_TIMEOUT seconds;
+    anything left stays in the outbox for the next crawl.
+    """
+    # How often a closing spider checks on jobs that are still running
+    close_poll_interval = 1.0
+
+    def __init__(self, api_url, spool_dir, stats, batch_size=200, flush_interval=5.0,
+                 max_backoff=60.0, close_timeout=30.0, request_timeout=30.0, max_attempts=3):
+        self.api_url = api_url.rstrip('/')
+        self.spool_dir = Path(spool_dir)
+        self.stats = stats
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.close_timeout = close_timeout
+        self.request_timeout = request_timeout
+        self.max_attempts = max_attempts
+        self.failures = 0
+        # Articles spooled since the sender last woke up
+        self.pending = 0
+        self.closing = False
+        self.sender = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('API_HANDOFF_ENABLED'):
+            raise NotConfigured
+        ext = cls(
+            api_url=settings.get('API_HANDOFF_URL', 'http://127.0.0.1:8000'),
+            spool_dir=data_path(settings.get('API_HANDOFF_SPOOL_DIR', 'api_handoff'), createdir=True),
+            stats=crawler.stats,
+            batch_size=settings.getint('API_HANDOFF_BATCH_SIZE', 200),
+            flush_interval=settings.getfloat('API_HANDOFF_FLUSH_INTERVAL', 5.0),
+            max_backoff=settings.getfloat('API_HANDOFF_MAX_BACKOFF', 60.0),
+            close_timeout=settings.getfloat('API_HANDOFF_CLOSE_TIMEOUT', 30.0),
+            request_timeout=settings.getfloat('API_HANDOFF_REQUEST_TIMEOUT', 30.0),
+            max_attempts=settings.getint('API_HANDOFF_MAX_ATTEMPTS', 3),
+        )
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        # spider_closed comes after the pipelines closed, so BulkMongoPipeline's last flush is included
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(ext.article_stored, signal=article_stored)
+        return ext
+
+    def spider_opened(self, spider):
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.spool = HandoffSpool(str(self.spool_dir / f'{spider.name}.sqlite'))
+        backlog = len(self.spool)
+        self.stats.set_value('api_handoff/backlog_at_open', backlog)
+        if backlog:
+            spider.logger.info(f"API handoff: {backlog} articles left from a previous crawl will be sent first.")
+
+        # One client for the whole crawl, so batches reuse the same keep-alive connection
+        self.client = httpx.AsyncClient(
+            base_url=self.api_url,
+            timeout=self.request_timeout,
+            limits=httpx.Limits(max_connections=2, max_keepalive_connections=2),
+        )
+        self.wakeup = asyncio.Event()
+        self.sender = asyncio.ensure_future(self._run(spider))
+
+    def article_stored(self, item, spider):
+        article = api_article(item)
+        if article is None:
+            self.stats.inc_value('api_handoff/skipped_incomplete')
+            return
+        self.spool.append(article['url'], json.dumps(article, ensure_ascii=False, default=str))
+        self.stats.inc_value('api_handoff/spooled')
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.wakeup.set()
+
+    def spider_closed(self, spider):
+        return deferred_from_coro(self._close(spider))
+
+    async def _close(self, spider):
+        self.closing = True
+        self.wakeup.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self.sender), self.close_timeout)
+        except asyncio.TimeoutError:
+            self.sender.cancel()
+            await asyncio.gather(self.sender, return_exceptions=True)
+        except Exception:
+            spider.logger.exception("API handoff: sender failed")
+        try:
+            backlog = len(self.spool)
+            self.stats.set_value('api_handoff/backlog_at_close', backlog)
+            if backlog:
+                spider.logger.warning(
+                    f"API handoff: {backlog} articles not yet processed by the API stay in {self.spool.path} "
+                    f"for the next crawl."
+                )
+        except sqlite3.Error:
+            spider.logger.exception(f"API handoff: could not read the outbox {self.spool.path}")
+        finally:
+            try:
+                await self.client.aclose()
+            finally:
+                self.spool.close()
+
+    # --- Sender ---
+
+    async def _wait(self, timeout):
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.wakeup.clear()
+
+    def backoff(self):
+        return min(self.max_backoff, 2 ** (self.failures - 1)) * random.uniform(0.5, 1.0)
+
+    async def _run(self, spider):
+        while True:
+            if not self.closing:
+                await self._wait(self.flush_interval)
+            self.pending = 0
+            try:
+                while rows := self.spool.peek(self.batch_size):
+                    if await self._send(rows, spider):
+                        self.failures = 0
+                        continue
+                    self.failures += 1
+                    self.stats.inc_value('api_handoff/retries')
+                    delay = self.backoff()
+                    spider.logger.info(f"API handoff: retrying in {delay:.1f}s ({len(self.spool)} articles waiting).")
+                    await asyncio.sleep(delay)
+                running = await self._check_jobs(spider)
+            except Exception:
+                # A malformed answer or an outbox error must not stop sending for the rest of the crawl
+                self.failures += 1
+                self.stats.inc_value('api_handoff/retries')
+                delay = self.backoff()
+                spider.logger.exception(f"API handoff: unexpected error while sending, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            if self.closing:
+                if running == 0 and not self.spool.peek(1):
+                    return
+                await asyncio.sleep(self.close_poll_interval)
+
+    async def _send(self, rows, spider):
+        """
+        Posts one batch. Returns True when the batch is done with (accepted,
+        or refused permanently and dead-lettered), False to retry it, or
+        the part of it the API did not queue, later.
+        """
+        body = gzip.compress('\n'.join(row[2] for row in rows).encode('utf-8'), compresslevel=5)
+        try:
+            response = await self.client.post(
+                '/process-articles:bulk',
+                content=body,
+                headers={'Content-Type': 'application/x-ndjson', 'Content-Encoding': 'gzip'},
+            )
+        except httpx.HTTPError as e:
+            spider.logger.warning(f"API handoff: could not reach {self.api_url}: {e!r}")
+            return False
+
+        if response.status_code in RETRYABLE_STATUSES:
+            spider.logger.warning(f"API handoff: {self.api_url} answered {response.status_code}")
+            return False
+        if response.status_code >= 400:
+            self.spool.dead_letter(rows, f"HTTP {response.status_code}: {response.text[:500]}")
+            self.stats.inc_value('api_handoff/dead_lettered', len(rows))
+            spider.logger.error(
+                f"API handoff: {len(rows)} articles refused with HTTP {response.status_code}, "
+                f"moved to the dead_letter table of {self.spool.path}"
+            )
+            return True
+
+        result = response.json()
+        # Accepted rows wait for their job; rows outside every job were rejected, unless
+        # the API could not read the whole body, when they may just be corrupt and stay unsent
+        assignments = [
+            (job_id, row[0])
+            for job_id, (first, last) in zip(result.get('jobs', []), result.get('job_lines', []))
+            for row in rows[first - 1:last]
+        ]
+        self.spool.accept(assignments)
+        assigned = {row_id for _, row_id in assignments}
+        self.stats.inc_value('api_handoff/batches')
+        self.stats.inc_value('api_handoff/sent', result.get('accepted', 0))
+        if result.get('aborted'):
+            spider.logger.warning(
+                f"API handoff: {self.api_url} could not read the whole batch ({result['aborted']}); "
+                f"{len(rows) - len(assigned)} articles will be sent again."
+            )
+            return False
+        self.spool.ack([row for row in rows if row[0] not in assigned])
+        if result.get('rejected'):
+            # Validation failures will not pass on a retry either
+            self.stats.inc_value('api_handoff/rejected', result['rejected'])
+            for error in result.get('errors', []):
+                url = rows[error['line'] - 1][1] if 0 < error['line'] <= len(rows) else '?'
+                spider.logger.warning(f"API handoff: {url} rejected: {error['error']}")
+        return True
+
+    async def _check_jobs(self, spider):
+        """
+        Asks the API about every job holding outbox rows: rows of finished
+        jobs are removed, rows of failed or unknown jobs (expired, or lost in
+        an API restart) are queued to be sent again. Returns the number of
+        jobs still running, or None if the API could not be reached.
+        """
+        running = 0
+        for job_id in self.spool.jobs():
+            try:
+                response = await self.client.get(f'/api/v1/jobs/{job_id}')
+            except httpx.HTTPError as e:
+                spider.logger.warning(f"API handoff: could not check jobs at {self.api_url}: {e!r}")
+                return None
+            if response.status_code == 404:
+                status, error = 'lost', 'job unknown to the API'
+            elif response.status_code >= 400:
+                running += 1
+                continue
+            else:
+                job = response.json()
+                status, error = job['status'], job.get('error')
+
+            if status == 'done':
+                self.stats.inc_value('api_handoff/processed', self.spool.finish_job(job_id))
+            elif status in ('failed', 'lost'):
+                retried, dead = self.spool.retry_job(job_id, self.max_attempts, f"job {job_id}: {error}")
+                self.stats.inc_value('api_handoff/resent', retried)
+                if dead:
+                    self.stats.inc_value('api_handoff/dead_lettered', dead)
+                spider.logger.warning(
+                    f"API handoff: job {job_id} {status} ({error}); {retried} articles will be sent again, "
+                    f"{dead} moved to the dead_letter table."
+                )
+            else:
+                running += 1
+        return running
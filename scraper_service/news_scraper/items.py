@@ -3,12 +3,31 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/items.html
 
-import scrapy
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional, Union
 
-class NewsArticleItem(scrapy.Item):
-    url = scrapy.Field()
-    headline = scrapy.Field()
-    author = scrapy.Field()
-    publication_date = scrapy.Field()
-    body_text = scrapy.Field()
-    source_site = scrapy.Field()
\ No newline at end of file
+
+@dataclass(slots=True)
+class NewsArticleItem:
+    """
+    A scraped news article. Spiders fill in the raw fields; NormalizationPipeline
+    then converts publication_date to a UTC datetime, replaces 'N/A'
+    placeholders with None and derives authors, canonical_url and source_id.
+    """
+    url: str
+    source_site: str
+    headline: Optional[str] = None
+    # Byline as printed on the page
+    author: Optional[str] = None
+    publication_date: Optional[Union[str, datetime]] = None
+    body_text: Optional[str] = None
+    # From the page's JSON-LD when available
+    section: Optional[str] = None
+    keywords: List[str] = field(default_factory=list)
+    # Set by NormalizationPipeline
+    authors: List[str] = field(default_factory=list)
+    canonical_url: Optional[str] = None
+    source_id: Optional[str] = None
+    # SHA-1 of headline + body_text + publication_date, set by the Mongo pipelines
+    content_hash: Optional[str] = None
@@ -0,0 +1,22 @@
+# Custom log formatter for the news_scraper project
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/logging.html#custom-log-formats
+
+import logging
+
+from scrapy import logformatter
+
+from news_scraper.pipelines import UnchangedItem
+
+
+class NewsLogFormatter(logformatter.LogFormatter):
+    def dropped(self, item, exception, response, spider):
+        """
+        Unchanged articles are skipped on every recrawl, so they are logged
+        at DEBUG instead of Scrapy's default WARNING.
+        """
+        entry = super().dropped(item, exception, response, spider)
+        if isinstance(exception, UnchangedItem):
+            entry['level'] = logging.DEBUG
+        return entry
@@ -3,11 +3,26 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
-from scrapy import signals
+import statistics
+import time
+from collections import OrderedDict, defaultdict, deque
+
+import pymongo
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from scrapy import Request, signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import TextResponse
+from twisted.internet.error import TCPTimedOutError, TimeoutError
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.project import data_path
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
 
+from news_scraper.normalization import parse_publication_date
+from news_scraper.pipelines import UnchangedItem, article_stored, client_pool
+from news_scraper.seen_urls import SeenUrlIndex
+
 
 class NewsScraperSpiderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
@@ -98,3 +113,380 @@ class NewsScraperDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class SeenUrlMiddleware:
+    """
+    Drops requests for article urls that are already stored, before they
+    reach the (Playwright) download handler.
+
+    Urls are recorded in a SeenUrlIndex once a Mongo pipeline confirms the
+    article was written (the article_stored signal) or finds it unchanged,
+    so articles whose write failed are fetched again by the next crawl.
+    The index can be seeded from the `url` field of news_articles. Listing
+    pages never produce items, so they are never skipped. Urls matching a
+    SEEN_URLS_RECRAWL_AFTER pattern (e.g. '/liveblog/') are fetched again
+    once their TTL in seconds has passed.
+    """
+    max_requested_urls = 10000
+
+    def __init__(self, index_path, recrawl_after, stats, mongo_uri=None, mongo_db=None):
+        self.index_path = index_path
+        self.recrawl_after = recrawl_after
+        self.stats = stats
+        self.mongo_uri = mongo_uri
+        self.mongo_db = mongo_db
+        self.index = None
+        # Final url -> requested url of recent responses that ended up elsewhere
+        # (Playwright follows redirects inside the browser)
+        self.requested_urls = OrderedDict()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('SEEN_URLS_ENABLED'):
+            raise NotConfigured
+        seed = settings.getbool('SEEN_URLS_SEED_FROM_MONGO')
+        s = cls(
+            index_path=data_path(settings.get('SEEN_URLS_PATH', 'seen_urls.sqlite'), createdir=True),
+            recrawl_after=settings.getdict('SEEN_URLS_RECRAWL_AFTER'),
+            stats=crawler.stats,
+            mongo_uri=settings.get('MONGO_URI') if seed else None,
+            mongo_db=settings.get('MONGO_DB', 'news_data'),
+        )
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(s.article_stored, signal=article_stored)
+        crawler.signals.connect(s.item_dropped, signal=signals.item_dropped)
+        crawler.signals.connect(s.item_error, signal=signals.item_error)
+        return s
+
+    def spider_opened(self, spider):
+        self.index = SeenUrlIndex.open(self.index_path)
+        if self.mongo_uri:
+            self.seed_from_mongo(spider)
+        spider.logger.info(f"Seen-url index opened with {len(self.index)} urls: {self.index_path}")
+
+    def seed_from_mongo(self, spider):
+        client = client_pool.acquire(pymongo.MongoClient, self.mongo_uri)
+        try:
+            cursor = client[self.mongo_db]['news_articles'].find({}, {'_id': 0, 'url': 1})
+            added = self.index.add_many(doc['url'] for doc in cursor if doc.get('url'))
+        finally:
+            if client_pool.release(pymongo.MongoClient, self.mongo_uri) is not None:
+                client.close()
+        spider.logger.info(f"Seeded seen-url index with {added} urls from MongoDB.")
+
+    def spider_closed(self, spider):
+        if self.index:
+            self.index.close()
+
+    def article_stored(self, item, spider):
+        url = ItemAdapter(item)['url']
+        self.index.add(url)
+        # Redirected articles are stored under their final url; remember the requested one too
+        requested = self.requested_urls.pop(url, None)
+        if requested is not None:
+            self.index.add(requested)
+
+    def item_dropped(self, item, response, exception, spider):
+        # Unchanged articles are already stored, they just skipped the write
+        if isinstance(exception, UnchangedItem):
+            self.article_stored(item, spider)
+        else:
+            self.requested_urls.pop(ItemAdapter(item).get('url'), None)
+
+    def item_error(self, item, response, spider, failure):
+        self.requested_urls.pop(ItemAdapter(item).get('url'), None)
+
+    def recrawl_ttl(self, url):
+        for pattern, ttl in self.recrawl_after.items():
+            if pattern in url:
+                return float(ttl)
+        return None
+
+    def process_request(self, request, spider):
+        seen_at = self.index.seen_at(request.url)
+        if seen_at is None:
+            return None
+
+        ttl = self.recrawl_ttl(request.url)
+        if ttl is not None and time.time() - seen_at >= ttl:
+            self.stats.inc_value('seen_urls/recrawled')
+            return None
+
+        self.stats.inc_value('seen_urls/skipped')
+        raise IgnoreRequest(f"Already scraped: {request.url}")
+
+    def process_response(self, request, response, spider):
+        if response.url != request.url:
+            self.requested_urls[response.url] = request.url
+            # Listing pages that redirect never produce an item to pop their entry
+            if len(self.requested_urls) > self.max_requested_urls:
+                self.requested_urls.popitem(last=False)
+        return response
+
+
+class RenderFallbackMiddleware:
+    """
+    Implements the per-spider render policy: article requests flagged with
+    meta['render_fallback'] are fetched over plain HTTP, and only re-issued
+    through Playwright when the response is missing content the spider needs.
+
+    Spiders describe the policy with a `render_policy` attribute:
+
+        render_policy = {
+            # Every group must match; a comma inside a group means "any of"
+            'required_css': ['h1.title', 'div.article-body p'],
+            # Extra meta merged into the Playwright retry
+            'playwright_meta': {'playwright_page_methods': [...]},
+        }
+
+    Outcomes are counted per domain under render_policy/<domain>/* stats.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('RENDER_FALLBACK_ENABLED', True):
+            raise NotConfigured
+        return cls(crawler.stats)
+
+    def process_response(self, request, response, spider):
+        policy = getattr(spider, 'render_policy', None)
+        if not policy or not request.meta.get('render_fallback') or request.meta.get('playwright'):
+            return response
+        if response.status != 200 or not isinstance(response, TextResponse):
+            return response
+
+        domain = urlparse_cached(request).hostname
+        if self.is_complete(response, policy):
+            self.stats.inc_value(f'render_policy/{domain}/http_ok')
+            return response
+
+        self.stats.inc_value(f'render_policy/{domain}/playwright_fallback')
+        spider.logger.debug(f"Required content missing over plain HTTP, rendering with Playwright: {request.url}")
+        meta = dict(request.meta, playwright=True, **policy.get('playwright_meta', {}))
+        return request.replace(meta=meta, dont_filter=True)
+
+    def is_complete(self, response, policy):
+        return all(response.css(selector) for selector in policy.get('required_css', []))
+
+
+class IncrementalCrawlMiddleware:
+    """
+    Spider middleware that stops pagination once a listing page has nothing new.
+
+    Spiders mark their "next page" requests with meta['pagination'] = True.
+    When every article link on a listing page is already in the seen-url
+    index, or the page links to the newest article stored by the previous
+    run, the pagination request is dropped. The newest publication date and
+    url scraped in a run are persisted as the spider's high-water mark.
+    """
+
+    def __init__(self, index_path, stats):
+        self.index_path = index_path
+        self.stats = stats
+        self.index = None
+        self.last_url = None
+        self.newest_date = None
+        self.newest_url = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('INCREMENTAL_CRAWL'):
+            raise NotConfigured
+        if not settings.getbool('SEEN_URLS_ENABLED'):
+            raise NotConfigured("INCREMENTAL_CRAWL requires SEEN_URLS_ENABLED")
+        s = cls(
+            index_path=data_path(settings.get('SEEN_URLS_PATH', 'seen_urls.sqlite'), createdir=True),
+            stats=crawler.stats,
+        )
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(s.item_scraped, signal=signals.item_scraped)
+        return s
+
+    def spider_opened(self, spider):
+        self.index = SeenUrlIndex.open(self.index_path)
+        newest_date, self.last_url = self.index.high_water_mark(spider.name)
+        self.newest_date = parse_publication_date(newest_date) if newest_date else None
+        self.newest_url = self.last_url
+        spider.logger.info(f"Incremental crawl, last run's newest article: {self.last_url} ({newest_date})")
+
+    def spider_closed(self, spider, reason):
+        if self.newest_url:
+            self.index.set_high_water_mark(
+                spider.name,
+                self.newest_date.isoformat() if self.newest_date else None,
+                self.newest_url,
+            )
+        self.index.close()
+
+    def item_scraped(self, item, response, spider):
+        adapter = ItemAdapter(item)
+        published = parse_publication_date(adapter.get('publication_date'))
+        if published and (self.newest_date is None or published > self.newest_date):
+            self.newest_date = published
+            self.newest_url = adapter['url']
+
+    def nothing_new(self, article_urls):
+        if self.last_url and self.last_url in article_urls:
+            return True
+        return all(url in self.index for url in article_urls)
+
+    async def process_spider_output(self, response, result, spider):
+        pagination = []
+        article_urls = []
+        async for output in result:
+            if isinstance(output, Request):
+                if output.meta.get('pagination'):
+                    # Held back until we know whether this page had anything new
+                    pagination.append(output)
+                    continue
+                article_urls.append(output.url)
+            yield output
+
+        if pagination and article_urls and self.nothing_new(article_urls):
+            self.stats.inc_value('incremental/pagination_stopped')
+            spider.logger.info(f"No new articles on {response.url}, stopping pagination.")
+            return
+
+        for request in pagination:
+            yield request
+
+
+RENDER_MODES = ('http', 'playwright')
+
+
+def slot_key(domain, mode):
+    """
+    Download slot used for a source and rendering mode, e.g. 'ndtv.com/playwright'.
+    """
+    return f'{domain}/{mode}'
+
+
+def is_mode_slot(key):
+    return key is not None and key.rpartition('/')[2] in RENDER_MODES
+
+
+class AdaptiveConcurrencyMiddleware:
+    """
+    Routes each request into a per-source, per-rendering-mode download slot
+    and adapts that slot's concurrency to how the site is responding.
+
+    Slots are named '<domain>/http' or '<domain>/playwright' and start with
+    the limits from SOURCE_CONCURRENCY_PROFILES (see DOWNLOAD_SLOTS in
+    settings). After every ADAPTIVE_CONCURRENCY_WINDOW clean responses whose
+    p90 latency is under the profile's target, concurrency grows by one up
+    to the profile maximum; a 429, a 5xx or a timeout (including a Playwright
+    navigation timeout) halves it.
+    Live concurrency and latency percentiles are exported as
+    adaptive_concurrency/<slot>/* stats.
+    """
+
+    backoff_statuses = {429, 500, 502, 503, 504}
+
+    def __init__(self, crawler, profiles, default_profile, window):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.profiles = profiles
+        self.default_profile = default_profile
+        self.window = window
+        self.concurrency = {}
+        self.latencies = defaultdict(lambda: deque(maxlen=window))
+        self.clean_responses = defaultdict(int)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('ADAPTIVE_CONCURRENCY_ENABLED'):
+            raise NotConfigured
+        return cls(
+            crawler,
+            profiles=settings.getdict('SOURCE_CONCURRENCY_PROFILES'),
+            default_profile=settings.getdict('DEFAULT_CONCURRENCY_PROFILE'),
+            window=settings.getint('ADAPTIVE_CONCURRENCY_WINDOW', 20),
+        )
+
+    def source_for(self, request):
+        host = urlparse_cached(request).hostname or ''
+        for domain in self.profiles:
+            if host == domain or host.endswith(f'.{domain}'):
+                return domain
+        return host
+
+    def profile_for(self, key):
+        domain, _, mode = key.rpartition('/')
+        return self.profiles.get(domain, self.default_profile)[mode]
+
+    def process_request(self, request, spider):
+        # Slots set by this middleware are recomputed, since a request re-issued
+        # through Playwright (RenderFallbackMiddleware) carries the meta of its
+        # plain-HTTP attempt; slots chosen elsewhere are left alone
+        slot = request.meta.get('download_slot')
+        if slot is None or is_mode_slot(slot):
+            mode = 'playwright' if request.meta.get('playwright') else 'http'
+            request.meta['download_slot'] = slot_key(self.source_for(request), mode)
+        return None
+
+    def process_response(self, request, response, spider):
+        key = request.meta.get('download_slot')
+        if not is_mode_slot(key):
+            return response
+        if response.status in self.backoff_statuses:
+            self.back_off(key, spider, f"HTTP {response.status}")
+        else:
+            self.record_success(key, request.meta.get('download_latency'))
+        return response
+
+    def process_exception(self, request, exception, spider):
+        key = request.meta.get('download_slot')
+        if is_mode_slot(key) and isinstance(exception, (TimeoutError, TCPTimedOutError, PlaywrightTimeoutError)):
+            self.back_off(key, spider, type(exception).__name__)
+        return None
+
+    def record_success(self, key, latency):
+        profile = self.profile_for(key)
+        if latency is not None:
+            self.latencies[key].append(latency)
+        self.clean_responses[key] += 1
+        if self.clean_responses[key] < self.window or not self.latencies[key]:
+            return
+
+        self.clean_responses[key] = 0
+        latencies = self.latencies[key]
+        # Percentiles 1-99 of the window; a single latency is all of them
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+        p90 = cuts[89]
+        self.stats.set_value(f'adaptive_concurrency/{key}/latency_p50', round(cuts[49], 3))
+        self.stats.set_value(f'adaptive_concurrency/{key}/latency_p90', round(p90, 3))
+        self.stats.set_value(f'adaptive_concurrency/{key}/latency_p99', round(cuts[98], 3))
+        if p90 <= profile['target_latency']:
+            self.set_concurrency(key, self.current(key) + 1)
+
+    def back_off(self, key, spider, reason):
+        self.clean_responses[key] = 0
+        self.stats.inc_value(f'adaptive_concurrency/{key}/backoffs')
+        new = self.current(key) // 2
+        if self.set_concurrency(key, new):
+            spider.logger.info(f"Backing off {key} to {self.current(key)} concurrent requests after {reason}.")
+
+    def current(self, key):
+        return self.concurrency.get(key, self.profile_for(key)['concurrency'])
+
+    def set_concurrency(self, key, value):
+        profile = self.profile_for(key)
+        value = max(1, min(profile['max_concurrency'], value))
+        if value == self.current(key) and key in self.concurrency:
+            return False
+        self.concurrency[key] = value
+        slot = self.crawler.engine.downloader.slots.get(key)
+        if slot is not None:
+            slot.concurrency = value
+        self.stats.set_value(f'adaptive_concurrency/{key}/concurrency', value)
+        self.stats.max_value(f'adaptive_concurrency/{key}/max_concurrency', value)
+        return True
@@ -0,0 +1,62 @@
+# One-off data migrations for the news_articles collection.
+#
+# Articles stored before NormalizationPipeline existed keep publication_date
+# as the raw string the spider scraped ('N/A', ISO text, RFC 2822 text).
+# MongoDB sorts and compares such values as strings, apart from real dates,
+# so they fall outside date-range queries and "latest articles" listings.
+# Run once after upgrading:
+#     python -m news_scraper.migrations
+
+from datetime import timezone
+from zoneinfo import ZoneInfo
+
+import pymongo
+from pymongo import UpdateOne
+
+from news_scraper.normalization import parse_publication_date
+
+
+def normalize_publication_dates(collection, naive_timezone=timezone.utc, batch_size=500):
+    """
+    Rewrites string publication_dates as UTC datetimes, or None where they
+    cannot be parsed, with the same rules as NormalizationPipeline.
+    Returns (converted, cleared).
+    """
+    converted = cleared = 0
+    operations = []
+    cursor = collection.find({'publication_date': {'$type': 'string'}}, {'publication_date': 1})
+    for document in cursor:
+        published = parse_publication_date(document['publication_date'], naive_timezone)
+        if published is None:
+            cleared += 1
+        else:
+            converted += 1
+        operations.append(UpdateOne(
+            {'_id': document['_id'], 'publication_date': document['publication_date']},
+            {'$set': {'publication_date': published}},
+        ))
+        if len(operations) >= batch_size:
+            collection.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+    return converted, cleared
+
+
+def main():
+    from scrapy.utils.project import get_project_settings
+
+    settings = get_project_settings()
+    client = pymongo.MongoClient(settings.get('MONGO_URI'))
+    try:
+        collection = client[settings.get('MONGO_DB', 'news_data')]['news_articles']
+        converted, cleared = normalize_publication_dates(
+            collection, ZoneInfo(settings.get('NORMALIZE_NAIVE_TIMEZONE', 'UTC'))
+        )
+        print(f"publication_date: {converted} strings converted to dates, {cleared} unparseable values cleared")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# Index declarations and bootstrap for the news_articles collection.
+#
+# The Mongo pipelines call ensure_indexes() when the spider opens (see
+# MONGO_ENSURE_INDEXES). The module can also be run on its own to create
+# the indexes and print how often each one has been used:
+#     python -m news_scraper.mongo_indexes
+
+import logging
+
+import pymongo
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+ARTICLE_INDEXES = [
+    # Upserts look articles up by url, so this must exist before the collection grows
+    IndexModel([('url', ASCENDING)], name='url_unique', unique=True),
+    # "Latest articles" listings of the API, which page by (publication_date,
+    # _id) keyset, overall and per source; also serve date-range queries
+    IndexModel([('publication_date', DESCENDING), ('_id', DESCENDING)], name='publication_date_id'),
+    IndexModel(
+        [('source_site', ASCENDING), ('publication_date', DESCENDING), ('_id', DESCENDING)],
+        name='source_site_publication_date_id',
+    ),
+    IndexModel(
+        [('headline', TEXT), ('body_text', TEXT)],
+        name='headline_body_text',
+        weights={'headline': 5, 'body_text': 1},
+        default_language='english',
+    ),
+]
+
+
+def ensure_indexes(collection, indexes=ARTICLE_INDEXES):
+    """
+    Creates each declared index that does not exist yet. Indexes are created
+    one at a time so a failure (e.g. duplicate urls blocking the unique
+    index) is logged without preventing the others.
+    Returns the names of the indexes that are in place.
+    """
+    ready = []
+    for index in indexes:
+        name = index.document['name']
+        try:
+            collection.create_indexes([index])
+            ready.append(name)
+        except OperationFailure as e:
+            logger.error(f"Could not create index {name} on {collection.name}: {e}")
+    return ready
+
+
+async def ensure_indexes_async(collection, indexes=ARTICLE_INDEXES):
+    """
+    ensure_indexes() for pymongo's AsyncCollection.
+    """
+    ready = []
+    for index in indexes:
+        name = index.document['name']
+        try:
+            await collection.create_indexes([index])
+            ready.append(name)
+        except OperationFailure as e:
+            logger.error(f"Could not create index {name} on {collection.name}: {e}")
+    return ready
+
+
+def index_usage_pipeline():
+    return [
+        {'$indexStats': {}},
+        {'$project': {'_id': 0, 'name': 1, 'ops': '$accesses.ops', 'since': '$accesses.since'}},
+        {'$sort': {'ops': -1}},
+    ]
+
+
+def index_usage(collection):
+    """
+    Returns [{'name', 'ops', 'since'}] for every index on the collection,
+    most used first, or [] if the server refuses $indexStats. Counters reset
+    when mongod restarts.
+    """
+    try:
+        return list(collection.aggregate(index_usage_pipeline()))
+    except PyMongoError as e:
+        logger.warning(f"Could not read index usage for {collection.name}: {e}")
+        return []
+
+
+async def index_usage_async(collection):
+    try:
+        cursor = await collection.aggregate(index_usage_pipeline())
+        return await cursor.to_list()
+    except PyMongoError as e:
+        logger.warning(f"Could not read index usage for {collection.name}: {e}")
+        return []
+
+
+def main():
+    from scrapy.utils.project import get_project_settings
+
+    settings = get_project_settings()
+    client = pymongo.MongoClient(settings.get('MONGO_URI'))
+    try:
+        collection = client[settings.get('MONGO_DB', 'news_data')]['news_articles']
+        print(f"Indexes in place: {', '.join(ensure_indexes(collection))}")
+        for usage in index_usage(collection):
+            print(f"  {usage['name']:<32}{usage['ops']:>12} ops since {usage['since']}")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# Field normalization shared by the pipelines and middlewares.
+#
+# Spiders emit whatever the page provides: ISO or RFC 2822 dates, 'N/A'
+# placeholders, comma-joined bylines. These helpers turn that into the
+# canonical types stored in MongoDB.
+
+import re
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from zoneinfo import ZoneInfo
+
+# Values spiders use for "not found"
+MISSING_VALUES = ('', 'N/A')
+
+TRACKING_PARAMS = frozenset({'fbclid', 'gclid', 'ref', 'ref_src', 'from'})
+
+_AUTHOR_SEPARATORS = re.compile(r'\s*(?:,|;|\||&|\band\b)\s*', re.IGNORECASE)
+_AUTHOR_PREFIX = re.compile(r'^(?:written\s+)?by\s+', re.IGNORECASE)
+
+IST = ZoneInfo('Asia/Kolkata')
+
+
+def clean_text(value):
+    """
+    Strips a scraped string, returning None for empty values and placeholders.
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    return None if value in MISSING_VALUES else value
+
+
+def parse_publication_date(value, default_tz=timezone.utc):
+    """
+    Parses an ISO-8601 or RFC 2822 date into an aware UTC datetime.
+    Naive values are interpreted in `default_tz`. Returns None for missing
+    or unparseable values.
+    """
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        value = clean_text(value)
+        if value is None:
+            return None
+        try:
+            dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            try:
+                dt = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=default_tz)
+    return dt.astimezone(timezone.utc)
+
+
+def split_authors(value):
+    """
+    Splits a byline such as 'By A, B and C' into ['A', 'B', 'C'].
+    """
+    if value is None:
+        return []
+    parts = value if isinstance(value, (list, tuple)) else _AUTHOR_SEPARATORS.split(str(value))
+    authors = []
+    for part in parts:
+        name = clean_text(_AUTHOR_PREFIX.sub('', str(part).strip()))
+        if name and name not in authors:
+            authors.append(name)
+    return authors
+
+
+def canonicalize_url(url):
+    """
+    Lower-cases the scheme and host, drops the fragment, default ports and
+    tracking query parameters, and sorts what remains of the query.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    if parts.port and (parts.scheme, parts.port) not in (('http', 80), ('https', 443)):
+        host = f'{host}:{parts.port}'
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith('utm_')
+    )
+    return urlunsplit((parts.scheme.lower(), host, parts.path or '/', urlencode(query), ''))
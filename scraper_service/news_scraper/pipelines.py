@@ -3,40 +3,522 @@
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
+import asyncio
+import hashlib
+import time
+from collections import Counter, OrderedDict, deque
+from zoneinfo import ZoneInfo
+
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
 
 import pymongo
+from pymongo import AsyncMongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from scrapy.exceptions import DropItem
+from scrapy.utils.defer import deferred_from_coro, maybe_deferred_to_future
+from twisted.internet import defer, task, threads
+
+from news_scraper.mongo_indexes import ensure_indexes, ensure_indexes_async, index_usage, index_usage_async
+from news_scraper.normalization import canonicalize_url, clean_text, parse_publication_date, split_authors
+
+
+class UnchangedItem(DropItem):
+    """
+    Raised for articles whose content fingerprint matches the stored copy.
+    Logged at DEBUG level by news_scraper.logformatter.NewsLogFormatter.
+    """
+
+
+# Custom signal sent with (item, spider) once MongoDB has acknowledged an
+# article's upsert. BulkMongoPipeline sends it when the batch holding the
+# article is flushed, which is usually after item_scraped.
+article_stored = object()
+
+
+def content_fingerprint(item):
+    """
+    Returns a stable SHA-1 fingerprint of the fields that make up an
+    article's content: headline, body text and publication date.
+    """
+    adapter = ItemAdapter(item)
+    parts = (adapter.get('headline'), adapter.get('body_text'), adapter.get('publication_date'))
+    payload = '\x1f'.join('' if part is None else str(part) for part in parts)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class FingerprintCache:
+    """
+    Bounded LRU mapping of article url -> content fingerprint for the most
+    recently seen articles.
+    """
+
+    def __init__(self, max_size=50000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, url):
+        fingerprint = self.entries.get(url)
+        if fingerprint is not None:
+            self.entries.move_to_end(url)
+        return fingerprint
+
+    def set(self, url, fingerprint):
+        self.entries[url] = fingerprint
+        self.entries.move_to_end(url)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def discard(self, url):
+        self.entries.pop(url, None)
+
+
+class NormalizationPipeline:
+    """
+    Converts spider output to canonical types before it is stored:
+    publication_date becomes an aware UTC datetime (naive dates are read in
+    NORMALIZE_NAIVE_TIMEZONE), 'N/A' and empty strings become None, the byline
+    is split into `authors`, and `canonical_url` and `source_id` are added.
+    """
+
+    text_fields = ('headline', 'author', 'body_text', 'section')
+
+    def __init__(self, stats, naive_timezone):
+        self.stats = stats
+        self.naive_timezone = naive_timezone
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            stats=crawler.stats,
+            naive_timezone=ZoneInfo(crawler.settings.get('NORMALIZE_NAIVE_TIMEZONE', 'UTC')),
+        )
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        for field in self.text_fields:
+            adapter[field] = clean_text(adapter.get(field))
+
+        raw_date = adapter.get('publication_date')
+        adapter['publication_date'] = parse_publication_date(raw_date, self.naive_timezone)
+        if adapter['publication_date'] is None and clean_text(raw_date) is not None:
+            self.stats.inc_value('normalization/unparsed_date')
+            spider.logger.warning(f"Could not parse publication date {raw_date!r} for {adapter['url']}")
+
+        adapter['authors'] = split_authors(adapter.get('author'))
+        adapter['keywords'] = [keyword for keyword in adapter.get('keywords') or [] if keyword]
+        adapter['canonical_url'] = canonicalize_url(adapter['url'])
+        adapter['source_id'] = spider.name
+        return item
+
+
+class ClientPool:
+    """
+    Process-wide, reference-counted MongoDB clients, so several crawlers
+    running in one process share a single connection pool per URI.
+    """
+
+    def __init__(self):
+        self.clients = {}
+        self.refs = Counter()
+
+    def acquire(self, client_cls, uri):
+        key = (client_cls, uri)
+        if key not in self.clients:
+            self.clients[key] = client_cls(uri)
+        self.refs[key] += 1
+        return self.clients[key]
+
+    def release(self, client_cls, uri):
+        """
+        Drops one reference and returns the client once nobody uses it any
+        more, so the caller can close it; returns None otherwise.
+        """
+        key = (client_cls, uri)
+        self.refs[key] -= 1
+        if self.refs[key] > 0:
+            return None
+        del self.refs[key]
+        return self.clients.pop(key, None)
+
+
+client_pool = ClientPool()
+
 
 class MongoPipeline:
+    """
+    Upserts articles by url. On open the indexes declared in
+    news_scraper.mongo_indexes are created (MONGO_ENSURE_INDEXES); on close
+    the write latency percentiles and $indexStats usage counters are
+    reported in the crawl stats. Writes slower than MONGO_SLOW_WRITE_MS are
+    logged and counted in mongo/writes/slow.
+    """
     collection_name = 'news_articles'
+    # Latencies kept for the percentiles reported at close
+    latency_window = 1000
 
-    def __init__(self, mongo_uri, mongo_db):
+    def __init__(self, mongo_uri, mongo_db, stats=None, fingerprint_cache_size=50000,
+                 manage_indexes=True, slow_write_ms=250, signals=None):
         self.mongo_uri = mongo_uri
         self.mongo_db = mongo_db
+        self.stats = stats
+        self.signals = signals
+        self.fingerprints = FingerprintCache(fingerprint_cache_size)
+        self.manage_indexes = manage_indexes
+        self.slow_write_ms = slow_write_ms
+        self.write_latencies = deque(maxlen=self.latency_window)
 
     @classmethod
     def from_crawler(cls, crawler):
-        return cls (
-            mongo_uri = crawler.settings.get('MONGO_URI'),
-            mongo_db = crawler.settings.get('MONGO_DB', 'news_data')
+        return cls(**cls.crawler_kwargs(crawler))
+
+    @classmethod
+    def crawler_kwargs(cls, crawler):
+        """
+        Constructor arguments read from the crawler; subclasses add their
+        own settings to these.
+        """
+        return dict(
+            mongo_uri=crawler.settings.get('MONGO_URI'),
+            mongo_db=crawler.settings.get('MONGO_DB', 'news_data'),
+            stats=crawler.stats,
+            fingerprint_cache_size=crawler.settings.getint('MONGO_FINGERPRINT_CACHE_SIZE', 50000),
+            manage_indexes=crawler.settings.getbool('MONGO_ENSURE_INDEXES', True),
+            slow_write_ms=crawler.settings.getfloat('MONGO_SLOW_WRITE_MS', 250),
+            signals=crawler.signals,
         )
-    
+
     def open_spider(self, spider):
-        self.client = pymongo.MongoClient(self.mongo_uri)
+        self.client = client_pool.acquire(pymongo.MongoClient, self.mongo_uri)
         self.db = self.client[self.mongo_db]
         spider.logger.info("MongoDb Connection Opened.")
+        if self.manage_indexes:
+            self.log_indexes(ensure_indexes(self.db[self.collection_name]), spider)
+        self.seed_fingerprints(self.db[self.collection_name].find(*self.fingerprint_query()), spider)
 
     def close_spider(self, spider):
-        self.client.close()
+        self.report_write_latency(spider)
+        self.report_index_usage(index_usage(self.db[self.collection_name]), spider)
+        client = client_pool.release(pymongo.MongoClient, self.mongo_uri)
+        if client is not None:
+            client.close()
         spider.logger.info("MongoDb Connection Closed.")
 
+    def fingerprint_query(self):
+        """
+        Filter and projection used to warm the fingerprint cache with the
+        most recently written articles.
+        """
+        return {'content_hash': {'$exists': True}}, {'_id': 0, 'url': 1, 'content_hash': 1}
+
+    def seed_fingerprints(self, cursor, spider):
+        # Newest documents first, so the LRU keeps the articles most likely to be recrawled
+        for doc in cursor.sort('_id', pymongo.DESCENDING).limit(self.fingerprints.max_size):
+            self.fingerprints.set(doc['url'], doc['content_hash'])
+        spider.logger.info(f"Loaded {len(self.fingerprints)} article fingerprints.")
+
+    def prepare_document(self, item):
+        """
+        Stamps the item with its content fingerprint and returns the document
+        to upsert, or raises UnchangedItem when the stored copy is identical.
+        """
+        adapter = ItemAdapter(item)
+        fingerprint = content_fingerprint(item)
+        if self.fingerprints.get(adapter['url']) == fingerprint:
+            self.inc_stat('mongo/articles/skipped_unchanged')
+            raise UnchangedItem(f"Unchanged article: {adapter['url']}")
+
+        adapter['content_hash'] = fingerprint
+        self.fingerprints.set(adapter['url'], fingerprint)
+        return adapter.asdict()
+
+    def record_result(self, result):
+        if result.upserted_id is not None:
+            self.inc_stat('mongo/articles/new')
+        elif result.modified_count:
+            self.inc_stat('mongo/articles/updated')
+
+    def send_stored(self, items, spider):
+        if self.signals is not None:
+            for item in items:
+                self.signals.send_catch_log(article_stored, item=item, spider=spider)
+
+    def inc_stat(self, key, count=1):
+        if self.stats is not None:
+            self.stats.inc_value(key, count)
+
+    def set_stat(self, key, value):
+        if self.stats is not None:
+            self.stats.set_value(key, value)
+
+    def log_indexes(self, ready, spider):
+        spider.logger.info(f"MongoDB indexes in place on {self.collection_name}: {', '.join(ready) or 'none'}")
+
+    def record_write_latency(self, elapsed, spider, description):
+        """
+        Records the latency of one upsert (for bulk writes, the batch time
+        divided by its size) and flags it when above MONGO_SLOW_WRITE_MS.
+        """
+        latency_ms = elapsed * 1000
+        self.write_latencies.append(latency_ms)
+        if self.stats is not None:
+            self.stats.max_value('mongo/write_latency/max_ms', round(latency_ms, 1))
+        if latency_ms >= self.slow_write_ms:
+            self.inc_stat('mongo/writes/slow')
+            spider.logger.warning(f"Slow MongoDB write ({latency_ms:.0f} ms): {description}")
+
+    def report_write_latency(self, spider):
+        if not self.write_latencies:
+            return
+        ordered = sorted(self.write_latencies)
+        p50 = ordered[len(ordered) // 2]
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        self.set_stat('mongo/write_latency/p50_ms', round(p50, 1))
+        self.set_stat('mongo/write_latency/p95_ms', round(p95, 1))
+        spider.logger.info(
+            f"MongoDB write latency over the last {len(ordered)} writes: p50 {p50:.1f} ms, p95 {p95:.1f} ms."
+        )
+
+    def report_index_usage(self, usage, spider):
+        """
+        Stores $indexStats access counters as mongo/index_usage/<index> and
+        warns about declared indexes the server has never used.
+        """
+        for entry in usage:
+            self.set_stat(f"mongo/index_usage/{entry['name']}", entry['ops'])
+        if usage:
+            spider.logger.info(
+                "MongoDB index usage: " + ', '.join(f"{entry['name']}={entry['ops']}" for entry in usage)
+            )
+        unused = [entry['name'] for entry in usage if not entry['ops'] and entry['name'] != '_id_']
+        if unused:
+            spider.logger.warning(f"MongoDB indexes never used since server start: {', '.join(unused)}")
+
     def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        document = self.prepare_document(item)
         # Using the url as the unique identifier to avoid duplcations
-        self.db[self.collection_name].update_one(
-            {'url': item['url']},
-            {'$set': dict(item)},
-            upsert=True
+        start = time.perf_counter()
+        try:
+            result = self.db[self.collection_name].update_one(
+                {'url': adapter['url']},
+                {'$set': document},
+                upsert=True
+            )
+        except PyMongoError:
+            self.fingerprints.discard(adapter['url'])
+            raise
+        self.record_write_latency(time.perf_counter() - start, spider, adapter['url'])
+        self.record_result(result)
+        self.send_stored([item], spider)
+        spider.logger.info(f"Saved article to MongoDB: {adapter['headline']}")
+        return item
+
+
+class BulkMongoPipeline(MongoPipeline):
+    """
+    Buffers upserts and writes them with one unordered bulk_write instead of
+    a round trip per article. The buffer is flushed when MONGO_BULK_SIZE
+    operations are queued, every MONGO_BULK_FLUSH_INTERVAL seconds, and
+    always when the spider closes. The bulk_write runs in a thread, so the
+    reactor keeps downloading during the round trip; an item that fills the
+    buffer waits for its flush, which holds new items back while MongoDB is
+    slow.
+    """
+
+    def __init__(self, *args, bulk_size=100, flush_interval=5.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bulk_size = bulk_size
+        self.flush_interval = flush_interval
+        self.operations = []
+        self.items = []
+        self.flush_loop = None
+        # One flush at a time, so two versions of an article are written in order
+        self.flush_lock = defer.DeferredLock()
+
+    @classmethod
+    def crawler_kwargs(cls, crawler):
+        return dict(
+            super().crawler_kwargs(crawler),
+            bulk_size=crawler.settings.getint('MONGO_BULK_SIZE', 100),
+            flush_interval=crawler.settings.getfloat('MONGO_BULK_FLUSH_INTERVAL', 5.0),
+        )
+
+    def open_spider(self, spider):
+        super().open_spider(spider)
+        # Time-based flush so a slow trickle of items never sits in memory for long
+        self.flush_loop = task.LoopingCall(self.flush, spider)
+        self.flush_loop.start(self.flush_interval, now=False)
+
+    def close_spider(self, spider):
+        if self.flush_loop and self.flush_loop.running:
+            self.flush_loop.stop()
+        return deferred_from_coro(self._close(spider))
+
+    async def _close(self, spider):
+        await self._flush(spider)
+        super().close_spider(spider)
+
+    async def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        document = self.prepare_document(item)
+        # Using the url as the unique identifier to avoid duplications
+        self.operations.append(
+            UpdateOne({'url': adapter['url']}, {'$set': document}, upsert=True)
+        )
+        self.items.append(item)
+        if len(self.operations) >= self.bulk_size:
+            await self._flush(spider)
+        return item
+
+    def flush(self, spider):
+        """
+        Writes the buffered upserts in a single unordered bulk_write,
+        records new/updated/failed counts in the crawl stats and sends
+        article_stored for every article that was written. Returns a
+        Deferred that fires once the batch is written.
+        """
+        return deferred_from_coro(self._flush(spider))
+
+    def bulk_write(self, operations):
+        """
+        Runs in a thread. Returns the bulk write result details, including
+        the per-operation errors of a partially applied batch.
+        """
+        try:
+            return self.db[self.collection_name].bulk_write(operations, ordered=False).bulk_api_result
+        except BulkWriteError as e:
+            # Unordered writes keep going past failures, so the rest of the batch was applied
+            return e.details
+
+    async def _flush(self, spider):
+        await maybe_deferred_to_future(self.flush_lock.acquire())
+        try:
+            await self._write_batch(spider)
+        finally:
+            self.flush_lock.release()
+
+    async def _write_batch(self, spider):
+        if not self.operations:
+            return
+        operations, items = self.operations, self.items
+        self.operations, self.items = [], []
+        urls = [ItemAdapter(item)['url'] for item in items]
+
+        self.stats.inc_value('mongo/bulk/batches')
+        start = time.perf_counter()
+        try:
+            details = await maybe_deferred_to_future(threads.deferToThread(self.bulk_write, operations))
+        except PyMongoError as e:
+            for url in urls:
+                self.fingerprints.discard(url)
+            self.stats.inc_value('mongo/articles/failed', len(operations))
+            self.stats.inc_value('mongo/bulk/failed_batches')
+            spider.logger.error(f"Bulk write of {len(operations)} articles failed: {e}")
+            return
+        self.record_write_latency(
+            (time.perf_counter() - start) / len(operations), spider, f"batch of {len(operations)} upserts"
+        )
+
+        errors = details.get('writeErrors', [])
+        self.stats.inc_value('mongo/articles/new', details.get('nUpserted', 0))
+        self.stats.inc_value('mongo/articles/updated', details.get('nModified', 0))
+        if errors:
+            self.stats.inc_value('mongo/articles/failed', len(errors))
+            self.stats.inc_value('mongo/bulk/failed_batches')
+            for error in errors:
+                self.fingerprints.discard(urls[error['index']])
+                spider.logger.error(f"Failed to save article {urls[error['index']]}: {error.get('errmsg')}")
+        failed = {error['index'] for error in errors}
+        self.send_stored([item for index, item in enumerate(items) if index not in failed], spider)
+
+        spider.logger.info(
+            f"Flushed {len(operations)} articles to MongoDB "
+            f"({details.get('nUpserted', 0)} new, {details.get('nModified', 0)} modified, {len(errors)} failed)."
+        )
+
+
+class AsyncMongoPipeline(MongoPipeline):
+    """
+    Writes articles with pymongo's asyncio client on the reactor's event loop
+    (settings install AsyncioSelectorReactor), so downloads and Playwright
+    pages keep running while an upsert is waiting on MongoDB.
+    At most MONGO_MAX_INFLIGHT_WRITES upserts run at once; further items wait
+    for a free slot, which lets Scrapy's scraper slot back off the downloader
+    when MongoDB slows down.
+    """
+
+    def __init__(self, *args, max_inflight=16, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_inflight = max_inflight
+        self.inflight = 0
+
+    @classmethod
+    def crawler_kwargs(cls, crawler):
+        return dict(
+            super().crawler_kwargs(crawler),
+            max_inflight=crawler.settings.getint('MONGO_MAX_INFLIGHT_WRITES', 16),
         )
-        spider.logger.info(f"Saved article to MongoDB: {item['headline']}")
-        return item
\ No newline at end of file
+
+    def open_spider(self, spider):
+        self.client = client_pool.acquire(AsyncMongoClient, self.mongo_uri)
+        self.db = self.client[self.mongo_db]
+        self.write_slots = asyncio.Semaphore(self.max_inflight)
+        spider.logger.info("Async MongoDb Connection Opened.")
+        return deferred_from_coro(self._open(spider))
+
+    async def _open(self, spider):
+        if self.manage_indexes:
+            self.log_indexes(await ensure_indexes_async(self.db[self.collection_name]), spider)
+        cursor = self.db[self.collection_name].find(*self.fingerprint_query())
+        cursor = cursor.sort('_id', pymongo.DESCENDING).limit(self.fingerprints.max_size)
+        async for doc in cursor:
+            self.fingerprints.set(doc['url'], doc['content_hash'])
+        spider.logger.info(f"Loaded {len(self.fingerprints)} article fingerprints.")
+
+    def close_spider(self, spider):
+        # Scrapy only closes the spider once every pending process_item has finished
+        return deferred_from_coro(self._close(spider))
+
+    async def _close(self, spider):
+        self.report_write_latency(spider)
+        self.report_index_usage(await index_usage_async(self.db[self.collection_name]), spider)
+        client = client_pool.release(AsyncMongoClient, self.mongo_uri)
+        if client is not None:
+            await client.close()
+        spider.logger.info("Async MongoDb Connection Closed.")
+
+    async def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        document = self.prepare_document(item)
+
+        if self.write_slots.locked():
+            self.stats.inc_value('mongo/async/backpressure_waits')
+
+        async with self.write_slots:
+            self.inflight += 1
+            self.stats.max_value('mongo/async/max_inflight', self.inflight)
+            start = time.perf_counter()
+            try:
+                # Using the url as the unique identifier to avoid duplications
+                result = await self.db[self.collection_name].update_one(
+                    {'url': adapter['url']},
+                    {'$set': document},
+                    upsert=True
+                )
+            except PyMongoError:
+                # Raised like MongoPipeline does, so later pipelines never see an unsaved article
+                self.fingerprints.discard(adapter['url'])
+                self.stats.inc_value('mongo/articles/failed')
+                raise
+            finally:
+                self.inflight -= 1
+
+        self.record_write_latency(time.perf_counter() - start, spider, adapter['url'])
+        self.record_result(result)
+        self.send_stored([item], spider)
+        spider.logger.info(f"Saved article to MongoDB: {adapter['headline']}")
+        return item
@@ -0,0 +1,126 @@
+# Project-wide blocking of non-essential Playwright sub-requests.
+#
+# scrapy-playwright calls PLAYWRIGHT_ABORT_REQUEST for every request made by
+# every page in every browser context, before navigation starts, so one
+# predicate covers all of a crawler's spiders. ResourceBlockerExtension
+# gives each crawler its own ResourceBlocker, configured from settings, so
+# crawlers sharing a process (crawl_all.py) report separate counters.
+
+from collections import Counter
+from urllib.parse import urlsplit
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+# Typical transfer size in bytes of one request of each resource type, used
+# to estimate the bytes a blocked request saved (an aborted request never
+# gets a response to measure). 'other' covers the types not listed.
+DEFAULT_SIZE_ESTIMATES = {
+    'image': 40_000,
+    'stylesheet': 20_000,
+    'font': 30_000,
+    'media': 300_000,
+    'script': 25_000,
+    'other': 5_000,
+}
+
+
+class ResourceBlocker:
+    """
+    Decides whether a Playwright request should be aborted, by resource type
+    or by host suffix, and counts blocked and allowed requests per host,
+    along with an estimate of the bytes each blocked host would have sent.
+
+    Resource types are a frozenset lookup; hosts are matched by probing each
+    of their dot-separated suffixes against a frozenset of blocked domains,
+    so the cost depends on the number of labels in the host, not on the
+    size of the blocklist.
+    """
+
+    def __init__(self, resource_types=(), domains=(), size_estimates=None):
+        self.blocked = Counter()
+        self.allowed = Counter()
+        self.blocked_types = Counter()
+        self.bytes_saved = Counter()
+        self.size_estimates = {**DEFAULT_SIZE_ESTIMATES, **(size_estimates or {})}
+        self.configure(resource_types, domains)
+
+    def configure(self, resource_types, domains):
+        self.resource_types = frozenset(resource_types)
+        self.domains = frozenset(domain.lower().lstrip('.') for domain in domains)
+
+    def match_domain(self, host):
+        """
+        Returns the blocklist entry matching `host` or one of its parent
+        domains, e.g. 'stats.g.doubleclick.net' -> 'doubleclick.net'.
+        """
+        while host:
+            if host in self.domains:
+                return host
+            _, _, host = host.partition('.')
+        return None
+
+    def __call__(self, request):
+        host = (urlsplit(request.url).hostname or '').lower()
+        if request.resource_type in self.resource_types:
+            self.blocked_types[request.resource_type] += 1
+        elif self.match_domain(host) is None:
+            self.allowed[host] += 1
+            return False
+        self.blocked[host] += 1
+        self.bytes_saved[host] += self.size_estimates.get(request.resource_type, self.size_estimates['other'])
+        return True
+
+
+def should_abort_request(request):
+    """
+    PLAYWRIGHT_ABORT_REQUEST hook. ResourceBlockerExtension replaces it in
+    each crawler's settings with that crawler's ResourceBlocker; on its own
+    it blocks nothing.
+    """
+    return False
+
+
+class ResourceBlockerExtension:
+    """
+    Creates the crawler's ResourceBlocker from PLAYWRIGHT_BLOCKED_RESOURCE_TYPES,
+    PLAYWRIGHT_BLOCKED_DOMAINS and PLAYWRIGHT_BLOCKED_SIZE_ESTIMATES, installs
+    it as PLAYWRIGHT_ABORT_REQUEST, and exports its counters to the crawl
+    stats when the spider closes.
+    """
+
+    def __init__(self, stats, blocker):
+        self.stats = stats
+        self.blocker = blocker
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if settings.get('PLAYWRIGHT_ABORT_REQUEST') != f'{__name__}.should_abort_request':
+            raise NotConfigured
+        blocker = ResourceBlocker(
+            settings.getlist('PLAYWRIGHT_BLOCKED_RESOURCE_TYPES'),
+            settings.getlist('PLAYWRIGHT_BLOCKED_DOMAINS'),
+            {resource_type: int(size) for resource_type, size in
+             settings.getdict('PLAYWRIGHT_BLOCKED_SIZE_ESTIMATES').items()},
+        )
+        # Extensions are built before the settings are frozen and before the
+        # download handler loads the hook (load_object passes callables through)
+        settings.set('PLAYWRIGHT_ABORT_REQUEST', blocker, priority=settings.getpriority('PLAYWRIGHT_ABORT_REQUEST'))
+        ext = cls(crawler.stats, blocker)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_closed(self, spider):
+        self.stats.set_value('resource_blocking/blocked', sum(self.blocker.blocked.values()))
+        self.stats.set_value('resource_blocking/allowed', sum(self.blocker.allowed.values()))
+        for resource_type, count in self.blocker.blocked_types.items():
+            self.stats.set_value(f'resource_blocking/blocked_type/{resource_type}', count)
+        for host, count in self.blocker.blocked.items():
+            self.stats.set_value(f'resource_blocking/blocked_host/{host}', count)
+        for host, count in self.blocker.allowed.items():
+            self.stats.set_value(f'resource_blocking/allowed_host/{host}', count)
+        # Estimates, from PLAYWRIGHT_BLOCKED_SIZE_ESTIMATES
+        self.stats.set_value('resource_blocking/bytes_saved', sum(self.blocker.bytes_saved.values()))
+        for host, size in self.blocker.bytes_saved.items():
+            self.stats.set_value(f'resource_blocking/bytes_saved/{host}', size)
@@ -0,0 +1,128 @@
+# On-disk index of article urls that have already been scraped and stored.
+#
+# Urls are kept as 64-bit hashes in a WITHOUT ROWID SQLite table, so the
+# index stays at roughly 16 bytes per article and lookups are a single
+# primary-key probe. The same database also holds each spider's high-water
+# mark for incremental crawls.
+
+import hashlib
+import sqlite3
+import time
+
+
+def url_key(url):
+    """
+    Returns a signed 64-bit integer key for a url, suitable for an SQLite
+    INTEGER PRIMARY KEY.
+    """
+    digest = hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+class SeenUrlIndex:
+    """
+    Persistent set of seen article urls with the time each one was last stored.
+    Writes are committed every `commit_every` additions and on close.
+
+    Use SeenUrlIndex.open() so every middleware and crawler in the process
+    shares one connection per file; separate connections would contend for
+    SQLite's write lock while a batch is uncommitted.
+    """
+
+    _open = {}
+
+    @classmethod
+    def open(cls, path):
+        index = cls._open.get(path)
+        if index is None:
+            index = cls._open[path] = cls(path)
+        index.refs += 1
+        return index
+
+    def __init__(self, path, commit_every=100):
+        self.path = path
+        self.commit_every = commit_every
+        self.pending = 0
+        self.refs = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen_urls ("
+            "url_key INTEGER PRIMARY KEY, seen_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS crawl_state ("
+            "spider TEXT PRIMARY KEY, newest_date TEXT, newest_url TEXT, updated_at REAL NOT NULL"
+            ")"
+        )
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM seen_urls").fetchone()[0]
+
+    def __contains__(self, url):
+        return self.seen_at(url) is not None
+
+    def seen_at(self, url):
+        """
+        Returns the unix time the url was last stored, or None if it is unknown.
+        """
+        row = self.conn.execute(
+            "SELECT seen_at FROM seen_urls WHERE url_key = ?", (url_key(url),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def add(self, url, seen_at=None):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO seen_urls (url_key, seen_at) VALUES (?, ?)",
+            (url_key(url), seen_at or time.time()),
+        )
+        self._maybe_commit(1)
+
+    def add_many(self, urls, seen_at=None, replace=False):
+        """
+        Bulk-inserts urls. Existing entries keep their timestamp unless
+        `replace` is set, so seeding never resets a recrawl TTL.
+        """
+        seen_at = seen_at or time.time()
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        cursor = self.conn.executemany(
+            f"{verb} INTO seen_urls (url_key, seen_at) VALUES (?, ?)",
+            ((url_key(url), seen_at) for url in urls),
+        )
+        self.conn.commit()
+        self.pending = 0
+        return cursor.rowcount
+
+    def high_water_mark(self, spider_name):
+        """
+        Returns (newest_date, newest_url) stored by the spider's last run,
+        or (None, None) if it has never completed one.
+        """
+        row = self.conn.execute(
+            "SELECT newest_date, newest_url FROM crawl_state WHERE spider = ?", (spider_name,)
+        ).fetchone()
+        return row if row else (None, None)
+
+    def set_high_water_mark(self, spider_name, newest_date, newest_url):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO crawl_state (spider, newest_date, newest_url, updated_at) "
+            "VALUES (?, ?, ?, ?)",
+            (spider_name, newest_date, newest_url, time.time()),
+        )
+        self.conn.commit()
+
+    def _maybe_commit(self, count):
+        self.pending += count
+        if self.pending >= self.commit_every:
+            self.conn.commit()
+            self.pending = 0
+
+    def close(self):
+        self.conn.commit()
+        self.refs -= 1
+        if self.refs <= 0:
+            self._open.pop(self.path, None)
+            self.conn.close()
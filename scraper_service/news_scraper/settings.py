@@ -20,13 +20,37 @@ NEWSPIDER_MODULE = "news_scraper.spiders"
 ADDONS = {}
 
 # --- Playwright Settings ---
+# Pooled subclass of scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler
 DOWNLOAD_HANDLERS = {
-    "http": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
-    "https": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
+    "http": "news_scraper.handlers.PooledPlaywrightDownloadHandler",
+    "https": "news_scraper.handlers.PooledPlaywrightDownloadHandler",
 }
 
+# One browser context per allowed domain, each keeping up to
+# PLAYWRIGHT_POOL_PAGES_PER_CONTEXT idle pages for reuse. Pages are retired
+# after PLAYWRIGHT_POOL_PAGE_MAX_USES navigations to bound memory growth.
+PLAYWRIGHT_POOL_PAGES_PER_CONTEXT = 4
+PLAYWRIGHT_POOL_PAGE_MAX_USES = 50
+PLAYWRIGHT_MAX_PAGES_PER_CONTEXT = 8
+PLAYWRIGHT_MAX_CONTEXTS = 4
+
 TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 
+# Abort non-essential sub-requests in every Playwright page and context.
+# Resource types and host suffixes (a domain also blocks its subdomains)
+# are loaded into a per-crawler blocker by ResourceBlockerExtension.
+PLAYWRIGHT_ABORT_REQUEST = "news_scraper.resource_blocking.should_abort_request"
+PLAYWRIGHT_BLOCKED_RESOURCE_TYPES = ["image", "stylesheet", "font", "media"]
+PLAYWRIGHT_BLOCKED_DOMAINS = [
+    "google-analytics.com", "googletagmanager.com", "scorecardresearch.com",
+    "chartbeat.com", "cxense.com", "adservice.google.com", "doubleclick.net",
+    "facebook.net", "twitter.com", "googlesyndication.com", "vdo.ai",
+]
+# Bytes assumed per blocked request of a resource type, for the
+# resource_blocking/bytes_saved stats; overrides the defaults in
+# news_scraper.resource_blocking.DEFAULT_SIZE_ESTIMATES
+PLAYWRIGHT_BLOCKED_SIZE_ESTIMATES = {}
+
 
 # Crawl responsibly by identifying yourself (and your website) on the user-agent
 #USER_AGENT = "news_scraper (+http://www.yourdomain.com)"
@@ -35,10 +59,50 @@ TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 ROBOTSTXT_OBEY = True
 
 # Concurrency and throttling settings
-#CONCURRENT_REQUESTS = 16
+# These defaults only apply to hosts without a SOURCE_CONCURRENCY_PROFILES entry
+CONCURRENT_REQUESTS = 32
 CONCURRENT_REQUESTS_PER_DOMAIN = 1
 DOWNLOAD_DELAY = 1
 
+# --- Per-source Concurrency Profiles ---
+# Each source gets separate download slots for plain-HTTP and Playwright
+# requests ('<domain>/http', '<domain>/playwright'). AdaptiveConcurrencyMiddleware
+# starts each slot at `concurrency`, raises it towards `max_concurrency` while
+# p90 latency stays under `target_latency` seconds, and halves it on 429/5xx
+# responses or timeouts.
+ADAPTIVE_CONCURRENCY_ENABLED = True
+ADAPTIVE_CONCURRENCY_WINDOW = 20
+
+DEFAULT_CONCURRENCY_PROFILE = {
+    "http": {"concurrency": 1, "max_concurrency": 4, "delay": 1.0, "target_latency": 2.0},
+    "playwright": {"concurrency": 1, "max_concurrency": 2, "delay": 1.0, "target_latency": 10.0},
+}
+SOURCE_CONCURRENCY_PROFILES = {
+    "thehindu.com": {
+        "http": {"concurrency": 2, "max_concurrency": 8, "delay": 0.25, "target_latency": 1.5},
+        "playwright": {"concurrency": 1, "max_concurrency": 2, "delay": 1.0, "target_latency": 10.0},
+    },
+    "ndtv.com": {
+        "http": {"concurrency": 2, "max_concurrency": 6, "delay": 0.5, "target_latency": 2.0},
+        "playwright": {"concurrency": 1, "max_concurrency": 2, "delay": 1.0, "target_latency": 10.0},
+    },
+    "indianexpress.com": {
+        "http": {"concurrency": 2, "max_concurrency": 8, "delay": 0.25, "target_latency": 1.5},
+        "playwright": {"concurrency": 1, "max_concurrency": 1, "delay": 1.0, "target_latency": 10.0},
+    },
+    "timesofindia.indiatimes.com": {
+        "http": {"concurrency": 2, "max_concurrency": 6, "delay": 0.5, "target_latency": 2.0},
+        "playwright": {"concurrency": 1, "max_concurrency": 2, "delay": 1.0, "target_latency": 15.0},
+    },
+}
+
+# Starting limits for the slots above; the middleware adjusts them at runtime
+DOWNLOAD_SLOTS = {
+    f"{domain}/{mode}": {"concurrency": profile["concurrency"], "delay": profile["delay"]}
+    for domain, modes in SOURCE_CONCURRENCY_PROFILES.items()
+    for mode, profile in modes.items()
+}
+
 # Disable cookies (enabled by default)
 #COOKIES_ENABLED = False
 
@@ -56,27 +120,68 @@ DOWNLOAD_DELAY = 1
 #SPIDER_MIDDLEWARES = {
 #    "news_scraper.middlewares.NewsScraperSpiderMiddleware": 543,
 #}
+SPIDER_MIDDLEWARES = {
+    "news_scraper.middlewares.IncrementalCrawlMiddleware": 100,
+}
+
+# Stop following "Next" links once a listing page only contains articles
+# already in the seen-url index. Enable for scheduled runs, e.g.
+#     scrapy crawl the_hindu -s INCREMENTAL_CRAWL=True
+INCREMENTAL_CRAWL = False
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 #DOWNLOADER_MIDDLEWARES = {
 #    "news_scraper.middlewares.NewsScraperDownloaderMiddleware": 543,
 #}
+DOWNLOADER_MIDDLEWARES = {
+    "news_scraper.middlewares.SeenUrlMiddleware": 50,
+    # Runs after RedirectMiddleware (600) so the policy checks the final page
+    "news_scraper.middlewares.RenderFallbackMiddleware": 540,
+    "news_scraper.middlewares.AdaptiveConcurrencyMiddleware": 560,
+}
+
+# Fetch article pages over plain HTTP first and only render them with
+# Playwright when a spider's render_policy selectors are missing
+RENDER_FALLBACK_ENABLED = True
+
+# --- Seen-URL Index Settings ---
+# Skip article requests whose url was already scraped in an earlier run.
+# The index lives in the project data dir (.scrapy/) unless an absolute path is given.
+SEEN_URLS_ENABLED = True
+SEEN_URLS_PATH = "seen_urls.sqlite"
+# Seed the index from the news_articles collection when the spider opens
+SEEN_URLS_SEED_FROM_MONGO = False
+# Url substring -> seconds after which an already-seen url is fetched again
+SEEN_URLS_RECRAWL_AFTER = {
+    "/liveblog/": 15 * 60,
+}
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
 #EXTENSIONS = {
 #    "scrapy.extensions.telnet.TelnetConsole": None,
 #}
+EXTENSIONS = {
+    "news_scraper.resource_blocking.ResourceBlockerExtension": 500,
+    # Sends articles to the API once a Mongo pipeline has stored them
+    "news_scraper.handoff.ApiHandoffExtension": 500,
+}
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
 # --- MongoDB Pipeline Settings ---
 ITEM_PIPELINES = {
-   "news_scraper.pipelines.MongoPipeline": 300,
+   "news_scraper.pipelines.NormalizationPipeline": 100,
+   # Swap for "news_scraper.pipelines.MongoPipeline" to write one article at a time,
+   # or "news_scraper.pipelines.AsyncMongoPipeline" for non-blocking writes on the reactor loop
+   "news_scraper.pipelines.BulkMongoPipeline": 300,
 }
 
+# Timezone for publication dates published without an offset (all sources are Indian)
+NORMALIZE_NAIVE_TIMEZONE = "Asia/Kolkata"
+
 MONGO_USER = os.getenv('MONGO_USER')
 MONGO_PASS = os.getenv('MONGO_PASS')
 MONGO_HOST = os.getenv('MONGO_HOST')
@@ -85,9 +190,45 @@ MONGO_DB_NAME = os.getenv('MONGO_DB_NAME')
 MONGO_URI = f"mongodb://{MONGO_USER}:{MONGO_PASS}@{MONGO_HOST}/{MONGO_DB_NAME}?authSource=admin"
 MONGO_DB = MONGO_DB_NAME
 
+# Flush buffered upserts once this many are queued, or after this many seconds
+MONGO_BULK_SIZE = 100
+MONGO_BULK_FLUSH_INTERVAL = 5.0
+
+# Upper bound on concurrent upserts issued by AsyncMongoPipeline
+MONGO_MAX_INFLIGHT_WRITES = 16
+
+# Number of url -> content fingerprint entries kept in memory; unchanged
+# articles found in this cache are dropped without touching MongoDB
+MONGO_FINGERPRINT_CACHE_SIZE = 50000
+
+# Create the indexes declared in news_scraper/mongo_indexes.py when a Mongo
+# pipeline opens (url lookups are a collection scan without them)
+MONGO_ENSURE_INDEXES = True
+# Upserts slower than this are logged and counted in mongo/writes/slow
+MONGO_SLOW_WRITE_MS = 250
+
+# --- API handoff (news_scraper/handoff.py) ---
+API_HANDOFF_ENABLED = True
+API_HANDOFF_URL = os.getenv('API_HANDOFF_URL', 'http://127.0.0.1:8000')
+# Outbox directory under .scrapy/; one SQLite file per spider
+API_HANDOFF_SPOOL_DIR = "api_handoff"
+# Articles per POST /process-articles:bulk, and the longest an article waits before a partial batch is sent
+API_HANDOFF_BATCH_SIZE = 200
+API_HANDOFF_FLUSH_INTERVAL = 5.0
+# Retry backoff cap, and how long a closing spider keeps sending before leaving the rest for the next crawl
+API_HANDOFF_MAX_BACKOFF = 60.0
+API_HANDOFF_CLOSE_TIMEOUT = 30.0
+# Times an article is re-sent after the API job processing it failed or was lost
+API_HANDOFF_MAX_ATTEMPTS = 3
+
+# Log unchanged-article drops at DEBUG instead of WARNING
+LOG_FORMATTER = "news_scraper.logformatter.NewsLogFormatter"
+
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
-AUTOTHROTTLE_ENABLED = True
+# Disabled while AdaptiveConcurrencyMiddleware manages the per-source slots,
+# since AutoThrottle would stretch slot delays and cancel out raised concurrency
+AUTOTHROTTLE_ENABLED = not ADAPTIVE_CONCURRENCY_ENABLED
 # The initial download delay
 AUTOTHROTTLE_START_DELAY = 5
 # The maximum download delay to be set in case of high latencies
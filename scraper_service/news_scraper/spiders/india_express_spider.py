@@ -1,7 +1,8 @@
 import scrapy
+from scrapy.exceptions import IgnoreRequest
 from scrapy_playwright.page import PageMethod
 from news_scraper.items import NewsArticleItem
-import json
+from news_scraper.structured_data import extract_article_metadata
 
 class IndianExpressSpider(scrapy.Spider):
     """
@@ -22,21 +23,19 @@ class IndianExpressSpider(scrapy.Spider):
                 url,
                 meta=dict(
                     playwright=True,
-                    playwright_include_page=True,
                     playwright_page_methods=[
                         # Wait for the page structure to be ready
                         PageMethod("wait_for_load_state", "domcontentloaded"),
                     ],
-                    errback=self.errback,
                 ),
-                callback=self.parse
+                callback=self.parse,
+                errback=self.errback,
             )
 
     async def parse(self, response):
         """
         Parses the homepage to find all unique article links.
         """
-        page = response.meta.get("playwright_page")
         self.logger.info(f"Parsing list page: {response.url}")
 
         # A set automatically handles duplicate links
@@ -68,12 +67,8 @@ class IndianExpressSpider(scrapy.Spider):
                 yield scrapy.Request(
                     link,
                     callback=self.parse_article,
-                    meta=dict(errback=self.errback)
+                    errback=self.errback,
                 )
-        
-        # Close the Playwright page after we are done with it
-        if page:
-            await page.close()
 
     async def parse_article(self, response):
         """
@@ -81,56 +76,37 @@ class IndianExpressSpider(scrapy.Spider):
         """
         self.logger.info(f"Scraping article: {response.url}")
 
-        article = NewsArticleItem()
-        article['url'] = response.url
-        article['source_site'] = 'The Indian Express'
+        article = NewsArticleItem(url=response.url, source_site='The Indian Express')
 
-        # --- Publication Date & Author (from JSON-LD is most reliable) ---
-        publication_date = 'N/A'
-        author = 'N/A'
-        
-        try:
-            # Find the structured data script
-            json_ld_script = response.css('script[type="application/ld+json"]::text').get()
-            if json_ld_script:
-                data = json.loads(json_ld_script)
-                # Data can be a single object or a list within a '@graph' key
-                data_list = data.get('@graph', [data])
-                
-                for item in data_list:
-                    if item.get("@type") == "NewsArticle":
-                        publication_date = item.get('datePublished', 'N/A')
-                        author_data = item.get('author')
-                        if isinstance(author_data, list) and author_data:
-                            author = author_data[0].get('name', 'N/A')
-                        elif isinstance(author_data, dict):
-                            author = author_data.get('name', 'N/A')
-                        break # Exit loop once we find the main article data
-        except (json.JSONDecodeError, TypeError) as e:
-            self.logger.warning(f"Could not parse JSON-LD for {response.url}: {e}")
-
-        # --- Headline ---
-        headline = response.css('h1.native_story_title::text').get()
+        # --- Headline, Date & Author (JSON-LD is most reliable, CSS as fallback) ---
+        metadata = extract_article_metadata(response)
+        headline = metadata.headline if metadata else None
+        if not headline:
+            headline = response.css('h1.native_story_title::text').get()
         # Fallback to meta tag if the h1 is not found
         if not headline:
             headline = response.css('meta[property="og:title"]::attr(content)').get()
-        
-        article['headline'] = headline.strip() if headline else 'N/A'
-        article['publication_date'] = publication_date
-        article['author'] = author.strip() if author else 'N/A'
-        
+
+        author = ', '.join(metadata.authors) if metadata else None
+
+        article.headline = headline.strip() if headline else 'N/A'
+        article.publication_date = (metadata.date_published if metadata else None) or 'N/A'
+        article.author = author or 'N/A'
+        article.section = metadata.section if metadata else None
+        article.keywords = metadata.keywords if metadata else []
+
         # --- Body Text ---
         body_parts = response.css('div.story_details p::text').getall()
         full_text = ' '.join(part.strip() for part in body_parts if part.strip())
-        article['body_text'] = full_text if full_text else 'N/A'
+        article.body_text = full_text if full_text else 'N/A'
 
         yield article
 
-    async def errback(self, failure):
+    def errback(self, failure):
         """
         Handles errors that occur during requests.
         """
-        page = failure.request.meta.get("playwright_page")
-        if page:
-            await page.close()
+        # Pages are released by the pooled download handler, nothing to close here
+        if failure.check(IgnoreRequest):
+            return
         self.logger.error(f"Request failed for {failure.request.url}: {failure.value}")
\ No newline at end of file
@@ -1,24 +1,8 @@
 import scrapy
+from scrapy.exceptions import IgnoreRequest
 from news_scraper.items import NewsArticleItem
+from news_scraper.structured_data import extract_article_metadata
 from scrapy_playwright.page import PageMethod
-import re
-
-def should_abort_request(request):
-    """
-    Helper function to decide if a request should be aborted.
-    Blocks images, stylesheets, fonts, and tracking scripts.
-    """
-    if request.resource_type in ("image", "stylesheet", "font"):
-        return True
-    # Block requests to common tracking/ad domains
-    tracking_domains = [
-        "google-analytics.com", "googletagmanager.com", "scorecardresearch.com",
-        "chartbeat.com", "cxense.com", "adservice.google.com", "doubleclick.net"
-    ]
-    for domain in tracking_domains:
-        if domain in request.url:
-            return True
-    return False
 
 
 class TheHinduSpider(scrapy.Spider):
@@ -39,13 +23,11 @@ class TheHinduSpider(scrapy.Spider):
             callback=self.parse,
             meta=dict(
                 playwright=True,
-                playwright_include_page=True,
                 playwright_page_methods=[
-                    PageMethod("route", re.compile(r".*"), lambda route: route.abort() if should_abort_request(route.request) else route.continue_()),
                     PageMethod('wait_for_selector', 'ul.timeline-with-img')
                 ],
-                errback=self.errback,
-            )
+            ),
+            errback=self.errback,
         )
 
     async def parse(self, response):
@@ -53,8 +35,6 @@ class TheHinduSpider(scrapy.Spider):
         This method finds article links on the current page, yields requests
         for them, and then finds the 'Next' page link to continue crawling.
         """
-        page = response.meta.get("playwright_page")
-        
         self.logger.info(f"Parsing list page: {response.url}")
 
         article_links = response.css('ul.timeline-with-img h3.title > a::attr(href)').getall()
@@ -65,34 +45,28 @@ class TheHinduSpider(scrapy.Spider):
              self.logger.info(f"Found {len(article_links)} article links to scrape.")
 
         for link in article_links:
-            yield response.follow(link, callback=self.parse_article)
+            yield response.follow(link, callback=self.parse_article, errback=self.errback)
 
         # --- PAGINATION LOGIC ---
         # Find the 'Next' button's link
         next_page_url = response.css('a.page-link.next::attr(href)').get()
         if next_page_url:
             self.logger.info(f"Found next page: {next_page_url}")
-            # Close the current page *before* making the next request to save resources
-            if page:
-                await page.close()
             # Follow the link to the next page, and call this same 'parse' method on it
             yield response.follow(
                 next_page_url, 
                 callback=self.parse,
                 meta=dict(
+                    pagination=True,
                     playwright=True,
-                    playwright_include_page=True,
                     playwright_page_methods=[
-                        PageMethod("route", re.compile(r".*"), lambda route: route.abort() if should_abort_request(route.request) else route.continue_()),
                         PageMethod('wait_for_selector', 'ul.timeline-with-img')
                     ],
-                    errback=self.errback,
-                )
+                ),
+                errback=self.errback,
             )
         else:
             self.logger.info("No more pages to scrape. Finishing.")
-            if page:
-                await page.close()
 
     def parse_article(self, response):
         """
@@ -100,22 +74,26 @@ class TheHinduSpider(scrapy.Spider):
         """
         self.logger.info(f"Scraping article: {response.url}")
 
-        article = NewsArticleItem()
-        article['url'] = response.url
-        article['headline'] = response.css('h1.title::text').get('').strip()
-        article['author'] = response.css('div.author-details a.person-name::text').get('').strip()
-        article['publication_date'] = response.css('meta[property="article:published_time"]::attr(content)').get('').strip()
+        # JSON-LD first; the CSS selectors only run for fields it does not provide
+        metadata = extract_article_metadata(response)
+
+        article = NewsArticleItem(url=response.url, source_site='The Hindu')
+        article.headline = (metadata and metadata.headline) or response.css('h1.title::text').get('').strip()
+        article.author = (metadata and ', '.join(metadata.authors)) or response.css('div.author-details a.person-name::text').get('').strip()
+        article.publication_date = (metadata and metadata.date_published) or response.css('meta[property="article:published_time"]::attr(content)').get('').strip()
+        article.section = (metadata and metadata.section) or response.css('meta[property="article:section"]::attr(content)').get()
+        article.keywords = metadata.keywords if metadata else []
         
         body_paragraphs = response.css('div[id*="content-body-"] p::text').getall()
-        article['body_text'] = " ".join(p.strip() for p in body_paragraphs).strip()
-        article['source_site'] = 'The Hindu'
+        article.body_text = " ".join(p.strip() for p in body_paragraphs).strip()
 
         yield article
 
-    async def errback(self, failure):
+    def errback(self, failure):
         """
-        Handles errors in the Playwright request.
+        Handles errors in the Playwright request. Pages are released by the
+        pooled download handler, so there is nothing to close here.
         """
-        page = failure.request.meta["playwright_page"]
-        await page.close()
-        self.logger.error(f"Playwright request failed: {failure.value}")
\ No newline at end of file
+        if failure.check(IgnoreRequest):
+            return
+        self.logger.error(f"Request failed for {failure.request.url}: {failure.value}")
\ No newline at end of file
@@ -1,8 +1,8 @@
 import scrapy
+from scrapy.exceptions import IgnoreRequest
 from news_scraper.items import NewsArticleItem
+from news_scraper.structured_data import extract_article_metadata
 from scrapy_playwright.page import PageMethod
-import re
-import json
 
 class TheTimesOfIndiaSpider(scrapy.Spider):
     """
@@ -13,6 +13,15 @@ class TheTimesOfIndiaSpider(scrapy.Spider):
     allowed_domains = ['timesofindia.indiatimes.com']
     start_urls = ['https://timesofindia.indiatimes.com/']
 
+    # Article HTML is usually server-rendered, so it is fetched over plain HTTP
+    # and only rendered with Playwright when the body or its metadata is missing
+    render_policy = {
+        'required_css': [
+            'div[data-articlebody="1"]',
+            'script[type="application/ld+json"], div.byline',
+        ],
+    }
+
     def start_requests(self):
         """
         Initiates requests with Playwright to handle JavaScript rendering and scrolling.
@@ -22,7 +31,6 @@ class TheTimesOfIndiaSpider(scrapy.Spider):
                 url,
                 meta=dict(
                     playwright=True,
-                    playwright_include_page=True,
                     playwright_page_methods=[
                         # Wait for the page to be mostly loaded
                         PageMethod("wait_for_load_state", "domcontentloaded"),
@@ -34,16 +42,15 @@ class TheTimesOfIndiaSpider(scrapy.Spider):
                         PageMethod("evaluate", "window.scrollTo(0, document.body.scrollHeight)"),
                         PageMethod("wait_for_timeout", 3000),
                     ],
-                    errback=self.errback,
                 ),
-                callback=self.parse
+                callback=self.parse,
+                errback=self.errback,
             )
 
     async def parse(self, response):
         """
         Parses the main page to find all unique article links after scrolling.
         """
-        page = response.meta.get("playwright_page")
         self.logger.info(f"Parsing list page: {response.url}")
 
         # Use a set to automatically handle duplicate links
@@ -70,67 +77,40 @@ class TheTimesOfIndiaSpider(scrapy.Spider):
         for link in unique_links:
             # We are interested in article pages, which typically contain '/articleshow/' or '/liveblog/'
             if '/articleshow/' in link or '/liveblog/' in link:
+                # Plain HTTP first; RenderFallbackMiddleware switches to Playwright if needed
                 yield scrapy.Request(
                     link,
                     callback=self.parse_article,
-                    meta=dict(
-                        playwright=True,
-                        playwright_include_page=True,
-                        errback=self.errback,
-                    )
+                    meta=dict(render_fallback=True),
+                    errback=self.errback,
                 )
 
-        if page:
-            await page.close()
-
     async def parse_article(self, response):
         """
         Scrapes data from an individual article page.
         """
-        page = response.meta.get("playwright_page")
         self.logger.info(f"Scraping article: {response.url}")
 
-        article = NewsArticleItem()
-        article['url'] = response.url
-        article['source_site'] = 'The Times of India'
+        article = NewsArticleItem(url=response.url, source_site='The Times of India')
 
-        # --- Headline ---
-        headline = response.css('h1.HNMDR::text').get()
+        # --- Headline, Date & Author (JSON-LD is most reliable, CSS as fallback) ---
+        metadata = extract_article_metadata(response)
+        headline = metadata.headline if metadata else None
+        if not headline:
+            headline = response.css('h1.HNMDR::text').get()
         if not headline:
             headline = response.css('meta[property="og:title"]::attr(content)').get()
-        article['headline'] = headline.strip() if headline else 'N/A'
+        article.headline = headline.strip() if headline else 'N/A'
 
-        # --- Publication Date & Author (from JSON-LD is most reliable) ---
-        publication_date = 'N/A'
-        author = 'N/A'
-        json_ld_scripts = response.css('script[type="application/ld+json"]::text').getall()
-        for script in json_ld_scripts:
-            try:
-                data = json.loads(script)
-                data_list = data if isinstance(data, list) else [data]
-                for item in data_list:
-                    if item.get('@type') == 'NewsArticle':
-                        if item.get('datePublished') and publication_date == 'N/A':
-                            publication_date = item['datePublished']
-                        if item.get('author') and author == 'N/A':
-                            author_data = item['author']
-                            if isinstance(author_data, list) and author_data:
-                                author = author_data[0].get('name', 'N/A')
-                            elif isinstance(author_data, dict):
-                                author = author_data.get('name', 'N/A')
-                        if publication_date != 'N/A' and author != 'N/A':
-                            break
-                if publication_date != 'N/A' and author != 'N/A':
-                    break
-            except (json.JSONDecodeError, TypeError):
-                continue
-        
+        author = ', '.join(metadata.authors) if metadata else None
         # Fallback for author if not in JSON-LD
-        if author == 'N/A':
+        if not author:
             author = response.css('div.byline a::text').get()
 
-        article['publication_date'] = publication_date
-        article['author'] = author.strip() if author else 'N/A'
+        article.publication_date = (metadata.date_published if metadata else None) or 'N/A'
+        article.author = author.strip() if author else 'N/A'
+        article.section = metadata.section if metadata else None
+        article.keywords = metadata.keywords if metadata else []
         
         # --- Body Text ---
         body_text_parts = response.css('div[data-articlebody="1"] ::text').getall()
@@ -140,18 +120,15 @@ class TheTimesOfIndiaSpider(scrapy.Spider):
         if 'Disclaimer: This article is produced on behalf of' in full_text:
             full_text = full_text.split('Disclaimer: This article is produced on behalf of')[0]
         
-        article['body_text'] = full_text.strip() if full_text else 'N/A'
-
-        if page:
-            await page.close()
+        article.body_text = full_text.strip() if full_text else 'N/A'
 
         yield article
 
-    async def errback(self, failure):
+    def errback(self, failure):
         """
         Handles errors that occur during the requests.
         """
-        page = failure.request.meta.get("playwright_page")
-        if page:
-            await page.close()
+        # Pages are released by the pooled download handler, nothing to close here
+        if failure.check(IgnoreRequest):
+            return
         self.logger.error(f"Request failed for {failure.request.url}: {failure.value}")
\ No newline at end of file
@@ -0,0 +1,142 @@
+# Shared JSON-LD (schema.org) extraction for the news spiders.
+#
+# Every <script type="application/ld+json"> block of a response is parsed
+# once and cached per response. Blocks may be single objects, lists, or
+# objects/lists carrying a '@graph', in any nesting; all of them are walked
+# to find the article node.
+
+from dataclasses import dataclass, field
+from weakref import WeakKeyDictionary
+
+try:
+    import orjson
+
+    def loads(text):
+        return orjson.loads(text)
+except ImportError:  # pragma: no cover - orjson is an optional speed-up
+    import json
+
+    def loads(text):
+        return json.loads(text)
+
+
+# Most specific first: a NewsArticle node wins over a generic Article node
+ARTICLE_TYPES = (
+    ('NewsArticle', 'ReportageNewsArticle', 'AnalysisNewsArticle', 'OpinionNewsArticle'),
+    ('LiveBlogPosting',),
+    ('Article', 'BlogPosting', 'Report'),
+)
+
+_json_ld_cache = WeakKeyDictionary()
+_metadata_cache = WeakKeyDictionary()
+
+
+@dataclass
+class ArticleMetadata:
+    """
+    Normalized article fields taken from a page's JSON-LD. Dates are the
+    ISO-8601 strings as published; missing values are None or empty lists.
+    """
+    type: str
+    headline: str = None
+    date_published: str = None
+    date_modified: str = None
+    authors: list = field(default_factory=list)
+    section: str = None
+    keywords: list = field(default_factory=list)
+
+
+def json_ld_blocks(response):
+    """
+    Returns the parsed JSON-LD blocks of a response, skipping invalid ones.
+    """
+    blocks = _json_ld_cache.get(response)
+    if blocks is None:
+        blocks = []
+        for script in response.css('script[type="application/ld+json"]::text').getall():
+            try:
+                blocks.append(loads(script))
+            except ValueError:
+                continue
+        _json_ld_cache[response] = blocks
+    return blocks
+
+
+def iter_nodes(data):
+    """
+    Yields every JSON-LD object in `data`, descending into lists and '@graph'.
+    """
+    if isinstance(data, list):
+        for entry in data:
+            yield from iter_nodes(entry)
+    elif isinstance(data, dict):
+        yield data
+        if '@graph' in data:
+            yield from iter_nodes(data['@graph'])
+
+
+def node_types(node):
+    types = node.get('@type')
+    if isinstance(types, list):
+        return set(types)
+    return {types} if types else set()
+
+
+def _text(value):
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value = value.get('name') or value.get('@value')
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _names(value):
+    """
+    Flattens a schema.org author value (string, Person, or a list of either)
+    into a list of unique names.
+    """
+    if value is None:
+        return []
+    names = []
+    for entry in value if isinstance(value, list) else [value]:
+        name = _text(entry)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def _keywords(value):
+    if isinstance(value, str):
+        value = value.split(',')
+    return [keyword.strip() for keyword in value or [] if isinstance(keyword, str) and keyword.strip()]
+
+
+def extract_article_metadata(response):
+    """
+    Returns ArticleMetadata for the most specific article node in the
+    response's JSON-LD, or None if the page has none. Cached per response.
+    """
+    if response in _metadata_cache:
+        return _metadata_cache[response]
+
+    nodes = [node for block in json_ld_blocks(response) for node in iter_nodes(block)]
+    metadata = None
+    for type_group in ARTICLE_TYPES:
+        node = next((node for node in nodes if node_types(node) & set(type_group)), None)
+        if node is not None:
+            metadata = ArticleMetadata(
+                type=next(iter(node_types(node) & set(type_group))),
+                headline=_text(node.get('headline') or node.get('name')),
+                date_published=_text(node.get('datePublished')),
+                date_modified=_text(node.get('dateModified')),
+                authors=_names(node.get('author')),
+                section=_text(node.get('articleSection')),
+                keywords=_keywords(node.get('keywords')),
+            )
+            break
+
+    _metadata_cache[response] = metadata
+    return metadata
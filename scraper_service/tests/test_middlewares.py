@@ -0,0 +1,122 @@
+import asyncio
+import time
+
+import pytest
+from scrapy import Request, Spider
+from scrapy.exceptions import DropItem, IgnoreRequest
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+
+from news_scraper.items import NewsArticleItem
+from news_scraper.middlewares import IncrementalCrawlMiddleware, SeenUrlMiddleware
+from news_scraper.pipelines import UnchangedItem
+from news_scraper.seen_urls import SeenUrlIndex
+
+
+@pytest.fixture
+def spider():
+    return Spider(name='example')
+
+
+@pytest.fixture
+def stats():
+    return get_crawler().stats
+
+
+@pytest.fixture
+def seen(tmp_path, spider, stats):
+    middleware = SeenUrlMiddleware(str(tmp_path / 'seen.sqlite'), {'/liveblog/': 60}, stats)
+    middleware.spider_opened(spider)
+    yield middleware
+    middleware.spider_closed(spider)
+
+
+def article(url, published=None):
+    return NewsArticleItem(url=url, source_site='example', publication_date=published)
+
+
+def test_skips_stored_articles_only(seen, spider, stats):
+    request = Request('https://example.com/a')
+    assert seen.process_request(request, spider) is None
+    seen.article_stored(article('https://example.com/a'), spider)
+    with pytest.raises(IgnoreRequest):
+        seen.process_request(request, spider)
+    assert stats.get_value('seen_urls/skipped') == 1
+
+    # Dropped for another reason: not stored, so fetched again next time
+    seen.item_dropped(article('https://example.com/b'), None, DropItem('bad'), spider)
+    assert seen.process_request(Request('https://example.com/b'), spider) is None
+    # Unchanged articles are already stored
+    seen.item_dropped(article('https://example.com/c'), None, UnchangedItem('same'), spider)
+    with pytest.raises(IgnoreRequest):
+        seen.process_request(Request('https://example.com/c'), spider)
+
+
+def test_redirected_articles_record_the_requested_url(seen, spider):
+    request = Request('https://example.com/short')
+    response = HtmlResponse('https://example.com/2024/full-story', request=request)
+    assert seen.process_response(request, response, spider) is response
+    seen.article_stored(article('https://example.com/2024/full-story'), spider)
+    with pytest.raises(IgnoreRequest):
+        seen.process_request(request, spider)
+    assert not seen.requested_urls
+
+
+def test_recrawls_matching_urls_after_their_ttl(seen, spider, stats):
+    seen.index.add('https://example.com/liveblog/1', seen_at=time.time() - 120)
+    seen.index.add('https://example.com/liveblog/2')
+    seen.index.add('https://example.com/story', seen_at=time.time() - 120)
+    assert seen.process_request(Request('https://example.com/liveblog/1'), spider) is None
+    assert stats.get_value('seen_urls/recrawled') == 1
+    for url in ('https://example.com/liveblog/2', 'https://example.com/story'):
+        with pytest.raises(IgnoreRequest):
+            seen.process_request(Request(url), spider)
+
+
+def run_listing(middleware, spider, outputs):
+    async def result():
+        for output in outputs:
+            yield output
+
+    async def collect():
+        response = HtmlResponse('https://example.com/news', request=Request('https://example.com/news'))
+        return [output async for output in middleware.process_spider_output(response, result(), spider)]
+
+    return asyncio.run(collect())
+
+
+def listing(*urls):
+    return [Request(url) for url in urls] + [Request('https://example.com/news?page=2', meta={'pagination': True})]
+
+
+def test_stops_pagination_when_a_page_has_nothing_new(tmp_path, spider, stats):
+    path = str(tmp_path / 'seen.sqlite')
+    index = SeenUrlIndex.open(path)
+    index.add_many(['https://example.com/a', 'https://example.com/b'])
+    middleware = IncrementalCrawlMiddleware(path, stats)
+    middleware.spider_opened(spider)
+
+    outputs = run_listing(middleware, spider, listing('https://example.com/a', 'https://example.com/c'))
+    assert [request.url for request in outputs][-1] == 'https://example.com/news?page=2'
+    outputs = run_listing(middleware, spider, listing('https://example.com/a', 'https://example.com/b'))
+    assert [request.url for request in outputs] == ['https://example.com/a', 'https://example.com/b']
+    assert stats.get_value('incremental/pagination_stopped') == 1
+    middleware.spider_closed(spider, 'finished')
+    index.close()
+
+
+def test_high_water_mark_stops_at_last_runs_newest_article(tmp_path, spider, stats):
+    path = str(tmp_path / 'seen.sqlite')
+    first_run = IncrementalCrawlMiddleware(path, stats)
+    first_run.spider_opened(spider)
+    first_run.item_scraped(article('https://example.com/old', '2024-05-01T08:00:00Z'), None, spider)
+    first_run.item_scraped(article('https://example.com/new', '2024-05-02T08:00:00Z'), None, spider)
+    first_run.item_scraped(article('https://example.com/undated'), None, spider)
+    first_run.spider_closed(spider, 'finished')
+
+    second_run = IncrementalCrawlMiddleware(path, stats)
+    second_run.spider_opened(spider)
+    assert second_run.last_url == 'https://example.com/new'
+    outputs = run_listing(second_run, spider, listing('https://example.com/newer', 'https://example.com/new'))
+    assert not any(request.meta.get('pagination') for request in outputs)
+    second_run.spider_closed(spider, 'finished')
@@ -0,0 +1,204 @@
+import asyncio
+
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+from scrapy import Spider
+from scrapy.utils.test import get_crawler
+from twisted.internet.defer import Deferred
+
+from news_scraper import pipelines
+from news_scraper.items import NewsArticleItem
+from news_scraper.pipelines import (
+    AsyncMongoPipeline, BulkMongoPipeline, FingerprintCache, MongoPipeline, UnchangedItem, article_stored,
+    content_fingerprint,
+)
+
+mongomock = pytest.importorskip('mongomock')
+
+
+@pytest.fixture
+def spider():
+    return Spider(name='example')
+
+
+@pytest.fixture
+def crawler():
+    return get_crawler()
+
+
+@pytest.fixture
+def stored(crawler):
+    urls = []
+
+    def receiver(item, spider):
+        urls.append(item.url)
+
+    # Signal receivers are held weakly; the fixture keeps this one alive until the test ends
+    crawler.signals.connect(receiver, signal=article_stored)
+    yield urls
+    crawler.signals.disconnect(receiver, signal=article_stored)
+
+
+def article(url, body='Body'):
+    return NewsArticleItem(url=url, source_site='example', headline='Headline', body_text=body)
+
+
+def pipeline_kwargs(crawler):
+    return dict(mongo_uri='mongodb://test', mongo_db='news_data', stats=crawler.stats, signals=crawler.signals)
+
+
+def test_fingerprint_covers_content_fields_only():
+    item = article('https://example.com/a')
+    fingerprint = content_fingerprint(item)
+    item.section = 'World'
+    assert content_fingerprint(item) == fingerprint
+    item.body_text = 'Edited'
+    assert content_fingerprint(item) != fingerprint
+
+
+def test_fingerprint_cache_evicts_least_recently_used():
+    cache = FingerprintCache(max_size=2)
+    cache.set('a', '1')
+    cache.set('b', '2')
+    cache.get('a')
+    cache.set('c', '3')
+    assert cache.get('b') is None
+    assert cache.get('a') == '1' and cache.get('c') == '3'
+
+
+def test_skips_unchanged_articles(crawler, spider, stored):
+    pipeline = MongoPipeline(**pipeline_kwargs(crawler))
+    pipeline.db = mongomock.MongoClient()['news_data']
+    collection = pipeline.db['news_articles']
+
+    pipeline.process_item(article('https://example.com/a'), spider)
+    with pytest.raises(UnchangedItem):
+        pipeline.process_item(article('https://example.com/a'), spider)
+    pipeline.process_item(article('https://example.com/a', body='Edited'), spider)
+
+    assert collection.find_one({'url': 'https://example.com/a'})['body_text'] == 'Edited'
+    assert crawler.stats.get_value('mongo/articles/new') == 1
+    assert crawler.stats.get_value('mongo/articles/updated') == 1
+    assert crawler.stats.get_value('mongo/articles/skipped_unchanged') == 1
+    assert stored == ['https://example.com/a', 'https://example.com/a']
+
+    # Fingerprints are seeded from the stored copies
+    fresh = MongoPipeline(**pipeline_kwargs(crawler))
+    fresh.seed_fingerprints(collection.find(*fresh.fingerprint_query()), spider)
+    with pytest.raises(UnchangedItem):
+        fresh.prepare_document(article('https://example.com/a', body='Edited'))
+
+
+def test_failed_write_forgets_the_fingerprint(crawler, spider):
+    class FailingCollection:
+        def update_one(self, *args, **kwargs):
+            raise AutoReconnect('connection lost')
+
+    pipeline = MongoPipeline(**pipeline_kwargs(crawler))
+    pipeline.db = {'news_articles': FailingCollection()}
+    with pytest.raises(AutoReconnect):
+        pipeline.process_item(article('https://example.com/a'), spider)
+    assert pipeline.fingerprints.get('https://example.com/a') is None
+
+
+class BulkCollection:
+    """
+    Records bulk_write batches and answers with canned results: a dict of
+    bulk_api_result details, or an exception to raise.
+    """
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.batches = []
+
+    def bulk_write(self, operations, ordered=True):
+        assert not ordered
+        self.batches.append([operation._filter['url'] for operation in operations])
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return type('BulkWriteResult', (), {'bulk_api_result': result})()
+
+
+@pytest.fixture
+def bulk_pipeline(crawler, monkeypatch):
+    # Run the bulk_write thread through asyncio, as with the asyncio reactor but without running it
+    monkeypatch.setattr(
+        pipelines.threads, 'deferToThread',
+        lambda function, *args: Deferred.fromFuture(asyncio.ensure_future(asyncio.to_thread(function, *args))),
+    )
+    return BulkMongoPipeline(**pipeline_kwargs(crawler), bulk_size=3)
+
+
+def process_all(pipeline, items, spider):
+    async def run():
+        for item in items:
+            await pipeline.process_item(item, spider)
+        await pipeline._flush(spider)
+
+    asyncio.run(run())
+
+
+def test_bulk_flushes_full_batches_and_counts_results(bulk_pipeline, crawler, spider, stored):
+    collection = BulkCollection([{'nUpserted': 2, 'nModified': 1}, {'nUpserted': 1, 'nModified': 0}])
+    bulk_pipeline.db = {'news_articles': collection}
+    process_all(bulk_pipeline, [article(f'https://example.com/{i}') for i in range(4)], spider)
+
+    assert collection.batches == [[f'https://example.com/{i}' for i in range(3)], ['https://example.com/3']]
+    assert crawler.stats.get_value('mongo/bulk/batches') == 2
+    assert crawler.stats.get_value('mongo/articles/new') == 3
+    assert crawler.stats.get_value('mongo/articles/updated') == 1
+    assert stored == [f'https://example.com/{i}' for i in range(4)]
+
+
+def test_bulk_write_errors_fail_only_their_articles(bulk_pipeline, crawler, spider, stored):
+    error = BulkWriteError({
+        'writeErrors': [{'index': 1, 'errmsg': 'document too large'}], 'nUpserted': 2, 'nModified': 0,
+    })
+    bulk_pipeline.db = {'news_articles': BulkCollection([error])}
+    process_all(bulk_pipeline, [article(f'https://example.com/{i}') for i in range(3)], spider)
+
+    assert crawler.stats.get_value('mongo/articles/new') == 2
+    assert crawler.stats.get_value('mongo/articles/failed') == 1
+    assert crawler.stats.get_value('mongo/bulk/failed_batches') == 1
+    assert stored == ['https://example.com/0', 'https://example.com/2']
+    # The failed article is written again by its next crawl instead of being skipped as unchanged
+    assert bulk_pipeline.fingerprints.get('https://example.com/1') is None
+    assert bulk_pipeline.fingerprints.get('https://example.com/0') is not None
+
+
+def test_failed_bulk_write_fails_the_whole_batch(bulk_pipeline, crawler, spider, stored):
+    bulk_pipeline.db = {'news_articles': BulkCollection([AutoReconnect('connection lost')])}
+    process_all(bulk_pipeline, [article(f'https://example.com/{i}') for i in range(2)], spider)
+
+    assert crawler.stats.get_value('mongo/articles/failed') == 2
+    assert crawler.stats.get_value('mongo/bulk/failed_batches') == 1
+    assert stored == []
+    assert len(bulk_pipeline.fingerprints) == 0
+
+
+def test_async_pipeline_bounds_inflight_writes(crawler, spider, stored):
+    class SlowCollection:
+        def __init__(self):
+            self.urls = []
+
+        async def update_one(self, query, update, upsert):
+            self.urls.append(query['url'])
+            await asyncio.sleep(0.01)
+            return type('UpdateResult', (), {'upserted_id': 1, 'modified_count': 0})()
+
+    async def run():
+        pipeline = AsyncMongoPipeline(**pipeline_kwargs(crawler), max_inflight=2)
+        pipeline.db = {'news_articles': SlowCollection()}
+        pipeline.write_slots = asyncio.Semaphore(pipeline.max_inflight)
+        await asyncio.gather(*(
+            pipeline.process_item(article(f'https://example.com/{i}'), spider) for i in range(6)
+        ))
+        return pipeline
+
+    pipeline = asyncio.run(run())
+    assert len(pipeline.db['news_articles'].urls) == 6
+    assert crawler.stats.get_value('mongo/async/max_inflight') == 2
+    assert crawler.stats.get_value('mongo/async/backpressure_waits') == 4
+    assert crawler.stats.get_value('mongo/articles/new') == 6
+    assert len(stored) == 6
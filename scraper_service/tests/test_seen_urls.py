@@ -0,0 +1,65 @@
+import time
+
+from news_scraper.seen_urls import SeenUrlIndex, url_key
+
+
+def test_url_key_is_a_signed_64_bit_int():
+    key = url_key('https://example.com/a')
+    assert -2 ** 63 <= key < 2 ** 63
+    assert key == url_key('https://example.com/a') != url_key('https://example.com/b')
+
+
+def test_add_and_lookup(tmp_path):
+    index = SeenUrlIndex(str(tmp_path / 'seen.sqlite'), commit_every=2)
+    assert 'https://example.com/a' not in index
+    index.add('https://example.com/a', seen_at=100.0)
+    assert 'https://example.com/a' in index
+    assert index.seen_at('https://example.com/a') == 100.0
+    assert index.seen_at('https://example.com/b') is None
+    # Re-adding refreshes the timestamp
+    index.add('https://example.com/a', seen_at=200.0)
+    assert index.seen_at('https://example.com/a') == 200.0
+    assert len(index) == 1
+    index.close()
+
+
+def test_add_many_keeps_existing_timestamps_unless_replacing(tmp_path):
+    index = SeenUrlIndex(str(tmp_path / 'seen.sqlite'))
+    index.add('https://example.com/a', seen_at=100.0)
+    assert index.add_many(['https://example.com/a', 'https://example.com/b'], seen_at=300.0) == 1
+    assert index.seen_at('https://example.com/a') == 100.0
+    assert index.seen_at('https://example.com/b') == 300.0
+    index.add_many(['https://example.com/a'], seen_at=400.0, replace=True)
+    assert index.seen_at('https://example.com/a') == 400.0
+    index.close()
+
+
+def test_persists_urls_and_high_water_marks(tmp_path):
+    path = str(tmp_path / 'seen.sqlite')
+    index = SeenUrlIndex(path, commit_every=100)
+    index.add('https://example.com/a')
+    assert index.high_water_mark('bbc') == (None, None)
+    index.set_high_water_mark('bbc', '2024-05-01T00:00:00+00:00', 'https://example.com/a')
+    index.close()
+
+    index = SeenUrlIndex(path)
+    assert 'https://example.com/a' in index
+    assert time.time() - index.seen_at('https://example.com/a') < 60
+    assert index.high_water_mark('bbc') == ('2024-05-01T00:00:00+00:00', 'https://example.com/a')
+    assert index.high_water_mark('cnn') == (None, None)
+    index.close()
+
+
+def test_open_shares_one_connection_per_path(tmp_path):
+    path = str(tmp_path / 'seen.sqlite')
+    first = SeenUrlIndex.open(path)
+    second = SeenUrlIndex.open(path)
+    assert first is second
+    first.close()
+    # Still open for the second user
+    first.add('https://example.com/a')
+    second.close()
+    third = SeenUrlIndex.open(path)
+    assert third is not first
+    assert 'https://example.com/a' in third
+    third.close()